@@ -63,9 +63,18 @@ INSTALLED_APPS = [
     "imagekit",
 ]
 
+ASGI_APPLICATION = 'app.asgi.application'
+
+# Group messages reach sockets on every worker of the host through Postgres
+# LISTEN/NOTIFY, see core.layers
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': 'core.layers.PostgresChannelLayer',
+        'CONFIG': {
+            'capacity': 100,
+            'expiry': 60,
+            'group_expiry': 86400,
+        },
     }
 }
 
@@ -133,6 +142,18 @@ firebase_credentials = {
 cred = credentials.Certificate(firebase_credentials)
 default_app = firebase_admin.initialize_app(cred)
 
+# Firebase ID tokens are verified by FIREBASE_TOKEN_VERIFIER, which keeps
+# Google's certificates from FIREBASE_CERT_URL for their max-age and up to FIREBASE_TOKEN_CACHE_SIZE
+# decoded tokens until they expire
+FIREBASE_PROJECT_ID = firebase_credentials["project_id"]
+FIREBASE_TOKEN_VERIFIER = os.environ.get(
+    "FIREBASE_TOKEN_VERIFIER", "core.firebase.IdTokenVerifier")
+FIREBASE_CERT_URL = os.environ.get(
+    "FIREBASE_CERT_URL",
+    "https://www.googleapis.com/robot/v1/metadata/x509/"
+    "securetoken@system.gserviceaccount.com")
+FIREBASE_TOKEN_CACHE_SIZE = 10000
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -185,6 +206,17 @@ REST_FRAMEWORK = {
 }
 EXPIRATION_TIME = 3600
 
+# Radius of the nearby post feed when the client sends no radius_km
+NEARBY_POSTS_DEFAULT_RADIUS_KM = 50
+NEARBY_POSTS_MAX_RADIUS_KM = 500
+
+# Following feed: posts are pushed to follower timelines unless the author
+# has more followers than this when publishing, in which case they are
+# pulled on read
+TIMELINE_FANOUT_FOLLOWER_LIMIT = 10000
+# Posts copied to a timeline when the user follows someone new
+TIMELINE_BACKFILL_SIZE = 200
+
 SPECTACULAR_SETTINGS = {
     "COMPONENT_SPLIT_REQUEST": True,
 }
@@ -203,3 +235,89 @@ CSRF_COOKIE_SECURE = True
 CSRF_COOKIE_DOMAIN = 'api.foodport.com.my'
 
 CSRF_TRUSTED_ORIGINS = ['https://api.foodport.com.my']
+
+# Uploaded pictures are resized in the background by process_image_jobs
+IMAGE_MAX_WIDTH = 1290
+IMAGE_JPEG_QUALITY = 85
+IMAGE_JOB_MAX_ATTEMPTS = 3
+# Widths of the WebP and JPEG renditions generated for each picture
+IMAGE_RENDITION_WIDTHS = [160, 320, 640, 960]
+IMAGE_RENDITION_QUALITY = 80
+
+# IP geolocation of profile and comment requests, read from a local copy of
+# the DB-IP "IP to City Lite" CSV
+GEOIP_PROVIDER = "core.geoip.RangeFileProvider"
+GEOIP_DATABASE_PATH = os.environ.get(
+    "GEOIP_DATABASE_PATH", "/vol/web/geoip/dbip-city-lite.csv")
+GEOIP_CACHE_SIZE = 10000
+
+# Last-seen addresses of /user/me/ are written in batches at most this often
+LAST_SEEN_FLUSH_INTERVAL = 60
+LAST_SEEN_BATCH_SIZE = 500
+
+# Cache token lookups of CachedTokenAuthentication, off unless enabled.
+# Entries live AUTH_TOKEN_CACHE_SHARED_TTL seconds in AUTH_TOKEN_CACHE_ALIAS
+# when it names one of CACHES, else AUTH_TOKEN_CACHE_TTL seconds in each
+# process, which other processes' invalidations do not reach
+AUTH_TOKEN_CACHE_ENABLED = bool(int(os.environ.get("AUTH_TOKEN_CACHE_ENABLED", 0)))
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 30
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get("AUTH_TOKEN_CACHE_ALIAS") or None
+AUTH_TOKEN_CACHE_SHARED_TTL = 300
+
+# Issue access and refresh tokens signed with SECRET_KEY instead of DRF
+# tokens. Access tokens expire after EXPIRATION_TIME seconds, refresh
+# tokens after AUTH_REFRESH_TOKEN_LIFETIME; revocations are re-read from the
+# database at most every AUTH_REVOCATION_SYNC_INTERVAL seconds, overlapping
+# the previous read by AUTH_REVOCATION_SYNC_MARGIN seconds for rows whose
+# transaction committed late
+AUTH_SIGNED_TOKENS = bool(int(os.environ.get("AUTH_SIGNED_TOKENS", 0)))
+AUTH_REFRESH_TOKEN_LIFETIME = 30 * 24 * 3600
+AUTH_REVOCATION_SYNC_INTERVAL = 5
+AUTH_REVOCATION_SYNC_MARGIN = 60
+
+# Photos embedded in a menu item; the rest are paged from its photos endpoint
+MENU_ITEM_PHOTOS_LIMIT = 10
+
+# Seconds an engagement event must age before the rollups advance past it,
+# so rows of transactions still in flight are not skipped
+ENGAGEMENT_ROLLUP_LAG = 60
+
+# Trending menu items and businesses are ranked by the weighted engagement
+# of the last TRENDING_WINDOW seconds, halved every TRENDING_HALF_LIFE seconds
+TRENDING_WINDOW = 7 * 24 * 3600
+TRENDING_HALF_LIFE = 24 * 3600
+TRENDING_LIMIT = 1000
+TRENDING_WEIGHTS = {
+    "likes": 1,
+    "unlikes": -1,
+    "saves": 3,
+    "unsaves": -3,
+    "shares": 4,
+    "comments": 2,
+    "views": 0.1,
+}
+
+# Outbox messages are retried after OUTBOX_RETRY_DELAY seconds, doubled on
+# each attempt, and marked failed after OUTBOX_MAX_ATTEMPTS attempts
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 2
+
+# Recipients accepted by one bulk share request
+POST_SHARE_MAX_RECIPIENTS = 100
+
+# Chat messages received by the sockets of a process are inserted in batches
+# of up to CHAT_MESSAGE_BATCH_SIZE, waiting CHAT_MESSAGE_FLUSH_INTERVAL
+# seconds for a batch to fill. CHAT_MESSAGE_MAX_SIZE bounds the JSON encoded
+# text so a message fits in a channel layer NOTIFY
+CHAT_MESSAGE_BATCH_SIZE = 100
+CHAT_MESSAGE_FLUSH_INTERVAL = 0.05
+CHAT_MESSAGE_MAX_SIZE = 4000
+CHAT_MAX_PARTICIPANTS = 50
+
+# Blocking calls of async views, such as fetching Firebase certificates, run
+# in a pool of at most ASYNC_OFFLOAD_THREADS threads per process
+ASYNC_OFFLOAD_THREADS = int(os.environ.get("ASYNC_OFFLOAD_THREADS", 32))
+
+# Bytes of notifications sent to a socket and not acknowledged by its client
+NOTIFICATION_SEND_WINDOW = 65536
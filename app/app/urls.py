@@ -35,7 +35,8 @@ urlpatterns = [
     path("api/v1/", include("seller.urls")),
     path("api/v1/", include("dish.urls")),
     path("api/v1/", include("menu.urls")),
-    path("api/v1/", include("business.urls"))
+    path("api/v1/", include("business.urls")),
+    path("api/v1/", include("chat.urls")),
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Read the IP geolocation database before the first request, and before
+# uwsgi forks the workers so they share it
+from core.geoip import get_geoip_provider  # noqa: E402
+
+get_geoip_provider()
@@ -1,8 +1,7 @@
 from rest_framework import serializers
 
-from core.models import Business, Post, MenuItem
-
-from django.db.models import Avg, Min, Max
+from core.models import Business, BusinessStats
+from core.renditions import image_url
 
 class BusinessSerializer(serializers.ModelSerializer):
     """Serializer for business"""
@@ -40,83 +39,46 @@ class BusinessSerializer(serializers.ModelSerializer):
 
 
 
-    def get_post_photo_url(self, obj):
-        menu_items = obj.menu_items.all()
-        posts = [menu_item.posts.order_by("-postLikeCount").first() for menu_item in menu_items]
-        posts = [post for post in posts if post]
-
-        post = None
-        if posts:
-            post = max(posts, key=lambda post: post.postLikeCount)
+    def get_stats(self, obj):
+        """Return the rollup of the business, empty if not computed yet"""
+        try:
+            return obj.stats
+        except BusinessStats.DoesNotExist:
+            return BusinessStats(business=obj)
 
+    def get_post_photo_url(self, obj):
+        post = self.get_stats(obj).topPost
         if post and post.postPhotoUrl:
             request = self.context.get("request")
-            photo_url = post.postPhotoUrl.url
-            return request.build_absolute_uri(photo_url)
+            return image_url(post.postPhotoUrl, request)
         return None
 
     def get_delicious_rating(self, obj):
-        menu_items = obj.menu_items.all()
-        ratings = []
-        for menu_item in menu_items:
-            avg_rating = menu_item.posts.aggregate(Avg("postRatingDelicious"))
-            if avg_rating["postRatingDelicious__avg"] is not None:
-                ratings.append(avg_rating["postRatingDelicious__avg"])
-        if ratings:
-            return sum(ratings) / len(ratings)
-        return None
+        return self.get_stats(obj).deliciousRating
 
     def get_eat_again_rating(self, obj):
-        menu_items = obj.menu_items.all()
-        ratings = []
-        for menu_item in menu_items:
-            avg_rating = menu_item.posts.aggregate(Avg("postRatingEatAgain"))
-            if avg_rating["postRatingEatAgain__avg"] is not None:
-                ratings.append(avg_rating["postRatingEatAgain__avg"])
-        if ratings:
-            return sum(ratings) / len(ratings)
-        return None
+        return self.get_stats(obj).eatAgainRating
 
     def get_worth_it_rating(self, obj):
-        menu_items = obj.menu_items.all()
-        ratings = []
-        for menu_item in menu_items:
-            avg_rating = menu_item.posts.aggregate(Avg("postRatingWorthIt"))
-            if avg_rating["postRatingWorthIt__avg"] is not None:
-                ratings.append(avg_rating["postRatingWorthIt__avg"])
-        if ratings:
-            return sum(ratings) / len(ratings)
-        return None
+        return self.get_stats(obj).worthItRating
 
     def get_lowest_price(self, obj):
-        min_price = obj.menu_items.aggregate(Min("price"))
-        return min_price["price__min"]
+        return self.get_stats(obj).lowestPrice
 
     def get_highest_price(self, obj):
-        max_price = obj.menu_items.aggregate(Max("price"))
-        return max_price["price__max"]
+        return self.get_stats(obj).highestPrice
 
     def get_businessTotalPostCount(self, obj):
-        menu_items = obj.menu_items.all()
-        total_post_count = sum(menu_item.posts.count() for menu_item in menu_items)
-        return total_post_count
-
+        return self.get_stats(obj).postCount
 
     def get_businessFollowerCount(self, obj):
-        return obj.followers.count()
+        return self.get_stats(obj).followerCount
 
     def get_businessFollowerId(self, obj):
-        return [follower.id for follower in obj.followers.all()]
+        return self.get_stats(obj).followerIds
 
     def get_postId(self, obj):
-        post_ids = []
-        menu_items = obj.menu_items.all()
-        for menu_item in menu_items:
-            post_ids.extend(menu_item.posts.values_list("id", flat=True))
-
-        return post_ids
-
-
+        return self.get_stats(obj).postIds
 
 
 class BusinessDetailSerializer(BusinessSerializer):
@@ -131,6 +93,7 @@ class BusinessDetailSerializer(BusinessSerializer):
                   "businessHalal",
                   "businessInfoContributor",
                   "sellerId",
+                  "businessTrendRanking",
         ]
 
     def get_businessInfoContributor(self,obj):
@@ -2,6 +2,8 @@
 Tests for business APIs
 """
 
+from unittest import mock
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
@@ -9,7 +11,12 @@ from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
-from core.models import Business
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (
+    Business, BusinessStats, BusinessStatsManager, MenuItem, Post, PostLike,
+)
 from business.serializers import BusinessSerializer, BusinessDetailSerializer
 
 MY_BUSINESSES_URL = reverse("business:my-businesses-list")
@@ -229,6 +236,36 @@ class PrivatebusinessAPITests(TestCase):
         self.assertEqual(res.data["results"][0]
                          ["businessName"], business.businessName)
 
+    def test_business_list_cursor_pages(self):
+        """Test paging businesses with a cursor keyed on the name"""
+        new_user = create_user(userEmailAddress="user2@example.com",
+                               password="test123",
+                               userPhoneNumber="0123456843",
+                               userUsername="username1")
+        for name in ["b", "a", "c", "a", "b"]:
+            create_business(user=new_user, businessName=name)
+
+        res = self.client.get(BUSINESS_LIST_URL, {"cursor": "", "page_size": 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", res.data)
+        names = [b["businessName"] for b in res.data["results"]]
+        ids = [b["businessId"] for b in res.data["results"]]
+
+        # A business added before the cursor position is not repeated
+        create_business(user=new_user, businessName="0")
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            names += [b["businessName"] for b in res.data["results"]]
+            ids += [b["businessId"] for b in res.data["results"]]
+
+        self.assertEqual(names, ["a", "a", "b", "b", "c"])
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_business_list_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        res = self.client.get(BUSINESS_LIST_URL, {"cursor": "not-a-cursor"})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_retrieve_a_specific_business(self):
         """Test get business detail"""
         other_user = create_user(
@@ -360,3 +397,125 @@ class PrivatebusinessAPITests(TestCase):
         self.assertEqual(len(res.data), 2)
 
 
+
+
+class BusinessStatsTests(TestCase):
+    """Test the business stats rollup read by the serializers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            userEmailAddress="user@example.com", password="test123", userUsername="username03")
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.business = create_business(user=self.user)
+            self.noodles = MenuItem.objects.create(
+                name="Noodles", business=self.business, price=8.50)
+            self.rice = MenuItem.objects.create(
+                name="Rice", business=self.business, price=12.00)
+
+    def create_post(self, menu_item, **params):
+        defaults = {
+            "postReview": "review",
+            "postRatingDelicious": 5,
+            "postRatingEatAgain": 4,
+            "postRatingWorthIt": 3,
+        }
+        defaults.update(params)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(user=self.user, menuItem=menu_item, **defaults)
+
+    def get_business(self):
+        res = self.client.get(specific_business_url(self.business.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_stats_follow_posts(self):
+        """Test ratings, prices and post counts follow new posts"""
+        first = self.create_post(self.noodles, postRatingDelicious=5)
+        second = self.create_post(self.noodles, postRatingDelicious=3)
+        third = self.create_post(self.rice, postRatingDelicious=2)
+
+        data = self.get_business()
+
+        # Each menu item weighs the same: (4 + 2) / 2
+        self.assertEqual(data["delicious_rating"], 3)
+        self.assertEqual(data["eat_again_rating"], 4)
+        self.assertEqual(str(data["lowest_price"]), "8.50")
+        self.assertEqual(str(data["highest_price"]), "12.00")
+        self.assertEqual(data["businessTotalPostCount"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            third.delete()
+            first.menuItem = None
+            first.save()
+
+        data = self.get_business()
+        self.assertEqual(data["delicious_rating"], 3)
+        self.assertEqual(data["postId"], [second.id])
+
+    def test_stats_follow_likes_and_follows(self):
+        """Test the top post and followers follow likes and follows"""
+        self.create_post(self.noodles)
+        liked = self.create_post(self.rice)
+        with self.captureOnCommitCallbacks(execute=True):
+            PostLike.objects.create(user=self.user, post=liked)
+            res = self.client.post(
+                reverse("business:follow_business", args=[self.business.id]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        stats = BusinessStats.objects.get(business=self.business)
+        self.assertEqual(stats.topPost, liked)
+        data = self.get_business()
+        self.assertEqual(data["businessFollowerCount"], 1)
+        self.assertEqual(data["businessFollowerId"], [self.user.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.following_businesses.clear()
+        self.assertEqual(self.get_business()["businessFollowerCount"], 0)
+
+    def test_like_updates_top_post_without_sorting(self):
+        """Test a like moves the top post without sorting every post,
+        which only an unlike of the top post does
+        """
+        older = self.create_post(self.noodles)
+        newer = self.create_post(self.rice)
+        self.assertEqual(BusinessStats.objects.get().topPost, newer)
+
+        with mock.patch.object(BusinessStatsManager, "refresh_top_post") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                PostLike.objects.create(user=self.user, post=older)
+        refresh.assert_not_called()
+        self.assertEqual(BusinessStats.objects.get().topPost, older)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PostLike.objects.create(user=self.user, post=older, isActive=False)
+        self.assertEqual(BusinessStats.objects.get().topPost, newer)
+
+    def test_menu_item_changes(self):
+        """Test deleting a menu item drops it from the price range"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rice.delete()
+
+        data = self.get_business()
+
+        self.assertEqual(str(data["highest_price"]), "8.50")
+
+    def test_list_queries_do_not_grow(self):
+        """Test the business list reads the rollups with one joined query"""
+        for _ in range(3):
+            self.create_post(self.noodles)
+        with CaptureQueriesContext(connection) as one_business:
+            self.client.get(BUSINESS_LIST_URL)
+
+        for i in range(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                business = create_business(user=self.user, businessName=f"b{i}")
+                menu_item = MenuItem.objects.create(
+                    name="Item", business=business, price=5)
+            self.create_post(menu_item)
+        with CaptureQueriesContext(connection) as six_businesses:
+            res = self.client.get(BUSINESS_LIST_URL)
+
+        self.assertEqual(len(res.data["results"]), 6)
+        self.assertEqual(len(six_businesses), len(one_business))
@@ -1,6 +1,6 @@
-from rest_framework import viewsets, status, permissions, authentication, generics
+from rest_framework import viewsets, status, permissions, generics
 from rest_framework.response import Response
-from core.models import Business, Post, MenuItem, PostLike, User
+from core.models import Business, BusinessEngagementHour, Post, MenuItem, User
 from business.serializers import BusinessSerializer, BusinessDetailSerializer
 from user.serializer import UserSerializer
 from django.utils import timezone
@@ -8,22 +8,20 @@ from rest_framework import filters
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
-
-from django.db.models import Sum
-
-from datetime import datetime, timedelta
+from core.pagination import CursorPaginationMixin
+from core.authentication import CachedTokenAuthentication
+from core.analytics import engagement_series, like_total, parse_datetime_param
 
 from django.http import Http404
 
-import random
 
 
 class BusinessViewset(viewsets.ModelViewSet):
     """View for manage business APIs"""
     serializer_class = BusinessDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [authentication.TokenAuthentication]
-    queryset = Business.objects.all()
+    authentication_classes = [CachedTokenAuthentication]
+    queryset = Business.objects.select_related("stats__topPost")
 
     def get_queryset(self):
         """Retrieve business for authenticated user"""
@@ -50,16 +48,16 @@ class BusinessViewset(viewsets.ModelViewSet):
             user=user, businessInfoContributor=business_info_contributor)
 
 
-class CustomBusinessPagination(PageNumberPagination):
+class CustomBusinessPagination(CursorPaginationMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
 
 
 class BusinessListView(generics.ListAPIView):
-    queryset = Business.objects.all().order_by("businessName")
+    queryset = Business.objects.select_related("stats__topPost").order_by("businessName")
     serializer_class = BusinessDetailSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ["businessName"]
@@ -69,13 +67,14 @@ class BusinessListView(generics.ListAPIView):
 class RetrieveBusinessView(generics.RetrieveAPIView):
     """Retrieve a business"""
     serializer_class = BusinessDetailSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return a business"""
         try:
-            business = Business.objects.get(id=self.kwargs["id"])
+            business = Business.objects.select_related(
+                "stats__topPost").get(id=self.kwargs["id"])
         except Business.DoesNotExist:
             raise Http404("Business not found")
         return business
@@ -83,17 +82,17 @@ class RetrieveBusinessView(generics.RetrieveAPIView):
 
 class AllBusinessesListView(generics.ListAPIView):
     """Return a list of all existing menu items"""
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = BusinessDetailSerializer
 
     def get_queryset(self):
         """Retrieve all the menu items"""
-        return Business.objects.all().order_by("businessName")
+        return Business.objects.select_related("stats__topPost").order_by("businessName")
 
 
 class LikePercentageChangeView(APIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, businessId, startDateTime, endDateTime, *args, **kwargs):
@@ -105,30 +104,21 @@ class LikePercentageChangeView(APIView):
         if not startDateTime or not endDateTime:
             return Response({"error": "startDateTime and endDateTime query params are required"}, status=400)
 
-        startDateTime = startDateTime.replace("_", " ").replace(
-            "%20", " ").replace("%22", " ").replace("%3A", ":").strip('"').strip()
-        endDateTime = endDateTime.replace("_", " ").replace("%20", " ").replace(
-            "%22", " ").replace("%3A", ":").strip('"').strip()
-
         # Parse the datetime strings into datetime objects
         try:
-            startDateTime = datetime.strptime(
-                startDateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
-            endDateTime = datetime.strptime(
-                endDateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
+            startDateTime = parse_datetime_param(startDateTime)
+            endDateTime = parse_datetime_param(endDateTime)
         except ValueError:
             return Response({"error": "Invalid datetime format. Use ISO 8601 format 'YYYY-MM-DDTHH:MM:SS.sssZ'",
                              "startDate": startDateTime,
                              "businessId": businessId}, status=400,)
 
+        rollups = BusinessEngagementHour.objects.filter(business=business)
+        posts = Post.objects.filter(menuItem__business=business)
 
-        posts = Post.objects.filter(menu_item__in=business.menu_items.all())
-
-        # Calcualte likes at startDateTime and endDateTie
-        start_likes = posts.filter(postPublishDateTime__lte=startDateTime).aggregate(
-            sum=Sum("postLikeCount"))["sum"] or 0
-        end_likes = posts.filter(postPublishDateTime__lte=endDateTime).aggregate(
-            sum=Sum("postLikeCount"))["sum"] or 0
+        # Calculate the net likes at startDateTime and endDateTime
+        start_likes = like_total(rollups, posts, startDateTime)
+        end_likes = like_total(rollups, posts, endDateTime)
 
         # calculate trend direction and percentage change
         if start_likes == 0:
@@ -156,7 +146,8 @@ class LikePercentageChangeView(APIView):
 
 
 class DailyCumulativePostLikesView(APIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    """Cumulative likes, saves, shares and comments over a time range"""
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, businessId, startDateTime, endDateTime, *args, **kwargs):
@@ -170,66 +161,23 @@ class DailyCumulativePostLikesView(APIView):
         if not startDateTime or not endDateTime:
             return Response({"error": "startDateTime and endDateTime query params are required"}, status=400)
 
-        startDateTime = startDateTime.replace("_", " ").replace(
-            "%20", " ").replace("%22", " ").replace("%3A", ":").strip('"').strip()
-        endDateTime = endDateTime.replace("_", " ").replace("%20", " ").replace(
-            "%22", " ").replace("%3A", ":").strip('"').strip()
-
         # Parse the datetime strings into datetime objects
         try:
-            startDateTime = datetime.strptime(
-                startDateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
-            endDateTime = datetime.strptime(
-                endDateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
+            startDateTime = parse_datetime_param(startDateTime)
+            endDateTime = parse_datetime_param(endDateTime)
         except ValueError:
             return Response({"error": "Invalid datetime format. Use ISO 8601 format 'YYYY-MM-DDTHH:MM:SS.sssZ'",
                              "startDate": startDateTime,
                              "businessId": businessId}, status=400,)
 
+        rollups = BusinessEngagementHour.objects.filter(business=business)
+        posts = Post.objects.filter(menuItem__business=business)
 
-        posts = Post.objects.filter(menu_item__in=business.menu_items.all())
-
-        # Initialize the result list
-        results = []
-
-        delta = endDateTime - startDateTime
-        if delta <= timedelta(hours=24):
-            # If range is 24 hours, step is 2 hours
-            step = timedelta(hours=2)
-        elif delta <= timedelta(days=7):
-            # If range is a week, step is one day
-            step = timedelta(days=1)
-        elif delta <= timedelta(days=31):
-            # If range is a month, step is a week
-            step = timedelta(days=7)
-        elif delta <= timedelta(days=90):
-            # If range is a quarter, step is one month
-            step = timedelta(days=30)
-        elif delta <= timedelta(days=365):
-            # If range is a year, step is one month
-            step = timedelta(days=30)
-        else:
-            # Default step is one day
-            step = timedelta(days=1)
-
-        day = startDateTime + step
-        while day <= endDateTime:
-            # Get the cumulative sum of likes for posts up to and including this day
-            likes = PostLike.objects.filter(post__in = posts, likeDateTime__lte = day, isActive = True).count()
-            likes -= PostLike.objects.filter(post__in = posts, likeDateTime__lte = day, isActive = False).count()
-            save = random.randint(0, 100)
-            share = random.randint(0, 100)
-            comment = random.randint(0, 100)
-            # Append the result to the results list
-            results.append({"timestamp": day.isoformat(), "like": likes, "save": save, "share": share, "comment": comment})
-            # Move to the next step
-            day += step
-
-        # Return the result
-        return Response(results)
+        return Response(engagement_series(
+            rollups, posts, startDateTime, endDateTime))
 
 class FollowBusinessView(APIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, business_id):
@@ -247,7 +195,7 @@ class FollowBusinessView(APIView):
 
 class BusinessFollowersListView(generics.ListAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -260,7 +208,7 @@ class BusinessFollowersListView(generics.ListAPIView):
 
 class FollowingBusinessesListView(generics.ListAPIView):
     serializer_class = BusinessDetailSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -269,6 +217,6 @@ class FollowingBusinessesListView(generics.ListAPIView):
             user = User.objects.get(id=user_id)
         except User.DoesNotExist:
             raise Http404("User not found")
-        return user.following_businesses.all()
+        return user.following_businesses.select_related("stats__topPost")
 
 
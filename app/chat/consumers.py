@@ -1,5 +1,16 @@
 import json
-from channels.generic.websocket import WebsocketConsumer
+from collections import deque
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer, WebsocketConsumer
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from chat.writer import conversation_group, get_writer
+from core.authentication import CachedTokenAuthentication
+from core.models import ChatMessage, ConversationMember
 
 
 class ChatConsumer(WebsocketConsumer):
@@ -38,4 +49,181 @@ class ChatConsumer(WebsocketConsumer):
         # Send the message to the WebSocket
         self.send(text_data=json.dumps({
             'message': message
-        }))
\ No newline at end of file
+        }))
+
+
+def token_from_scope(scope):
+    """Return the token of the ?token= query parameter or the Authorization
+    header of a WebSocket handshake, or None.
+    """
+    token = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    if token:
+        return token[0]
+    headers = dict(scope.get("headers", []))
+    parts = headers.get(b"authorization", b"").decode().split()
+    if len(parts) == 2 and parts[0] in ("Token", "Bearer"):
+        return parts[1]
+    return None
+
+
+@database_sync_to_async
+def authenticate(key):
+    """Return the active user owning the token, or None"""
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+async def scope_user(scope):
+    """Return the user of the scope or of its token, or None"""
+    user = scope.get("user")
+    if user is not None and user.is_authenticated:
+        return user
+    key = token_from_scope(scope)
+    return await authenticate(key) if key else None
+
+
+@database_sync_to_async
+def is_member(conversation_id, user):
+    return ConversationMember.objects.filter(
+        conversation_id=conversation_id, user=user).exists()
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """Push the notifications of the user_{id} group to the user's sockets.
+
+    The socket is authenticated from its token. The server buffers whatever
+    is sent without telling the application how much a slow client has
+    yet to read, so clients acknowledge the messages they have read with
+    {"type": "notifications.ack", "count": n} and at most
+    NOTIFICATION_SEND_WINDOW bytes are sent unacknowledged. Notifications
+    beyond that wait in an outbox of outbox_size messages; past that the
+    oldest are dropped and reported in one notifications.dropped message.
+    """
+    outbox_size = 100
+
+    async def connect(self):
+        user = await scope_user(self.scope)
+        if user is None:
+            await self.close()
+            return
+
+        self.user = user
+        self.group_name = f"user_{user.id}"
+        self.outbox = deque()
+        self.dropped = 0
+        # Sizes of the messages sent and not acknowledged yet
+        self.unacked = deque()
+        self.unacked_bytes = 0
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            message = json.loads(text_data or "")
+            ack = message.get("type") == "notifications.ack"
+            count = message.get("count")
+        except (ValueError, AttributeError):
+            return
+        if not ack or not isinstance(count, int) or count < 1:
+            return
+        for _ in range(min(count, len(self.unacked))):
+            self.unacked_bytes -= self.unacked.popleft()
+        await self.flush()
+
+    def push(self, message):
+        """Queue a message for the client, dropping the oldest if full"""
+        if len(self.outbox) >= self.outbox_size:
+            self.outbox.popleft()
+            self.dropped += 1
+        self.outbox.append(message)
+
+    async def flush(self):
+        """Send queued messages while the window has room"""
+        while self.outbox:
+            if self.dropped:
+                message = {"type": "notifications.dropped", "count": self.dropped}
+            else:
+                message = self.outbox[0]
+            text = json.dumps(message)
+            # A message larger than the window still goes once all are read
+            window = settings.NOTIFICATION_SEND_WINDOW - self.unacked_bytes
+            if self.unacked and len(text) > window:
+                return
+            if self.dropped:
+                self.dropped = 0
+            else:
+                self.outbox.popleft()
+            self.unacked.append(len(text))
+            self.unacked_bytes += len(text)
+            await self.send(text_data=text)
+
+    async def share_post(self, event):
+        self.push({
+            "type": "share.post",
+            "post_id": event["post_id"],
+            "shared_by_username": event["shared_by_username"],
+            "message": (
+                f"User {event['shared_by_username']} has shared a post with you. "
+                f"Click here to view the post: {event['post_id']}"),
+        })
+        await self.flush()
+
+
+class ConversationConsumer(AsyncWebsocketConsumer):
+    """Chat in a conversation of the user.
+
+    Messages received are handed to the process's MessageWriter, saved in
+    batches and then broadcast to the conversation group, so every socket
+    of the conversation, the sender's included, gets them with their ids.
+    """
+
+    async def connect(self):
+        user = await scope_user(self.scope)
+        conversation_id = self.scope["url_route"]["kwargs"]["conversation_id"]
+        if user is None or not await is_member(conversation_id, user):
+            await self.close()
+            return
+
+        self.user = user
+        self.conversation_id = conversation_id
+        self.group_name = conversation_group(conversation_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            text = json.loads(text_data or "").get("message")
+        except (ValueError, AttributeError):
+            text = None
+        if not isinstance(text, str) or not text.strip():
+            await self.chat_error({"error": "Message must be a non-empty string"})
+            return
+        if len(json.dumps(text)) > settings.CHAT_MESSAGE_MAX_SIZE:
+            await self.chat_error({"error": "Message is too long"})
+            return
+
+        get_writer().add(ChatMessage(
+            conversation_id=self.conversation_id,
+            sender_id=self.user.id,
+            text=text,
+            createdDateTime=timezone.now(),
+        ), self.channel_name)
+
+    async def chat_message(self, event):
+        await self.send(text_data=json.dumps(
+            {"type": "chat.message", **event["message"]}))
+
+    async def chat_error(self, event):
+        await self.send(text_data=json.dumps(
+            {"type": "chat.error", "error": event["error"]}))
@@ -4,6 +4,8 @@ from . import consumers
 
 websocket_urlpatterns = [
     path('ws/chat/', consumers.ChatConsumer.as_asgi()),
+    path('ws/notifications/', consumers.NotificationConsumer.as_asgi()),
+    path('ws/chat/<int:conversation_id>/', consumers.ConversationConsumer.as_asgi()),
 ]
 
 application = ProtocolTypeRouter({
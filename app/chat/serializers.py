@@ -0,0 +1,36 @@
+"""
+Serializers for the chat APIs
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+from core.models import ChatMessage, Conversation
+
+
+class ChatMessageSerializer(serializers.ModelSerializer):
+    """Serializer for the messages of a conversation"""
+    conversationId = serializers.ReadOnlyField(source="conversation_id")
+    senderId = serializers.ReadOnlyField(source="sender_id")
+
+    class Meta:
+        model = ChatMessage
+        fields = ["id", "conversationId", "senderId", "text", "createdDateTime"]
+        read_only_fields = fields
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """Serializer for the conversations of the user with their unread count"""
+    participantIds = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.CHAT_MAX_PARTICIPANTS,
+        write_only=True,
+    )
+    participants = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    unreadCount = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ["id", "participantIds", "participants", "unreadCount",
+                  "createdDateTime", "lastMessageDateTime"]
+        read_only_fields = ["id", "createdDateTime", "lastMessageDateTime"]
@@ -0,0 +1,154 @@
+"""
+Tests for the chat APIs
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ChatMessage, Conversation, ConversationMember
+
+CONVERSATIONS_URL = reverse("chat:conversation-list")
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def messages_url(conversation_id):
+    return reverse("chat:conversation-messages",
+                   kwargs={"conversation_id": conversation_id})
+
+
+def read_url(conversation_id):
+    return reverse("chat:conversation-read",
+                   kwargs={"conversation_id": conversation_id})
+
+
+def create_user(username):
+    return get_user_model().objects.create_user(
+        userEmailAddress=f"{username}@example.com",
+        password="test123",
+        userUsername=username,
+    )
+
+
+class ChatApiTests(TestCase):
+    """Test the conversations and message history of a user."""
+
+    def setUp(self):
+        self.user = create_user("user")
+        self.friend = create_user("friend")
+        self.other = create_user("other")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def conversation(self, *users):
+        conversation = Conversation.objects.create(lastMessageDateTime=START)
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user=user)
+            for user in users
+        ])
+        return conversation
+
+    def write(self, conversation, sender, count, start=START):
+        return ChatMessage.objects.write([
+            ChatMessage(conversation=conversation, sender=sender, text=f"hi {n}",
+                        createdDateTime=start + timedelta(seconds=n))
+            for n in range(count)
+        ])
+
+    def test_create_conversation(self):
+        """Test a conversation is created between the user and participants"""
+        res = self.client.post(CONVERSATIONS_URL, {
+            "participantIds": [self.friend.id, self.user.id]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(res.data["participants"]),
+                         [self.user.id, self.friend.id])
+        self.assertEqual(res.data["unreadCount"], 0)
+
+    def test_create_conversation_unknown_participant(self):
+        """Test unknown participants are refused"""
+        res = self.client.post(CONVERSATIONS_URL, {
+            "participantIds": [self.friend.id, 999999]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Conversation.objects.exists())
+
+    def test_write_counts_unread_messages(self):
+        """Test a batch adds the messages others sent to each unread count"""
+        conversation = self.conversation(self.user, self.friend, self.other)
+        messages = [
+            ChatMessage(conversation=conversation, sender=sender, text="hi",
+                        createdDateTime=START + timedelta(seconds=n))
+            for n, sender in enumerate(
+                [self.friend, self.friend, self.user, self.other])
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            ChatMessage.objects.write(messages)
+
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(dict(conversation.members.values_list(
+            "user__userUsername", "unreadCount")),
+            {"user": 3, "friend": 2, "other": 3})
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.lastMessageDateTime,
+                         START + timedelta(seconds=3))
+
+    def test_list_conversations(self):
+        """Test the user's conversations, most recent first, with unread counts"""
+        older = self.conversation(self.user, self.friend)
+        newer = self.conversation(self.user, self.other)
+        self.conversation(self.friend, self.other)
+        self.write(older, self.friend, 2)
+        self.write(newer, self.other, 1, start=START + timedelta(hours=1))
+
+        res = self.client.get(CONVERSATIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(c["id"], c["unreadCount"]) for c in res.data["results"]],
+            [(newer.id, 1), (older.id, 2)])
+
+    def test_history_is_keyset_paginated(self):
+        """Test history pages follow the cursor, newest first"""
+        conversation = self.conversation(self.user, self.friend)
+        self.write(conversation, self.friend, 5)
+
+        res = self.client.get(messages_url(conversation.id), {"page_size": 3})
+        self.write(conversation, self.friend, 1, start=START + timedelta(hours=1))
+        second = self.client.get(res.data["next"])
+
+        self.assertEqual([m["text"] for m in res.data["results"]],
+                         ["hi 4", "hi 3", "hi 2"])
+        self.assertEqual([m["text"] for m in second.data["results"]],
+                         ["hi 1", "hi 0"])
+        self.assertIsNone(second.data["next"])
+
+    def test_history_of_other_conversation(self):
+        """Test the history of a conversation of others is not found"""
+        conversation = self.conversation(self.friend, self.other)
+
+        res = self.client.get(messages_url(conversation.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_read_conversation(self):
+        """Test reading a conversation resets the user's unread count only"""
+        conversation = self.conversation(self.user, self.friend, self.other)
+        self.write(conversation, self.other, 2)
+
+        res = self.client.post(read_url(conversation.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(dict(conversation.members.values_list(
+            "user__userUsername", "unreadCount")),
+            {"user": 0, "friend": 2, "other": 0})
+        res = self.client.post(read_url(
+            self.conversation(self.friend, self.other).id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
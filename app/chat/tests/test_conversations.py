@@ -0,0 +1,86 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from rest_framework.authtoken.models import Token
+
+from chat.routing import websocket_urlpatterns
+from core.models import ChatMessage, Conversation, ConversationMember
+
+
+class ConversationConsumerTests(TransactionTestCase):
+    """Test chatting in a conversation over WebSockets."""
+
+    def setUp(self):
+        users = get_user_model().objects
+        self.user = users.create_user(userEmailAddress="user@example.com",
+                                      password="test123", userUsername="user")
+        self.friend = users.create_user(userEmailAddress="friend@example.com",
+                                        password="test123", userUsername="friend")
+        self.conversation = Conversation.objects.create()
+        for user in (self.user, self.friend):
+            ConversationMember.objects.create(
+                conversation=self.conversation, user=user)
+
+    async def connect(self, user, conversation_id=None):
+        token = await sync_to_async(Token.objects.create)(user=user)
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f"/ws/chat/{conversation_id or self.conversation.id}/"
+            f"?token={token.key}")
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_members_only(self):
+        """Test sockets of users outside the conversation are refused"""
+        outsider = await sync_to_async(get_user_model().objects.create_user)(
+            userEmailAddress="outsider@example.com", password="test123",
+            userUsername="outsider")
+
+        communicator, connected = await self.connect(outsider)
+
+        self.assertFalse(connected)
+
+    async def test_burst_is_saved_in_one_batch(self):
+        """Test a burst of frames is inserted once and broadcast in order"""
+        sender, _ = await self.connect(self.user)
+        receiver, _ = await self.connect(self.friend)
+        write = mock.patch.object(ChatMessage.objects, "write",
+                                  wraps=ChatMessage.objects.write)
+
+        with write as write:
+            for n in range(5):
+                await sender.send_json_to({"message": f"hi {n}"})
+            received = [await receiver.receive_json_from(timeout=2)
+                        for _ in range(5)]
+            echoed = [await sender.receive_json_from(timeout=2)
+                      for _ in range(5)]
+
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual([m["text"] for m in received],
+                         [f"hi {n}" for n in range(5)])
+        self.assertEqual(received, echoed)
+        self.assertEqual(received[0]["type"], "chat.message")
+        self.assertEqual(received[0]["senderId"], self.user.id)
+        unread = await sync_to_async(dict)(ConversationMember.objects.values_list(
+            "user_id", "unreadCount"))
+        self.assertEqual(unread, {self.user.id: 0, self.friend.id: 5})
+        await sender.disconnect()
+        await receiver.disconnect()
+
+    async def test_invalid_message(self):
+        """Test empty and oversized messages are refused without saving"""
+        communicator, _ = await self.connect(self.user)
+
+        await communicator.send_json_to({"message": " "})
+        empty = await communicator.receive_json_from(timeout=2)
+        await communicator.send_json_to({"message": "x" * 5000})
+        large = await communicator.receive_json_from(timeout=2)
+
+        self.assertEqual(empty["type"], "chat.error")
+        self.assertEqual(large["error"], "Message is too long")
+        self.assertFalse(await sync_to_async(ChatMessage.objects.exists)())
+        await communicator.disconnect()
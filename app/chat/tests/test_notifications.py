@@ -0,0 +1,224 @@
+import asyncio
+import base64
+import json
+import os
+import struct
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import (
+    ApplicationCommunicator,
+    ChannelsLiveServerTestCase,
+    WebsocketCommunicator,
+)
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from chat.consumers import NotificationConsumer
+from core.models import Post
+
+
+class SmallOutboxConsumer(NotificationConsumer):
+    outbox_size = 2
+
+
+def share(post_id):
+    return {"type": "share.post", "post_id": post_id,
+            "shared_by_username": "sharer"}
+
+
+def ack(count=1):
+    return json.dumps({"type": "notifications.ack", "count": count})
+
+
+class WebSocketClient:
+    """Minimal WebSocket client reading text frames from a live server"""
+
+    @classmethod
+    async def connect(cls, host, port, path):
+        client = cls()
+        client.reader, client.writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        client.writer.write((
+            f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+        status = await client.reader.readuntil(b"\r\n\r\n")
+        if not status.startswith(b"HTTP/1.1 101"):
+            raise ConnectionError(status.decode())
+        return client
+
+    async def receive(self, timeout=5):
+        header = await asyncio.wait_for(self.reader.readexactly(2), timeout)
+        length = header[1] & 0x7F
+        if length == 126:
+            length, = struct.unpack("!H", await self.reader.readexactly(2))
+        elif length == 127:
+            length, = struct.unpack("!Q", await self.reader.readexactly(8))
+        return json.loads(await self.reader.readexactly(length))
+
+    async def send(self, text):
+        # Client frames are masked, a zero mask leaves the payload as is
+        payload = text.encode()
+        self.writer.write(bytes([0x81, 0x80 | len(payload)]) + bytes(4) + payload)
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class NotificationConsumerTests(TransactionTestCase):
+    """Test pushing notifications to the sockets of a user."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    async def connect(self, path):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), path)
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_connect_requires_token(self):
+        """Test sockets without a valid token are refused"""
+        for path in ("/ws/notifications/", "/ws/notifications/?token=invalid"):
+            communicator, connected = await self.connect(path)
+            self.assertFalse(connected)
+
+    async def test_socket_receives_user_notifications(self):
+        """Test a socket authenticated by token joins the user's group"""
+        communicator, connected = await self.connect(
+            f"/ws/notifications/?token={self.token.key}")
+        self.assertTrue(connected)
+
+        await get_channel_layer().group_send(f"user_{self.user.id}", share(7))
+
+        response = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(response["type"], "share.post")
+        self.assertEqual(response["post_id"], 7)
+        self.assertIn("User sharer has shared a post", response["message"])
+        await communicator.disconnect()
+
+    async def test_authorization_header(self):
+        """Test the token may be given in the Authorization header"""
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(), "/ws/notifications/",
+            headers=[(b"authorization", f"Token {self.token.key}".encode())])
+
+        connected, _ = await communicator.connect()
+
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+    @override_settings(NOTIFICATION_SEND_WINDOW=1)
+    async def test_slow_client_drops_oldest_notifications(self):
+        """Test unacknowledged notifications fill the outbox, which drops
+        the oldest and reports them
+        """
+        communicator = ApplicationCommunicator(SmallOutboxConsumer.as_asgi(), {
+            "type": "websocket", "path": "/ws/notifications/", "user": self.user,
+            "headers": [], "query_string": b"", "subprotocols": [],
+        })
+        await communicator.send_input({"type": "websocket.connect"})
+        self.assertEqual((await communicator.receive_output(timeout=2))["type"],
+                         "websocket.accept")
+
+        for post_id in range(1, 6):
+            await get_channel_layer().group_send(f"user_{self.user.id}", share(post_id))
+
+        received = [(await communicator.receive_output(timeout=2))["text"]]
+        self.assertTrue(await communicator.receive_nothing(timeout=0.3))
+        for _ in range(3):
+            await communicator.send_input({"type": "websocket.receive", "text": ack()})
+            received.append((await communicator.receive_output(timeout=2))["text"])
+        self.assertIn('"post_id": 1', received[0])
+        self.assertEqual(received[1], '{"type": "notifications.dropped", "count": 2}')
+        self.assertIn('"post_id": 4', received[2])
+        self.assertIn('"post_id": 5', received[3])
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait(timeout=2)
+
+    async def test_share_post_notifies_socket(self):
+        """Test sharing a post notifies the sockets of the recipient"""
+        sharer = await sync_to_async(get_user_model().objects.create_user)(
+            userEmailAddress="sharer@example.com", password="test123",
+            userUsername="sharer", userName="Sharer")
+        post = await sync_to_async(Post.objects.create)(
+            user=sharer, postReview="review", postRatingDelicious=5,
+            postRatingEatAgain=4, postRatingWorthIt=3)
+        communicator, _ = await self.connect(
+            f"/ws/notifications/?token={self.token.key}")
+        client = APIClient()
+        client.force_authenticate(sharer)
+
+        res = await sync_to_async(client.post)(reverse(
+            "post:share-post", kwargs={"post_id": post.id, "user_id": self.user.id}))
+
+        self.assertEqual(res.status_code, 200)
+        await sync_to_async(call_command)("dispatch_outbox", "--once",
+                                          stdout=StringIO())
+        response = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(response["post_id"], post.id)
+        self.assertEqual(response["shared_by_username"], "Sharer")
+        await communicator.disconnect()
+
+
+@override_settings(NOTIFICATION_SEND_WINDOW=1000)
+class NotificationServerTests(ChannelsLiveServerTestCase):
+    """Test notification flow control on a live daphne server."""
+    serve_static = False
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    async def test_server_holds_unacknowledged_notifications(self):
+        """Test the server sends a slow client no more than the window"""
+        client = await WebSocketClient.connect(
+            self.host, self._port, f"/ws/notifications/?token={self.token.key}")
+        # Let the server's channel layer listen for the user's group
+        await asyncio.sleep(0.5)
+        for post_id in range(1, 21):
+            await get_channel_layer().group_send(f"user_{self.user.id}", share(post_id))
+
+        received = []
+        with self.assertRaises(asyncio.TimeoutError):
+            while True:
+                received.append(await client.receive(timeout=1))
+        size = sum(len(json.dumps(message)) for message in received)
+        self.assertLessEqual(size, 1000)
+        self.assertLess(len(received), 20)
+
+        while len(received) < 20:
+            await client.send(ack())
+            received.append(await client.receive())
+        self.assertEqual([message["post_id"] for message in received],
+                         list(range(1, 21)))
+        await client.close()
+
+
+class LoadTestNotificationsTests(TransactionTestCase):
+    """Test the notification load test command."""
+
+    def test_loadtest_notifications(self):
+        """Test every socket receives its notification"""
+        out = StringIO()
+        call_command("loadtest_notifications", "--sockets", "20", "--users", "5",
+                     stdout=out)
+
+        self.assertIn("Delivered 20/20 notifications to 5 users", out.getvalue())
@@ -0,0 +1,17 @@
+"""
+URL mappings for the chat app
+"""
+from django.urls import path
+
+from chat import views
+
+app_name = "chat"
+
+urlpatterns = [
+    path("conversations/", views.ConversationListCreateView.as_view(),
+         name="conversation-list"),
+    path("conversations/<int:conversation_id>/messages/",
+         views.ChatMessageListView.as_view(), name="conversation-messages"),
+    path("conversations/<int:conversation_id>/read/",
+         views.ReadConversationView.as_view(), name="conversation-read"),
+]
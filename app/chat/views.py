@@ -1,3 +1,100 @@
-from django.shortcuts import render
+"""
+Views for the chat APIs.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from chat import serializers
+from core.authentication import CachedTokenAuthentication
+from core.models import ChatMessage, Conversation, ConversationMember, User
+from core.pagination import CursorPaginationMixin
+
+
+class ConversationPagination(CursorPaginationMixin, PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class ChatMessagePagination(CursorPaginationMixin, PageNumberPagination):
+    """Always paged by keyset, as new messages would shift page numbers"""
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def use_cursor(self, request):
+        return True
+
+
+class ConversationListCreateView(generics.ListCreateAPIView):
+    """Conversations of the user, most recently active first"""
+    serializer_class = serializers.ConversationSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = ConversationPagination
+
+    def get_queryset(self):
+        return (
+            Conversation.objects.filter(members__user=self.request.user)
+            .annotate(unreadCount=F("members__unreadCount"))
+            .prefetch_related("participants")
+            .order_by("-lastMessageDateTime", "-id")
+        )
+
+    def perform_create(self, serializer):
+        """Create a conversation between the user and the participants"""
+        user = self.request.user
+        ids = set(serializer.validated_data.pop("participantIds")) - {user.id}
+        found = set(User.objects.filter(
+            id__in=ids, is_active=True).values_list("id", flat=True))
+        if not ids or found != ids:
+            raise ValidationError({"participantIds": "Unknown participants."})
+        with transaction.atomic():
+            conversation = serializer.save()
+            ConversationMember.objects.bulk_create([
+                ConversationMember(conversation=conversation, user_id=user_id)
+                for user_id in sorted(ids | {user.id})
+            ])
+        conversation.unreadCount = 0
+
+
+class ChatMessageListView(generics.ListAPIView):
+    """Messages of a conversation of the user, newest first.
+
+    Paged by (createdDateTime, id) with ?cursor=, reading the
+    conversation's history index.
+    """
+    serializer_class = serializers.ChatMessageSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = ChatMessagePagination
+
+    def get_queryset(self):
+        member = get_object_or_404(
+            ConversationMember, conversation_id=self.kwargs["conversation_id"],
+            user=self.request.user)
+        return ChatMessage.objects.filter(
+            conversation_id=member.conversation_id,
+        ).order_by("-createdDateTime", "-id")
+
+
+class ReadConversationView(generics.GenericAPIView):
+    """Mark a conversation of the user as read"""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        updated = ConversationMember.objects.filter(
+            conversation_id=kwargs["conversation_id"], user=request.user,
+        ).update(unreadCount=0, lastReadDateTime=timezone.now())
+        if not updated:
+            return Response({"detail": "Conversation not found"},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
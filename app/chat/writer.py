@@ -0,0 +1,81 @@
+"""
+Batched writes of the chat messages received by the sockets of a process.
+"""
+import asyncio
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import DatabaseError
+
+from chat.serializers import ChatMessageSerializer
+from core.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+def conversation_group(conversation_id):
+    return f"conversation_{conversation_id}"
+
+
+def save_messages(messages):
+    """Insert the messages and return them serialized"""
+    return ChatMessageSerializer(
+        ChatMessage.objects.write(messages), many=True).data
+
+
+class MessageWriter:
+    """Coalesce the messages of all the consumers of an event loop.
+
+    Messages wait up to CHAT_MESSAGE_FLUSH_INTERVAL seconds for a batch of
+    CHAT_MESSAGE_BATCH_SIZE, which is inserted with one statement and then
+    broadcast to the conversation groups in the order received. A flush
+    task runs only while messages are waiting.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.task = None
+
+    def add(self, message, reply_channel):
+        """Queue a message, reply_channel is told if it cannot be saved"""
+        self.pending.append((message, reply_channel))
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+
+    async def run(self):
+        while self.pending:
+            if len(self.pending) < settings.CHAT_MESSAGE_BATCH_SIZE:
+                await asyncio.sleep(settings.CHAT_MESSAGE_FLUSH_INTERVAL)
+            batch = self.pending[:settings.CHAT_MESSAGE_BATCH_SIZE]
+            del self.pending[:len(batch)]
+            await self.flush(batch)
+
+    async def flush(self, batch):
+        channel_layer = get_channel_layer()
+        try:
+            saved = await sync_to_async(save_messages)(
+                [message for message, _ in batch])
+        except DatabaseError:
+            logger.exception("Could not save %d chat messages", len(batch))
+            for _, reply_channel in batch:
+                await channel_layer.send(reply_channel, {
+                    "type": "chat.error", "error": "Message not sent"})
+            return
+        for message in saved:
+            await channel_layer.group_send(
+                conversation_group(message["conversationId"]),
+                {"type": "chat.message", "message": message})
+
+
+_writers = weakref.WeakKeyDictionary()
+
+
+def get_writer():
+    """Return the message writer of the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _writers:
+        _writers[loop] = MessageWriter()
+    return _writers[loop]
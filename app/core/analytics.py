@@ -0,0 +1,199 @@
+"""
+Time-bucketed engagement series for the business and seller dashboards.
+
+Series are read from the hourly rollups of core.rollups, plus the raw
+events after the rollup watermarks, so coarser steps are derived on the fly
+and a dashboard is current even between two rollup runs.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import (
+    Case, Count, DateTimeField, F, IntegerField, Q, Sum, Value, When,
+)
+from django.db.models.functions import Ceil, Extract
+
+from core.models import (
+    EngagementWatermark, PostComment, PostLike, PostSave, PostShare,
+)
+
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+METRICS = ("like", "save", "share", "comment")
+
+HOUR = timedelta(hours=1)
+
+
+def parse_datetime_param(value):
+    """Return the naive UTC datetime of a URL path datetime parameter.
+
+    Raises ValueError unless value is 'YYYY-MM-DDTHH:MM:SS.sssZ', possibly
+    quoted or percent-encoded by the client.
+    """
+    value = value.replace("_", " ").replace("%20", " ").replace(
+        "%22", " ").replace("%3A", ":").strip('"').strip()
+    return datetime.strptime(value, DATETIME_FORMAT)
+
+
+def series_step(start, end):
+    """Return the distance between two points of a series over start..end"""
+    delta = end - start
+    if delta <= timedelta(hours=24):
+        return timedelta(hours=2)
+    if delta <= timedelta(days=7):
+        return timedelta(days=1)
+    if delta <= timedelta(days=31):
+        return timedelta(days=7)
+    if delta <= timedelta(days=365):
+        return timedelta(days=30)
+    return timedelta(days=1)
+
+
+def bucket(field, start, step):
+    """Return the index of the first series point at or after field.
+
+    Point k is start + k * step, so events up to start fall in bucket 0
+    or below.
+    """
+    offset = F(field) - Value(start, output_field=DateTimeField())
+    return Ceil(Extract(offset, "epoch") / step.total_seconds())
+
+
+def bucket_totals(queryset, field, start, end, step, delta=Count("id")):
+    """Return {bucket: summed delta} of the events in queryset up to end"""
+    rows = (
+        queryset.filter(**{f"{field}__lte": end})
+        .annotate(bucket=bucket(field, start, step))
+        .values("bucket")
+        .annotate(total=delta)
+        .values_list("bucket", "total")
+    )
+    return Counter({int(index): total for index, total in rows})
+
+
+def save_totals(posts, start, end, step, since=None):
+    """Return the net saves by bucket, of the saves and unsaves after since.
+
+    PostSave keeps the last save and unsave time of each pair only, so a
+    save counts from savedDateTime and, if the post is no longer saved,
+    until unsavedDateTime.
+    """
+    saved = {"savedDateTime__lte": end}
+    unsaved = {"postIsSaved": False, "unsavedDateTime__lte": end}
+    if since is not None:
+        saved["savedDateTime__gt"] = since
+        unsaved["unsavedDateTime__gt"] = since
+    rows = (
+        PostSave.objects.filter(Q(**saved) | Q(**unsaved), post__in=posts)
+        .annotate(
+            saved=Case(When(then=bucket("savedDateTime", start, step), **saved),
+                       default=None),
+            unsaved=Case(When(then=bucket("unsavedDateTime", start, step),
+                              **unsaved),
+                         default=None),
+        )
+        .values("saved", "unsaved")
+        .annotate(total=Count("id"))
+        .values_list("saved", "unsaved", "total")
+    )
+    totals = Counter()
+    for saved, unsaved, total in rows:
+        if saved is not None:
+            totals[int(saved)] += total
+        if unsaved is not None:
+            totals[int(unsaved)] -= total
+    return totals
+
+
+def rollup_totals(rollups, start, end, step):
+    """Return {metric: {bucket: total}} of hourly rollup rows up to end.
+
+    An hour is counted at its end, so a point never includes events after
+    it; the points are exact to the hour.
+    """
+    rows = (
+        rollups.filter(hour__lte=end - HOUR)
+        .annotate(bucket=bucket("hour", start - HOUR, step))
+        .values("bucket")
+        .annotate(like=Sum(F("likes") - F("unlikes")),
+                  save=Sum(F("saves") - F("unsaves")),
+                  share=Sum("shares"),
+                  comment=Sum("comments"))
+    )
+    totals = {metric: Counter() for metric in METRICS}
+    for row in rows:
+        for metric in METRICS:
+            totals[metric][int(row["bucket"])] += row[metric]
+    return totals
+
+
+def recent_totals(posts, start, end, step):
+    """Return {metric: {bucket: total}} of the events not rolled up yet"""
+    watermarks = EngagementWatermark.objects.positions()
+    args = (start, end, step)
+    return {
+        "like": bucket_totals(
+            PostLike.objects.filter(post__in=posts, id__gt=watermarks["like"].lastId),
+            "likeDateTime", *args,
+            delta=Sum(Case(When(isActive=True, then=1), default=-1,
+                           output_field=IntegerField()))),
+        "save": save_totals(posts, *args, since=watermarks["save"].lastDateTime),
+        "share": bucket_totals(
+            PostShare.objects.filter(post__in=posts,
+                                     id__gt=watermarks["share"].lastId),
+            "sharedDateTime", *args),
+        "comment": bucket_totals(
+            PostComment.objects.filter(post__in=posts,
+                                       id__gt=watermarks["comment"].lastId),
+            "commentPublishDateTime", *args),
+    }
+
+
+def engagement_totals(rollups, posts, start, end, step):
+    """Return {metric: {bucket: total}} of the rollups and newer events"""
+    totals = rollup_totals(rollups, start, end, step)
+    for metric, recent in recent_totals(posts, start, end, step).items():
+        totals[metric].update(recent)
+    return totals
+
+
+def engagement_series(rollups, posts, start, end):
+    """Return the cumulative likes, saves, shares and comments of posts.
+
+    rollups are the hourly rollup rows of posts, read with one grouped
+    query whatever the step; events after the rollup watermarks are read
+    from posts with one grouped query per metric. start and end are naive
+    UTC datetimes; the points are start + step, start + 2 * step, ... up to
+    end, each holding the running total of the events up to it.
+    """
+    step = series_step(start, end)
+    totals = engagement_totals(rollups, posts, start.replace(tzinfo=dt_timezone.utc),
+                               end.replace(tzinfo=dt_timezone.utc), step)
+
+    running = {
+        metric: sum(total for index, total in totals[metric].items() if index <= 0)
+        for metric in METRICS
+    }
+    results = []
+    index = 1
+    while start + index * step <= end:
+        point = {"timestamp": (start + index * step).isoformat()}
+        for metric in METRICS:
+            running[metric] += totals[metric][index]
+            point[metric] = running[metric]
+        results.append(point)
+        index += 1
+    return results
+
+
+def like_total(rollups, posts, until):
+    """Return the net likes of posts up to the naive UTC datetime until"""
+    until = until.replace(tzinfo=dt_timezone.utc)
+    watermark = EngagementWatermark.objects.positions()["like"]
+    rolled_up = rollups.filter(hour__lte=until - HOUR).aggregate(
+        total=Sum(F("likes") - F("unlikes")))["total"]
+    recent = PostLike.objects.filter(
+        post__in=posts, id__gt=watermark.lastId, likeDateTime__lte=until,
+    ).aggregate(total=Sum(Case(When(isActive=True, then=1), default=-1,
+                               output_field=IntegerField())))["total"]
+    return (rolled_up or 0) + (recent or 0)
@@ -0,0 +1,89 @@
+"""
+Async API views for endpoints waiting on network I/O.
+
+Under ASGI an async view holds no thread while it waits; its blocking
+calls run in a bounded pool of ASYNC_OFFLOAD_THREADS threads, and its
+database work in the request's thread through sync_to_async. Under WSGI
+Django runs the same views in an event loop of their own.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.views import APIView
+
+_executor = None
+
+
+def get_executor():
+    """Return the thread pool blocking calls are offloaded to"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_OFFLOAD_THREADS,
+            thread_name_prefix="offload")
+    return _executor
+
+
+@receiver(setting_changed)
+def reset_executor(*, setting, **kwargs):
+    global _executor
+    if setting == "ASYNC_OFFLOAD_THREADS" and _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def offload(func, *args, **kwargs):
+    """Run a blocking call that does not use the database in the pool.
+
+    Calls beyond the size of the pool wait for a thread, so a slow
+    upstream can hold ASYNC_OFFLOAD_THREADS threads at most.
+    """
+    return await sync_to_async(
+        func, thread_sensitive=False, executor=get_executor())(*args, **kwargs)
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers are coroutines.
+
+    Authentication, permissions and throttling run in the request's thread
+    as for a sync view, then the handler is awaited on the event loop.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        # Django 4.0 only awaits views that are coroutine functions
+        @wraps(view)
+        async def async_view(*args, **kwargs):
+            return await view(*args, **kwargs)
+
+        return async_view
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            method = request.method.lower()
+            if method in self.http_method_names:
+                handler = getattr(self, method, self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,197 @@
+"""
+Token authentication with cached token lookups.
+"""
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core import tokens
+from core.caching import LRUCache
+
+
+def user_values(user):
+    return {field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields}
+
+
+def restore_user(values):
+    """Return a new user instance built from cached field values"""
+    user_model = Token._meta.get_field("user").related_model
+    attnames = {field.attname for field in user_model._meta.concrete_fields}
+    # Copied so a view mutating JSON fields does not alter the cached values
+    values = {name: value for name, value in copy.deepcopy(values).items()
+              if name in attnames}
+    return user_model.from_db(DEFAULT_DB_ALIAS, list(values), list(values.values()))
+
+
+def user_cache_key(user_id):
+    # Cannot clash with token keys, which are hex digits or contain ":"
+    return f"user-{user_id}"
+
+
+def take_snapshot(token):
+    """Return the cacheable field values of a token and its user"""
+    return {
+        "token": {"key": token.key, "user_id": token.user_id,
+                  "created": token.created},
+        "user": user_values(token.user),
+    }
+
+
+def restore_snapshot(snapshot):
+    """Return new (user, token) instances built from a snapshot"""
+    user = restore_user(snapshot["user"])
+    token_values = snapshot["token"]
+    token = Token.from_db(DEFAULT_DB_ALIAS, list(token_values), list(token_values.values()))
+    token.user = user
+    return user, token
+
+
+class TokenCache:
+    """Token key to snapshot map.
+
+    When AUTH_TOKEN_CACHE_ALIAS names a Django cache, entries are kept
+    there for AUTH_TOKEN_CACHE_SHARED_TTL seconds and it is the only copy,
+    so an invalidation is seen by every process at once. Otherwise they
+    are kept in a per-process LRU for AUTH_TOKEN_CACHE_TTL seconds, and
+    with several processes the others may accept a revoked token or
+    return a stale user until their entry expires.
+    """
+    key_prefix = "auth-token:"
+
+    def __init__(self):
+        alias = settings.AUTH_TOKEN_CACHE_ALIAS
+        self.shared = caches[alias] if alias else None
+        self.local = None if alias else LRUCache(
+            settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+    def get(self, key):
+        if self.shared is not None:
+            return self.shared.get(self.key_prefix + key)
+        return self.local.get(key)
+
+    def set(self, key, snapshot):
+        if self.shared is not None:
+            self.shared.set(self.key_prefix + key, snapshot,
+                            settings.AUTH_TOKEN_CACHE_SHARED_TTL)
+        else:
+            self.local.set(key, snapshot)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        if self.shared is not None:
+            if keys:
+                self.shared.delete_many([self.key_prefix + key for key in keys])
+        else:
+            for key in keys:
+                self.local.delete(key)
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache()
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(*, setting, **kwargs):
+    global _token_cache
+    if setting.startswith("AUTH_TOKEN_CACHE"):
+        _token_cache = None
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Forget a token on logout or rotation"""
+    get_token_cache().delete(instance.key)
+
+
+def invalidate_users(user_ids):
+    """Forget the cached snapshots of users whose rows changed.
+
+    Saves are caught by the post_save receiver; call it after writing users
+    with update() or bulk_update(), which send no signal.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not settings.AUTH_TOKEN_CACHE_ENABLED:
+        return
+    keys = [user_cache_key(user_id) for user_id in user_ids]
+    keys += Token.objects.filter(user_id__in=user_ids).values_list("key", flat=True)
+    get_token_cache().delete_many(keys)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Forget the cached snapshot of a user whose row changed"""
+    if not created:
+        invalidate_users([instance.pk])
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    get_token_cache().delete(user_cache_key(instance.pk))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that caches the token owner between requests.
+
+    Turned on with AUTH_TOKEN_CACHE_ENABLED, off by default. Cached requests
+    are authenticated without a query and get fresh model instances built
+    from the cached snapshot.
+
+    With AUTH_SIGNED_TOKENS, signed access tokens from core.tokens are
+    accepted as well; request.auth is then the SignedToken.
+    """
+
+    def authenticate_signed(self, key):
+        token = tokens.verify_token(key)
+        if token is None or tokens.get_revocation_list().is_revoked(token):
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        cache = get_token_cache() if settings.AUTH_TOKEN_CACHE_ENABLED else None
+        values = cache.get(user_cache_key(token.user_id)) if cache else None
+        if values is not None:
+            user = restore_user(values)
+        else:
+            user_model = Token._meta.get_field("user").related_model
+            user = user_model.objects.filter(pk=token.user_id).first()
+            if user is None:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            if cache:
+                cache.set(user_cache_key(token.user_id), user_values(user))
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return user, token
+
+    def authenticate_credentials(self, key):
+        if tokens.is_signed_token(key):
+            if not settings.AUTH_SIGNED_TOKENS:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            return self.authenticate_signed(key)
+
+        if not settings.AUTH_TOKEN_CACHE_ENABLED:
+            return super().authenticate_credentials(key)
+
+        snapshot = get_token_cache().get(key)
+        if snapshot is not None:
+            return restore_snapshot(snapshot)
+
+        user, token = super().authenticate_credentials(key)
+        get_token_cache().set(key, take_snapshot(token))
+        return user, token
@@ -0,0 +1,142 @@
+"""
+Verification of Firebase ID tokens with cached certificates.
+"""
+import hashlib
+import re
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt
+
+from core.caching import LRUCache
+
+ID_TOKEN_CERT_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/"
+    "securetoken@system.gserviceaccount.com"
+)
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+
+class InvalidIdToken(ValueError):
+    """The ID token is malformed, expired or not signed by Firebase"""
+
+
+def parse_max_age(cache_control):
+    """Return the max-age of a Cache-Control header in seconds, or 0"""
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else 0
+
+
+class CertificateSource:
+    """Public certificates by key id, fetched from url.
+
+    The certificates are kept for the max-age of the response, so a process
+    fetches them a few times a day rather than on every login.
+    """
+
+    def __init__(self, url=ID_TOKEN_CERT_URL, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.certificates = None
+        self.expires = 0
+
+    def fetch(self):
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json(), parse_max_age(response.headers.get("Cache-Control"))
+
+    def get(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.certificates is None or self.expires <= now:
+                self.certificates, max_age = self.fetch()
+                self.expires = now + max_age
+            return self.certificates
+
+
+class StaticCertificateSource:
+    """Fixed certificates by key id, e.g. of a local key pair in tests"""
+
+    def __init__(self, certificates):
+        self.certificates = certificates
+
+    def get(self):
+        return self.certificates
+
+
+class IdTokenVerifier:
+    """Verify Firebase ID tokens of project_id.
+
+    Decoded claims are memoized by the token's SHA-256 until the token
+    expires, so a client retrying a login is not verified twice.
+    Subclasses may override get_certificate_source to verify tokens signed
+    with other keys.
+    """
+
+    def __init__(self, project_id=None, cache_size=None):
+        self.project_id = project_id or settings.FIREBASE_PROJECT_ID
+        self.certificates = self.get_certificate_source()
+        if cache_size is None:
+            cache_size = settings.FIREBASE_TOKEN_CACHE_SIZE
+        self.tokens = LRUCache(cache_size, ttl=0)
+
+    def get_certificate_source(self):
+        return CertificateSource(settings.FIREBASE_CERT_URL)
+
+    def verify(self, id_token):
+        """Return the claims of a valid ID token, with the user id as uid"""
+        if not isinstance(id_token, str) or not id_token:
+            raise InvalidIdToken("ID token must be a non-empty string")
+
+        key = hashlib.sha256(id_token.encode()).hexdigest()
+        claims = self.tokens.get(key)
+        if claims is None:
+            claims = self.decode(id_token)
+            ttl = claims["exp"] - time.time()
+            if ttl > 0:
+                self.tokens.set(key, claims, ttl)
+        return dict(claims)
+
+    def decode(self, id_token):
+        try:
+            claims = jwt.decode(id_token, certs=self.certificates.get(),
+                                audience=self.project_id)
+        except (ValueError, google_exceptions.GoogleAuthError) as e:
+            raise InvalidIdToken(str(e)) from e
+
+        if claims.get("iss") != ID_TOKEN_ISSUER_PREFIX + self.project_id:
+            raise InvalidIdToken('ID token has an incorrect "iss" claim')
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not 0 < len(subject) <= 128:
+            raise InvalidIdToken('ID token has an invalid "sub" claim')
+        claims["uid"] = subject
+        return claims
+
+
+_verifier = None
+
+
+def get_id_token_verifier():
+    """Return the verifier configured with FIREBASE_TOKEN_VERIFIER"""
+    global _verifier
+    if _verifier is None:
+        _verifier = import_string(settings.FIREBASE_TOKEN_VERIFIER)()
+    return _verifier
+
+
+@receiver(setting_changed)
+def reset_id_token_verifier(*, setting, **kwargs):
+    global _verifier
+    if setting.startswith("FIREBASE_"):
+        _verifier = None
+
+
+def verify_id_token(id_token):
+    return get_id_token_verifier().verify(id_token)
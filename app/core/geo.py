@@ -0,0 +1,92 @@
+"""
+Geospatial helpers for proximity queries.
+"""
+import math
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+# Kilometres per degree of latitude, rounded down so boxes err on the large side
+KM_PER_DEGREE = 110.5
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a coordinate"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            value, interval = longitude, lng_range
+        else:
+            value, interval = latitude, lat_range
+        middle = (interval[0] + interval[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            interval[0] = middle
+        else:
+            bits = bits * 2
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(geohash)
+
+
+def geohash_cell_size(precision):
+    """Return the (latitude, longitude) size in degrees of a geohash cell"""
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return (min_lat, min_lng, max_lat, max_lng) enclosing the radius"""
+    latitude = float(latitude)
+    longitude = float(longitude)
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(min(abs(latitude) + lat_delta, 89.9)))
+    lng_delta = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return (
+        max(latitude - lat_delta, -90.0),
+        max(longitude - lng_delta, -180.0),
+        min(latitude + lat_delta, 90.0),
+        min(longitude + lng_delta, 180.0),
+    )
+
+
+def covering_geohashes(box, max_cells=16):
+    """Return geohash prefixes whose cells cover the box.
+
+    The finest precision that needs at most max_cells prefixes is used.
+    None is returned when even single character cells would exceed it.
+    """
+    min_lat, min_lng, max_lat, max_lng = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lng_size = geohash_cell_size(precision)
+        lat_start = math.floor((min_lat + 90.0) / lat_size)
+        lat_end = math.floor((max_lat + 90.0) / lat_size)
+        lng_start = math.floor((min_lng + 180.0) / lng_size)
+        lng_end = math.floor((max_lng + 180.0) / lng_size)
+        cells = (lat_end - lat_start + 1) * (lng_end - lng_start + 1)
+        if cells > max_cells:
+            continue
+        prefixes = set()
+        for lat_index in range(lat_start, lat_end + 1):
+            for lng_index in range(lng_start, lng_end + 1):
+                # Encode the centre of every cell touched by the box
+                prefixes.add(encode_geohash(
+                    min((lat_index + 0.5) * lat_size - 90.0, 90.0),
+                    min((lng_index + 0.5) * lng_size - 180.0, 180.0),
+                    precision,
+                ))
+        return prefixes
+    return None
@@ -0,0 +1,143 @@
+"""
+IP geolocation from a local IP range database.
+"""
+import csv
+import ipaddress
+import logging
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+GeoLocation = namedtuple("GeoLocation", ["country", "region"])
+
+
+def get_client_ip(request):
+    """Return the client address, honouring the proxy's X-Forwarded-For"""
+    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if x_forwarded_for:
+        return x_forwarded_for.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR")
+
+
+class GeoIPProvider:
+    """Resolve IP addresses to a GeoLocation.
+
+    Subclasses implement _lookup. Results, misses included, are kept in a
+    bounded LRU cache.
+    """
+
+    def __init__(self, cache_size=None):
+        if cache_size is None:
+            cache_size = settings.GEOIP_CACHE_SIZE
+        self.lookup_cached = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def lookup(self, ip):
+        """Return the GeoLocation of ip, or None when it is unknown"""
+        try:
+            address = ipaddress.ip_address(ip)
+        except (TypeError, ValueError):
+            return None
+        return self.lookup_cached(address)
+
+    def _lookup(self, address):
+        raise NotImplementedError
+
+
+class NullProvider(GeoIPProvider):
+    """Provider that knows no address"""
+
+    def _lookup(self, address):
+        return None
+
+
+class RangeFileProvider(GeoIPProvider):
+    """Provider reading a DB-IP style CSV of IP ranges.
+
+    Each row is start_ip, end_ip, continent, country, region, ... as in the
+    DB-IP "IP to City Lite" download. Ranges are kept sorted by start in
+    compact arrays and found with a binary search.
+    """
+
+    def __init__(self, path=None, cache_size=None):
+        super().__init__(cache_size)
+        self.ranges = {
+            4: (array("Q"), array("Q"), array("I")),
+            6: ([], [], array("I")),
+        }
+        self.locations = []
+        path = path or settings.GEOIP_DATABASE_PATH
+        try:
+            with open(path, newline="", encoding="utf-8") as database:
+                self.load(csv.reader(database))
+        except OSError as e:
+            logger.warning("IP geolocation database unavailable: %s", e)
+
+    def load(self, rows):
+        location_ids = {}
+        parsed = {4: [], 6: []}
+        for row in rows:
+            try:
+                start = ipaddress.ip_address(row[0])
+                end = ipaddress.ip_address(row[1])
+                location = GeoLocation(row[3], row[4])
+            except (IndexError, ValueError):
+                continue
+            location_id = location_ids.setdefault(location, len(location_ids))
+            parsed[start.version].append((int(start), int(end), location_id))
+
+        self.locations = list(location_ids)
+        for version, version_ranges in parsed.items():
+            starts, ends, ids = self.ranges[version]
+            for start, end, location_id in sorted(version_ranges):
+                starts.append(start)
+                ends.append(end)
+                ids.append(location_id)
+
+    def _lookup(self, address):
+        starts, ends, ids = self.ranges[address.version]
+        value = int(address)
+        i = bisect_right(starts, value) - 1
+        if i >= 0 and value <= ends[i]:
+            return self.locations[ids[i]]
+        return None
+
+
+def ip_location(ip):
+    """Return the location stored in User.IPv4 for an address"""
+    geolocation = get_geoip_provider().lookup(ip)
+    if geolocation:
+        return {
+            "state": geolocation.region,
+            "country": geolocation.country
+        }
+    return "Location unavailable"
+
+
+_provider = None
+
+
+def get_geoip_provider():
+    """Return the provider configured with GEOIP_PROVIDER, loaded once.
+
+    app.wsgi and app.asgi load it as the server starts, so reading the
+    database is not left to the first request that needs a location.
+    """
+    global _provider
+    if _provider is None:
+        _provider = import_string(settings.GEOIP_PROVIDER)()
+    return _provider
+
+
+@receiver(setting_changed)
+def reset_geoip_provider(*, setting, **kwargs):
+    global _provider
+    if setting.startswith("GEOIP_"):
+        _provider = None
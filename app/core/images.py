@@ -0,0 +1,47 @@
+"""
+Image processing for uploaded pictures.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+IMAGE_READY = "ready"
+IMAGE_PROCESSING = "processing"
+IMAGE_FAILED = "failed"
+IMAGE_STATUS_CHOICES = [
+    (IMAGE_READY, "Ready"),
+    (IMAGE_PROCESSING, "Processing"),
+    (IMAGE_FAILED, "Failed"),
+]
+
+
+def is_uploaded(field_file):
+    """Return True if the image field holds a file not yet written to storage"""
+    return bool(field_file) and not field_file._committed
+
+
+def is_ready(field_file):
+    """Return True if the processed version of an uploaded image is in place"""
+    instance = field_file.instance
+    status_field = getattr(instance, "image_status_fields", {}).get(
+        field_file.field.name)
+    return status_field is None or getattr(instance, status_field) == IMAGE_READY
+
+
+def jpeg_name(name):
+    """Return the base name of a file with a .jpeg extension"""
+    return f"{os.path.splitext(os.path.basename(name))[0]}.jpeg"
+
+
+def resize_to_width(file, width, quality):
+    """Return a JPEG of the image scaled to the given width"""
+    img = ImageOps.exif_transpose(Image.open(file))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    height = int(width * img.height / img.width)
+    img = img.resize((width, height), Image.LANCZOS)
+    buffer = BytesIO()
+    img.save(fp=buffer, format="JPEG", quality=quality)
+    return ContentFile(buffer.getvalue())
@@ -0,0 +1,82 @@
+"""
+Write-behind tracking of the address users were last seen from.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from core.authentication import invalidate_users
+from core.geoip import ip_location
+
+logger = logging.getLogger(__name__)
+
+
+class LastSeenTracker:
+    """Coalesce last-seen address changes in memory and write them in batches.
+
+    Only changed addresses are queued, one entry per user, and the queue is
+    flushed with a single bulk_update at most once per
+    LAST_SEEN_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.last_flush = time.monotonic()
+
+    def record(self, user, ip):
+        """Queue the address of a request by user if it changed"""
+        if ip:
+            with self.lock:
+                if ip != (user.IPv4 or {}).get("ipAddress"):
+                    self.pending[user.pk] = ip
+                else:
+                    # Back at the stored address, so the queued one is stale
+                    self.pending.pop(user.pk, None)
+        if time.monotonic() - self.last_flush >= settings.LAST_SEEN_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Write the queued addresses and return the number of users updated.
+
+        It runs within the request crossing the interval, so a database
+        error is logged and the addresses are queued again for the next
+        flush rather than failing the request.
+        """
+        from core.models import User
+
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return 0
+        users = [
+            User(pk=pk, IPv4={"ipAddress": ip, "location": ip_location(ip)})
+            for pk, ip in pending.items()
+        ]
+        try:
+            updated = User.objects.bulk_update(
+                users, ["IPv4"], batch_size=settings.LAST_SEEN_BATCH_SIZE)
+        except DatabaseError as e:
+            logger.warning("Could not write last-seen addresses: %s", e)
+            with self.lock:
+                # Addresses recorded meanwhile are newer
+                self.pending = {**pending, **self.pending}
+            return 0
+        invalidate_users(pending)
+        return updated
+
+
+last_seen = LastSeenTracker()
+
+
+@atexit.register
+def flush_at_exit():
+    try:
+        last_seen.flush()
+    except DatabaseError as e:
+        logger.warning("Could not write last-seen addresses: %s", e)
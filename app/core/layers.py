@@ -0,0 +1,205 @@
+"""
+Channel layer delivering across the processes of a host through Postgres
+LISTEN/NOTIFY, so no broker is needed besides the database.
+
+Each process listens on one Postgres channel for its process-specific
+channels and on one per group that has a member in the process. A
+group_send is a single NOTIFY, which Postgres delivers to the processes
+listening for the group only. Messages are queued per channel up to its
+capacity and dropped once older than expiry; group memberships end after
+group_expiry. Normal channels stay local to their process.
+"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from contextlib import suppress
+
+import psycopg2
+from asgiref.sync import sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.db import connections
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_SIZE = 7999
+
+
+class PostgresChannelLayer(InMemoryChannelLayer):
+    """Channel layer fanning group and process-specific messages out with
+    Postgres NOTIFY on the database alias.
+    """
+
+    def __init__(self, alias="default", prefix="channels", expiry=60,
+                 group_expiry=86400, capacity=100, channel_capacity=None,
+                 **kwargs):
+        super().__init__(expiry=expiry, group_expiry=group_expiry,
+                         capacity=capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.alias = alias
+        self.prefix = prefix
+        self.client_prefix = uuid.uuid4().hex[:12]
+        self.listener = None
+        self.listener_loop = None
+        self.listening = set()
+        self.receivers = 0
+
+    extensions = ["groups", "flush"]
+
+    # Postgres channels
+
+    def process_channel(self, client_prefix):
+        return f"{self.prefix}_p_{client_prefix}"
+
+    def group_channel(self, group):
+        return f"{self.prefix}_g_{hashlib.sha1(group.encode()).hexdigest()[:32]}"
+
+    def connect(self):
+        params = connections[self.alias].get_connection_params()
+        connection = psycopg2.connect(**params)
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        return connection
+
+    def notify(self, pg_channel, name, message):
+        """NOTIFY through the Django connection, so a message sent within a
+        transaction is delivered once it commits.
+        """
+        payload = json.dumps([name, message])
+        if len(payload.encode()) > MAX_PAYLOAD_SIZE:
+            raise ValueError(f"Message for {name} is too large to send")
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [pg_channel, payload])
+
+    def listen(self, pg_channel):
+        if pg_channel not in self.listening:
+            self.listening.add(pg_channel)
+            with self.listener.cursor() as cursor:
+                cursor.execute(f'LISTEN "{pg_channel}"')
+
+    def unlisten(self, pg_channel):
+        if pg_channel in self.listening:
+            self.listening.discard(pg_channel)
+            with self.listener.cursor() as cursor:
+                cursor.execute(f'UNLISTEN "{pg_channel}"')
+
+    def ensure_listener(self):
+        """Listen from the running event loop, reconnecting if it changed"""
+        loop = asyncio.get_running_loop()
+        if self.listener is not None and self.listener_loop is loop:
+            return
+        self.stop_listener()
+        self.listener = self.connect()
+        self.listener_loop = loop
+        self.listen(self.process_channel(self.client_prefix))
+        for group in self.groups:
+            self.listen(self.group_channel(group))
+        loop.add_reader(self.listener.fileno(), self.dispatch)
+
+    def stop_listener(self):
+        if self.listener is None:
+            return
+        with suppress(Exception):
+            self.listener_loop.remove_reader(self.listener.fileno())
+        with suppress(Exception):
+            self.listener.close()
+        self.listener = None
+        self.listener_loop = None
+        self.listening = set()
+
+    def dispatch(self):
+        """Queue the notifications received by the listener"""
+        try:
+            self.listener.poll()
+        except (psycopg2.InterfaceError, psycopg2.OperationalError):
+            # Listen again from the next receive or group_add
+            self.stop_listener()
+            return
+        while self.listener.notifies:
+            notify = self.listener.notifies.pop(0)
+            name, message = json.loads(notify.payload)
+            if notify.channel == self.process_channel(self.client_prefix):
+                self.deliver(name, message)
+            else:
+                for channel in list(self.groups.get(name, {})):
+                    self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        """Queue a message, dropping it if the channel is full"""
+        queue = self.channels.setdefault(channel, asyncio.Queue())
+        if queue.qsize() < self.get_capacity(channel):
+            queue.put_nowait((time.time() + self.expiry, message))
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        """Send a message onto a channel.
+
+        Messages for another process are dropped rather than raising
+        ChannelFull when its queue is full.
+        """
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert "__asgi_channel__" not in message
+
+        non_local = self.non_local_name(channel)
+        client_prefix = non_local.rstrip("!").rsplit(".", 1)[-1]
+        if "!" in channel and client_prefix != self.client_prefix:
+            await sync_to_async(self.notify)(
+                self.process_channel(client_prefix), channel, message)
+            return
+
+        queue = self.channels.setdefault(channel, asyncio.Queue())
+        if queue.qsize() >= self.get_capacity(channel):
+            raise ChannelFull(channel)
+        self.deliver(channel, json.loads(json.dumps(message)))
+
+    async def receive(self, channel):
+        self.ensure_listener()
+        self.receivers += 1
+        try:
+            return await super().receive(channel)
+        except asyncio.CancelledError:
+            # The last consumer went away, an idle process holds no listener
+            if self.receivers == 1 and not self.groups:
+                self.stop_listener()
+            raise
+        finally:
+            self.receivers -= 1
+
+    async def new_channel(self, prefix="specific"):
+        return f"{prefix}.{self.client_prefix}!{uuid.uuid4().hex}"
+
+    def _clean_expired(self):
+        super()._clean_expired()
+        for group, channels in list(self.groups.items()):
+            if not channels:
+                del self.groups[group]
+                if self.listener is not None:
+                    self.unlisten(self.group_channel(group))
+
+    async def flush(self):
+        await super().flush()
+        self.stop_listener()
+
+    async def close(self):
+        self.stop_listener()
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        self.ensure_listener()
+        self.listen(self.group_channel(group))
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        if group not in self.groups and self.listener is not None:
+            self.unlisten(self.group_channel(group))
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        assert self.valid_group_name(group), "Invalid group name"
+        await sync_to_async(self.notify)(
+            self.group_channel(group), group, message)
@@ -0,0 +1,246 @@
+"""
+Django command comparing the uwsgi and ASGI serving modes under a slow
+upstream and on CPU-bound requests
+"""
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from google.auth import crypt, jwt
+
+from core import firebase
+from core.models import User
+
+KEY_ID = "benchmark"
+PASSWORD = "benchmark-password"
+
+# Both servers as run.sh starts them, serving HTTP directly. uwsgi forks its
+# workers, while run.sh starts one daphne process per worker behind nginx
+SERVERS = {
+    "uwsgi": lambda port, workers: [
+        "uwsgi", "--http", f"127.0.0.1:{port}", "--workers", str(workers),
+        "--master", "--enable-threads", "--module", "app.wsgi",
+        "--die-on-term", "--disable-logging",
+    ],
+    "asgi": lambda port, workers: [
+        "daphne", "--bind", "127.0.0.1", "--port", str(port),
+        "--verbosity", "0", "app.asgi:application",
+    ],
+}
+
+
+class UncachedCertificateSource(firebase.CertificateSource):
+    """Certificates fetched again for every token, as on a cache miss"""
+
+    def get(self):
+        return self.fetch()[0]
+
+
+class SlowUpstreamVerifier(firebase.IdTokenVerifier):
+    """Verifier fetching the certificates of FIREBASE_CERT_URL for every token"""
+
+    def get_certificate_source(self):
+        return UncachedCertificateSource(settings.FIREBASE_CERT_URL)
+
+
+def start_upstream(certificates, delay):
+    """Serve the certificates after delay seconds on a local port"""
+    body = json.dumps(certificates).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "max-age=0")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    """Django command timing Firebase logins against both serving modes"""
+    help = ("Start the app under uwsgi and under daphne and report the "
+            "throughput of Firebase logins, whose certificates come from a "
+            "slow local upstream, and of password logins, which are CPU-bound.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", nargs="+", choices=list(SERVERS),
+                            default=list(SERVERS))
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--delay", type=float, default=0.2,
+                            help="Seconds the upstream takes to answer.")
+        parser.add_argument("--scenarios", nargs="+", choices=["firebase", "password"],
+                            default=["firebase", "password"])
+        parser.add_argument("--workers", type=int, default=4,
+                            help="uwsgi workers and daphne processes, as in run.sh.")
+
+    def create_tokens(self, private_key, uid, count):
+        signer = crypt.RSASigner.from_string(private_key, key_id=KEY_ID)
+        now = int(time.time())
+        return [jwt.encode(signer, {
+            "iss": firebase.ID_TOKEN_ISSUER_PREFIX + settings.FIREBASE_PROJECT_ID,
+            "aud": settings.FIREBASE_PROJECT_ID,
+            "sub": uid,
+            "iat": now - 10,
+            "exp": now + 3600,
+            "jti": str(n),
+            "email": f"{uid}@example.com",
+            "name": "Benchmark",
+        }).decode() for n in range(count)]
+
+    def start_servers(self, name, env, workers):
+        """Start the processes of a server, returning them with their URLs"""
+        if shutil.which(SERVERS[name](0, workers)[0]) is None:
+            self.stdout.write(self.style.WARNING(f"{name}: not installed"))
+            return [], []
+        processes, urls = [], []
+        try:
+            for _ in range(workers if name == "asgi" else 1):
+                process, url = self.start_server(name, env, workers)
+                processes.append(process)
+                urls.append(url)
+        except CommandError:
+            self.stop(processes)
+            raise
+        return processes, urls
+
+    def stop(self, processes):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+    def start_server(self, name, env, workers):
+        port = free_port()
+        args = SERVERS[name](port, workers)
+        log = tempfile.TemporaryFile()
+        process = subprocess.Popen(args, cwd=settings.BASE_DIR, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=log)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                log.seek(0)
+                raise CommandError(
+                    f"{name} exited: {log.read().decode()[-2000:]}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return process, f"http://127.0.0.1:{port}"
+            except OSError:
+                time.sleep(0.2)
+        process.kill()
+        raise CommandError(f"{name} did not start listening")
+
+    def run(self, urls, path, payloads, concurrency):
+        """Post each payload, spread over the URLs in turn as nginx does,
+        returning the status codes and latencies
+        """
+        def login(index):
+            started = time.monotonic()
+            response = requests.post(urls[index % len(urls)] + path,
+                                     json=payloads[index], timeout=300)
+            return response.status_code, time.monotonic() - started
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            return list(pool.map(login, range(len(payloads))))
+
+    def benchmark(self, name, env, scenarios, options):
+        processes, urls = self.start_servers(name, env, options["workers"])
+        if not processes:
+            return
+        try:
+            for scenario, (path, payloads) in scenarios.items():
+                # The first login registers the user and loads the app
+                self.run(urls, path, payloads[:len(urls)], 1)
+                started = time.monotonic()
+                results = self.run(urls, path, payloads[len(urls):],
+                                   options["concurrency"])
+                self.report(f"{name} x{len(processes)}, {scenario}", results,
+                            time.monotonic() - started)
+        finally:
+            self.stop(processes)
+
+    def report(self, label, results, elapsed):
+        ok = sum(1 for code, _ in results if code == 200)
+        latencies = sorted(latency for _, latency in results)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"{label}: {ok}/{len(results)} logins in {elapsed:.2f}s, "
+            f"{len(results) / elapsed:.1f}/s, "
+            f"median {statistics.median(latencies) * 1000:.0f}ms, "
+            f"p95 {p95 * 1000:.0f}ms")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+        upstream = start_upstream({KEY_ID: public_pem}, options["delay"])
+        uid = f"benchmark-{uuid.uuid4().hex}"
+        email = f"{uid}-password@example.com"
+        User.objects.create_user(userEmailAddress=email, password=PASSWORD)
+        env = dict(
+            os.environ,
+            FIREBASE_TOKEN_VERIFIER=f"{__name__}.SlowUpstreamVerifier",
+            FIREBASE_CERT_URL=f"http://127.0.0.1:{upstream.server_port}/",
+            ALLOWED_HOSTS=",".join(
+                filter(None, [os.environ.get("ALLOWED_HOSTS"), "127.0.0.1"])),
+        )
+        self.stdout.write(
+            f"{options['requests']} logins, {options['concurrency']} at a time, "
+            f"upstream answering in {options['delay'] * 1000:.0f}ms, "
+            f"{os.cpu_count()} CPUs")
+
+        count = options["requests"] + options["workers"]
+        try:
+            for name in options["servers"]:
+                scenarios = {
+                    "firebase": ("/api/v1/auth/firebase/", [
+                        {"idToken": token}
+                        for token in self.create_tokens(private_pem, uid, count)]),
+                    "password": ("/api/v1/user/login/", [
+                        {"userEmailAddress": email, "password": PASSWORD}] * count),
+                }
+                self.benchmark(name, env, {
+                    scenario: scenarios[scenario]
+                    for scenario in options["scenarios"]}, options)
+        finally:
+            upstream.shutdown()
+            User.objects.filter(firebase_uid=uid).delete()
+            User.objects.filter(userEmailAddress=email).delete()
@@ -0,0 +1,59 @@
+"""
+Django command to send the outbox messages to the channel layer
+"""
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from core.models import OutboxMessage
+
+
+async def send_batch(layer, messages):
+    """Send messages in order, returning {message id: error} of failures"""
+    errors = {}
+    for message in messages:
+        try:
+            await layer.group_send(message.recipient, message.message)
+        except Exception as e:
+            errors[message.id] = repr(e)
+    return errors
+
+
+class Command(BaseCommand):
+    """Django command running the outbox dispatcher"""
+    help = "Send queued outbox messages to the channel layer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--sleep", type=float, default=0.5,
+                            help="Seconds to wait when no message is due.")
+        parser.add_argument("--stale-after", type=int, default=300,
+                            help="Seconds after which a processing message is retried.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once no message is due.")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        layer = get_channel_layer()
+        stale_after = timedelta(seconds=options["stale_after"])
+        sent = 0
+        while True:
+            OutboxMessage.objects.requeue_stale(stale_after)
+            messages = OutboxMessage.objects.claim(options["batch_size"])
+            errors = async_to_sync(send_batch)(layer, messages)
+            delivered = [message.id for message in messages
+                         if message.id not in errors]
+            OutboxMessage.objects.filter(id__in=delivered).delete()
+            sent += len(delivered)
+            for message in messages:
+                if message.id in errors:
+                    message.retry(errors[message.id])
+            if not messages:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} outbox messages"))
@@ -0,0 +1,39 @@
+"""
+Django command to generate the missing renditions of stored pictures
+"""
+from django.core.management.base import BaseCommand
+
+from core.images import IMAGE_READY
+from core.models import Post, User
+from core.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    """Django command to backfill picture renditions"""
+    help = "Generate the WebP and JPEG renditions of processed pictures."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        self.stdout.write("Generating picture renditions...")
+        generated = 0
+        for model in (Post, User):
+            for field_name, status_field in model.image_status_fields.items():
+                rows = (
+                    model.objects.exclude(**{field_name: ""})
+                    .exclude(**{f"{field_name}__isnull": True})
+                    .filter(**{status_field: IMAGE_READY})
+                    .only("pk", field_name, status_field)
+                )
+                for instance in rows.iterator(chunk_size=options["batch_size"]):
+                    try:
+                        generate_renditions(getattr(instance, field_name))
+                    except (OSError, ValueError) as e:
+                        self.stderr.write(
+                            f"{model.__name__} {instance.pk} {field_name}: {e}")
+                        continue
+                    generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Renditions in place for {generated} pictures"))
@@ -0,0 +1,99 @@
+"""
+Django command measuring the fan-out latency of WebSocket notifications
+"""
+import asyncio
+import resource
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from chat.consumers import NotificationConsumer
+
+
+class Command(BaseCommand):
+    """Django command opening sockets in process and timing group sends"""
+    help = ("Open N notification sockets in this process, send one "
+            "notification to each user's group and report the latency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sockets", type=int, default=1000)
+        parser.add_argument("--users", type=int, default=None,
+                            help="Users the sockets are spread over, one each by default.")
+        parser.add_argument("--timeout", type=float, default=30.0)
+
+    async def open_socket(self, application, user):
+        socket = ApplicationCommunicator(application, {
+            "type": "websocket",
+            "path": "/ws/notifications/",
+            "user": user,
+            "headers": [],
+            "query_string": b"",
+            "subprotocols": [],
+        })
+        await socket.send_input({"type": "websocket.connect"})
+        response = await socket.receive_output(timeout=10)
+        if response["type"] != "websocket.accept":
+            raise RuntimeError(f"Socket refused: {response}")
+        return socket
+
+    async def run(self, sockets, users, timeout):
+        application = NotificationConsumer.as_asgi()
+        # Unsaved users, so the sockets need no rows or tokens
+        accounts = [get_user_model()(id=pk) for pk in range(1, users + 1)]
+        opened = time.monotonic()
+        clients = await asyncio.gather(*(
+            self.open_socket(application, accounts[index % users])
+            for index in range(sockets)))
+        self.stdout.write(
+            f"Opened {sockets} sockets in {time.monotonic() - opened:.2f}s")
+        await asyncio.sleep(0.5)
+
+        latencies = []
+        sent = {}
+
+        async def receive(socket, account):
+            await socket.receive_output(timeout=timeout)
+            latencies.append(time.monotonic() - sent[account.id])
+
+        waiting = [asyncio.ensure_future(receive(socket, accounts[index % users]))
+                   for index, socket in enumerate(clients)]
+        layer = get_channel_layer()
+        started = time.monotonic()
+        for account in accounts:
+            sent[account.id] = time.monotonic()
+            await layer.group_send(f"user_{account.id}", {
+                "type": "share.post",
+                "post_id": 1,
+                "shared_by_username": "loadtest",
+            })
+        await asyncio.gather(*waiting, return_exceptions=True)
+        self.stdout.write(
+            f"Sent {users} group messages in {time.monotonic() - started:.2f}s")
+
+        for socket in clients:
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait(timeout=10)
+        return sorted(latencies)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        sockets = options["sockets"]
+        users = min(options["users"] or sockets, sockets)
+        latencies = async_to_sync(self.run)(sockets, users, options["timeout"])
+
+        if not latencies:
+            self.stdout.write(self.style.ERROR("No notification was delivered"))
+            return
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"Delivered {len(latencies)}/{sockets} notifications to {users} users: "
+            f"median {statistics.median(latencies) * 1000:.1f}ms, "
+            f"p95 {p95 * 1000:.1f}ms, "
+            f"max {latencies[-1] * 1000:.1f}ms")
+        self.stdout.write(
+            f"Peak memory {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024}MB")
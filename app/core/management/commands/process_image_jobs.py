@@ -0,0 +1,40 @@
+"""
+Django command to resize uploaded images queued in ImageJob
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.models import ImageJob
+
+
+class Command(BaseCommand):
+    """Django command running the image processing worker"""
+    help = "Resize uploaded post and profile pictures in the background."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--sleep", type=float, default=2.0,
+                            help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--stale-after", type=int, default=600,
+                            help="Seconds after which a processing job is retried.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        stale_after = timedelta(seconds=options["stale_after"])
+        processed = 0
+        while True:
+            ImageJob.objects.requeue_stale(stale_after)
+            jobs = ImageJob.objects.claim(options["batch_size"])
+            for job in jobs:
+                job.run()
+                processed += 1
+            if not jobs:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} image jobs"))
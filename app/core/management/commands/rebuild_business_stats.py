@@ -0,0 +1,28 @@
+"""
+Django command to rebuild the per-business stats rollups
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Business, BusinessStats
+
+
+class Command(BaseCommand):
+    """Django command to recompute BusinessStats"""
+    help = "Recompute the BusinessStats rollup of every business."
+
+    def add_arguments(self, parser):
+        parser.add_argument("business_ids", nargs="*", type=int,
+                            help="Only rebuild these businesses.")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        self.stdout.write("Rebuilding business stats...")
+        businesses = Business.objects.order_by("id")
+        if options["business_ids"]:
+            businesses = businesses.filter(id__in=options["business_ids"])
+        rebuilt = 0
+        for business_id in businesses.values_list("id", flat=True).iterator():
+            if BusinessStats.objects.refresh(business_id):
+                rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt the stats of {rebuilt} businesses"))
@@ -0,0 +1,59 @@
+"""
+Django command to rebuild the like counters from the current like state
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Value, OuterRef, Subquery, F
+from django.db.models.functions import Coalesce
+
+from core.models import Post, PostLikeState, PostComment, CommentLikeState
+
+
+def like_total(states, target):
+    """Return a subquery counting the current likes of the target row"""
+    return Coalesce(
+        Subquery(
+            states.objects.filter(**{target: OuterRef("pk")}, isLiked=True)
+            .values(target)
+            .annotate(total=Count("id"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    """Django command to repair drifted like counters"""
+    help = "Rebuild Post.postLikeCount and PostComment.commentLikeCount."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def rebuild(self, model, states, target, field, batch_size):
+        """Rewrite the counters of the rows whose value has drifted"""
+        drifted = (
+            model.objects.annotate(expected=like_total(states, target))
+            .exclude(**{field: F("expected")})
+            .values_list("pk", "expected")
+        )
+        batch = []
+        updated = 0
+        for pk, expected in drifted.iterator(chunk_size=batch_size):
+            batch.append(model(pk=pk, **{field: expected}))
+            if len(batch) >= batch_size:
+                updated += model.objects.bulk_update(batch, [field])
+                batch = []
+        if batch:
+            updated += model.objects.bulk_update(batch, [field])
+        return updated
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        batch_size = options["batch_size"]
+        self.stdout.write("Rebuilding like counters...")
+        posts = self.rebuild(
+            Post, PostLikeState, "post", "postLikeCount", batch_size)
+        comments = self.rebuild(
+            PostComment, CommentLikeState, "comment", "commentLikeCount",
+            batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {posts} post and {comments} comment counters"))
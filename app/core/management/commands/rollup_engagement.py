@@ -0,0 +1,34 @@
+"""
+Django command to roll new engagement events into the hourly rollups
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rollups import roll_up
+
+
+class Command(BaseCommand):
+    """Django command running the engagement rollup worker"""
+    help = "Roll likes, saves, shares, comments and views into hourly rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000,
+                            help="Events of each source rolled up per transaction.")
+        parser.add_argument("--sleep", type=float, default=300.0,
+                            help="Seconds to wait once the rollups are current.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the rollups are current.")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        processed = 0
+        while True:
+            count = roll_up(options["batch_size"])
+            processed += count
+            if count < options["batch_size"]:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {processed} events"))
@@ -0,0 +1,29 @@
+"""
+Django command to recompute the trending menu items and businesses
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    """Django command running the trending worker"""
+    help = "Recompute the trending positions of menu items and businesses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=300.0,
+                            help="Seconds to wait between two refreshes.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit after one refresh.")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        while True:
+            changed = refresh_trending(batch_size=options["batch_size"])
+            self.stdout.write(f"Updated {changed} trending positions")
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
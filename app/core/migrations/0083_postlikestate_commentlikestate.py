@@ -0,0 +1,70 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_like_states(apps, schema_editor):
+    """Seed the like state tables with the latest event of every pair"""
+    for history_name, state_name, target in (
+        ("PostLike", "PostLikeState", "post_id"),
+        ("CommentLike", "CommentLikeState", "comment_id"),
+    ):
+        history = apps.get_model("core", history_name)
+        state = apps.get_model("core", state_name)
+        latest = history.objects.order_by(
+            "user_id", target, "-likeDateTime").distinct("user_id", target)
+        batch = []
+        for like in latest.iterator(chunk_size=1000):
+            batch.append(state(
+                user_id=like.user_id,
+                isLiked=like.isActive,
+                likedDateTime=like.likeDateTime if like.isActive else None,
+                unlikedDateTime=None if like.isActive else like.likeDateTime,
+                **{target: getattr(like, target)},
+            ))
+            if len(batch) >= 1000:
+                state.objects.bulk_create(batch)
+                batch = []
+        state.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0082_alter_menuitem_business'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostLikeState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('isLiked', models.BooleanField(default=False)),
+                ('likedDateTime', models.DateTimeField(blank=True, null=True)),
+                ('unlikedDateTime', models.DateTimeField(blank=True, null=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_states', to='core.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_like_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'post')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CommentLikeState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('isLiked', models.BooleanField(default=False)),
+                ('likedDateTime', models.DateTimeField(blank=True, null=True)),
+                ('unlikedDateTime', models.DateTimeField(blank=True, null=True)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_states', to='core.postcomment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_like_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'comment')},
+            },
+        ),
+        migrations.RunPython(
+            backfill_like_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:08
+
+from django.db import migrations, models
+
+from core.geo import encode_geohash
+
+
+def backfill_business_geohash(apps, schema_editor):
+    """Compute the geohash of every business with a location"""
+    Business = apps.get_model("core", "Business")
+    located = Business.objects.filter(
+        businessOperatingLatitude__isnull=False,
+        businessOperatingLongitude__isnull=False,
+    )
+    batch = []
+    for business in located.iterator(chunk_size=1000):
+        business.businessGeohash = encode_geohash(
+            business.businessOperatingLatitude,
+            business.businessOperatingLongitude)
+        batch.append(business)
+    Business.objects.bulk_update(
+        batch, ["businessGeohash"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0083_postlikestate_commentlikestate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='businessGeohash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=12),
+        ),
+        migrations.RunPython(
+            backfill_business_geohash, migrations.RunPython.noop),
+    ]
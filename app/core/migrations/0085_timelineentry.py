@@ -0,0 +1,69 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def backfill_timelines(apps, schema_editor):
+    """Count followers and copy recent posts of followed users to timelines"""
+    User = apps.get_model("core", "User")
+    Post = apps.get_model("core", "Post")
+    TimelineEntry = apps.get_model("core", "TimelineEntry")
+    Follow = User._meta.get_field("following").remote_field.through
+
+    follower_counts = User.objects.annotate(
+        total=Count("followers")).values_list("pk", "total")
+    for pk, total in follower_counts.iterator(chunk_size=1000):
+        User.objects.filter(pk=pk).update(userFollowers=total)
+
+    for follow in Follow.objects.iterator(chunk_size=1000):
+        posts = Post.objects.filter(user_id=follow.to_user_id).order_by(
+            "-postPublishDateTime", "-id")[:settings.TIMELINE_BACKFILL_SIZE]
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=follow.from_user_id,
+                    post_id=post_id,
+                    author_id=follow.to_user_id,
+                    postPublishDateTime=published,
+                )
+                for post_id, published in posts.values_list(
+                    "id", "postPublishDateTime")
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0084_business_businessgeohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('postPublishDateTime', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='core.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-postPublishDateTime', '-post'], name='core_timeline_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='core_timeline_author_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('user', 'post')},
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_seen_posts(apps, schema_editor):
+    """Record one seen row per (user, post) pair of the existing views"""
+    PostView = apps.get_model("core", "PostView")
+    PostSeen = apps.get_model("core", "PostSeen")
+
+    pairs = PostView.objects.values_list(
+        "user_id", "post_id", "post__postPublishDateTime").distinct()
+    batch = []
+    for user_id, post_id, published in pairs.iterator(chunk_size=1000):
+        batch.append(PostSeen(user_id=user_id, post_id=post_id,
+                              postPublishDateTime=published))
+        if len(batch) >= 1000:
+            PostSeen.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    PostSeen.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0085_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSeen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('postPublishDateTime', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-postPublishDateTime', '-id'], name='core_post_recent_idx'),
+        ),
+        migrations.AddField(
+            model_name='postseen',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seen_by', to='core.post'),
+        ),
+        migrations.AddField(
+            model_name='postseen',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seen_posts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='postseen',
+            index=models.Index(fields=['user', '-postPublishDateTime', '-post'], name='core_postseen_feed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postseen',
+            unique_together={('user', 'post')},
+        ),
+        migrations.RunPython(backfill_seen_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0087_imagejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='userCoverPictureStatus',
+            field=models.CharField(choices=[('ready', 'Ready'), ('processing', 'Processing'), ('failed', 'Failed')], default='ready', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='userProfilePictureStatus',
+            field=models.CharField(choices=[('ready', 'Ready'), ('processing', 'Processing'), ('failed', 'Failed')], default='ready', max_length=20),
+        ),
+    ]
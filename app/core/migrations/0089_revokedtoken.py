@@ -0,0 +1,22 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0088_user_picture_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tokenId', models.BigIntegerField()),
+                ('expiresDateTime', models.DateTimeField()),
+                ('createdDateTime', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
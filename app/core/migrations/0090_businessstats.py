@@ -0,0 +1,71 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def backfill_business_stats(apps, schema_editor):
+    """Compute the rollups of the existing businesses"""
+    Business = apps.get_model("core", "Business")
+    BusinessStats = apps.get_model("core", "BusinessStats")
+    MenuItem = apps.get_model("core", "MenuItem")
+    Post = apps.get_model("core", "Post")
+
+    for business_id in Business.objects.values_list("id", flat=True).iterator():
+        items = list(MenuItem.objects.filter(business_id=business_id).annotate(
+            delicious=models.Avg("posts__postRatingDelicious"),
+            eatAgain=models.Avg("posts__postRatingEatAgain"),
+            worthIt=models.Avg("posts__postRatingWorthIt"),
+        ).values_list("price", "delicious", "eatAgain", "worthIt"))
+        posts = Post.objects.filter(menuItem__business_id=business_id)
+        post_ids = list(posts.order_by("id").values_list("id", flat=True))
+        follower_ids = list(
+            Business.followers.through.objects.filter(business_id=business_id)
+            .order_by("user_id").values_list("user_id", flat=True))
+        BusinessStats.objects.create(
+            business_id=business_id,
+            deliciousRating=mean(item[1] for item in items),
+            eatAgainRating=mean(item[2] for item in items),
+            worthItRating=mean(item[3] for item in items),
+            lowestPrice=min((item[0] for item in items), default=None),
+            highestPrice=max((item[0] for item in items), default=None),
+            postCount=len(post_ids),
+            postIds=post_ids,
+            followerCount=len(follower_ids),
+            followerIds=follower_ids,
+            topPost_id=posts.order_by("-postLikeCount", "id")
+            .values_list("id", flat=True).first(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0089_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessStats',
+            fields=[
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='core.business')),
+                ('deliciousRating', models.FloatField(blank=True, null=True)),
+                ('eatAgainRating', models.FloatField(blank=True, null=True)),
+                ('worthItRating', models.FloatField(blank=True, null=True)),
+                ('lowestPrice', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('highestPrice', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('postCount', models.IntegerField(default=0)),
+                ('postIds', models.JSONField(blank=True, default=list)),
+                ('followerCount', models.IntegerField(default=0)),
+                ('followerIds', models.JSONField(blank=True, default=list)),
+                ('updatedDateTime', models.DateTimeField(auto_now=True)),
+                ('topPost', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.post')),
+            ],
+        ),
+        migrations.RunPython(backfill_business_stats, migrations.RunPython.noop),
+    ]
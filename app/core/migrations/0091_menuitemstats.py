@@ -0,0 +1,53 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_menu_item_stats(apps, schema_editor):
+    """Compute the rollups of the existing menu items"""
+    MenuItem = apps.get_model("core", "MenuItem")
+    MenuItemStats = apps.get_model("core", "MenuItemStats")
+    Post = apps.get_model("core", "Post")
+
+    for menu_item_id in MenuItem.objects.values_list("id", flat=True).iterator():
+        posts = Post.objects.filter(menuItem_id=menu_item_id).order_by(
+            "-postLikeCount", "-id")
+        photo_post_ids = posts.exclude(postPhotoUrl="").exclude(
+            postPhotoUrl__isnull=True).values_list("id", flat=True)
+        MenuItemStats.objects.create(
+            menuItem_id=menu_item_id,
+            topPost_id=posts.values_list("id", flat=True).first(),
+            photoPostIds=list(photo_post_ids[:settings.MENU_ITEM_PHOTOS_LIMIT]),
+            **posts.aggregate(
+                deliciousRating=models.Avg("postRatingDelicious"),
+                eatAgainRating=models.Avg("postRatingEatAgain"),
+                worthItRating=models.Avg("postRatingWorthIt"),
+                postCount=models.Count("id"),
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0090_businessstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemStats',
+            fields=[
+                ('menuItem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='core.menuitem')),
+                ('deliciousRating', models.FloatField(blank=True, null=True)),
+                ('eatAgainRating', models.FloatField(blank=True, null=True)),
+                ('worthItRating', models.FloatField(blank=True, null=True)),
+                ('postCount', models.IntegerField(default=0)),
+                ('photoPostIds', models.JSONField(blank=True, default=list)),
+                ('updatedDateTime', models.DateTimeField(auto_now=True)),
+                ('topPost', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.post')),
+            ],
+        ),
+        migrations.RunPython(backfill_menu_item_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.0.10 on 2026-10-18 01:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0091_menuitemstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=32, unique=True)),
+                ('lastId', models.BigIntegerField(default=0)),
+                ('lastDateTime', models.DateTimeField(blank=True, null=True)),
+                ('updatedDateTime', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostEngagementHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('likes', models.IntegerField(default=0)),
+                ('unlikes', models.IntegerField(default=0)),
+                ('saves', models.IntegerField(default=0)),
+                ('unsaves', models.IntegerField(default=0)),
+                ('shares', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('views', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engagement_hours', to='core.post')),
+            ],
+            options={
+                'unique_together': {('post', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuItemEngagementHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('likes', models.IntegerField(default=0)),
+                ('unlikes', models.IntegerField(default=0)),
+                ('saves', models.IntegerField(default=0)),
+                ('unsaves', models.IntegerField(default=0)),
+                ('shares', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('views', models.IntegerField(default=0)),
+                ('menuItem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engagement_hours', to='core.menuitem')),
+            ],
+            options={
+                'unique_together': {('menuItem', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BusinessEngagementHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('likes', models.IntegerField(default=0)),
+                ('unlikes', models.IntegerField(default=0)),
+                ('saves', models.IntegerField(default=0)),
+                ('unsaves', models.IntegerField(default=0)),
+                ('shares', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('views', models.IntegerField(default=0)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engagement_hours', to='core.business')),
+            ],
+            options={
+                'unique_together': {('business', 'hour')},
+            },
+        ),
+    ]
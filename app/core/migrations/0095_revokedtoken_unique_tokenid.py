@@ -0,0 +1,32 @@
+# Generated by Django 4.0.10 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+def delete_duplicate_revocations(apps, schema_editor):
+    """Keep the latest expiry of ids revoked more than once"""
+    RevokedToken = apps.get_model("core", "RevokedToken")
+    later = RevokedToken.objects.filter(
+        models.Q(expiresDateTime__gt=models.OuterRef("expiresDateTime"))
+        | models.Q(expiresDateTime=models.OuterRef("expiresDateTime"),
+                   id__gt=models.OuterRef("id")),
+        tokenId=models.OuterRef("tokenId"),
+    )
+    RevokedToken.objects.filter(models.Exists(later)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0094_conversation_chatmessage'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_revocations,
+                             migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='revokedtoken',
+            name='tokenId',
+            field=models.BigIntegerField(unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.0.10 on 2026-10-18 02:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def mark_fanned_out_posts(apps, schema_editor):
+    """Mark the posts of authors within the fan-out limit, which the feed
+    read from timelines until now
+    """
+    Post = apps.get_model("core", "Post")
+    Post.objects.annotate(
+        authorFollowers=Coalesce("user__userFollowers", 0),
+    ).filter(
+        authorFollowers__lte=settings.TIMELINE_FANOUT_FOLLOWER_LIMIT,
+    ).update(postFannedOut=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0095_revokedtoken_unique_tokenid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='postFannedOut',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_fanned_out_posts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('postFannedOut', False)), fields=['user', '-postPublishDateTime', '-id'], name='core_post_pulled_idx'),
+        ),
+    ]
@@ -4,11 +4,16 @@ Database models.
 
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
-from django.db import models, IntegrityError
+from django.utils import timezone
+from django.apps import apps
+from django.db import models, IntegrityError, transaction
+from django.db.models import F
 from phonenumber_field.modelfields import PhoneNumberField
 from rest_framework.validators import UniqueValidator
 
 import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
 import os
 
 from django.contrib.auth.models import (
@@ -21,13 +26,22 @@ from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
 from imagekit.processors import Adjust
 
-from PIL import Image
-from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from io import BytesIO
 
 import sys
 
+from core.geo import encode_geohash
+from core.images import (
+    IMAGE_FAILED,
+    IMAGE_PROCESSING,
+    IMAGE_READY,
+    IMAGE_STATUS_CHOICES,
+    is_uploaded,
+    jpeg_name,
+    resize_to_width,
+)
+from core.renditions import generate_renditions
+
 
 def post_image_file_path(instance, filename):
     """Genrate file path for new post image."""
@@ -56,6 +70,16 @@ def user_cover_picture_file_path(instance, filename):
     return os.path.join(directory_path, filename)
 
 
+def mark_images_processing(instance, field_names, save_kwargs):
+    """Flag freshly uploaded images as processing in their status fields"""
+    for field_name in field_names:
+        status_field = instance.image_status_fields[field_name]
+        setattr(instance, status_field, IMAGE_PROCESSING)
+        update_fields = save_kwargs.get("update_fields")
+        if update_fields is not None:
+            save_kwargs["update_fields"] = set(update_fields) | {status_field}
+
+
 class UserManager(BaseUserManager):
     """Manager for user."""
 
@@ -141,6 +165,16 @@ class User(AbstractBaseUser, PermissionsMixin):
         max_digits=9, decimal_places=6, null=True, blank=True)
     userLongitude = models.DecimalField(
         max_digits=9, decimal_places=6, null=True, blank=True)
+    userProfilePictureStatus = models.CharField(
+        max_length=20, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY)
+    userCoverPictureStatus = models.CharField(
+        max_length=20, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY)
+
+    # Image fields whose processing outcome is tracked in a status field
+    image_status_fields = {
+        "userProfilePictureUrl": "userProfilePictureStatus",
+        "userCoverPictureUrl": "userCoverPictureStatus",
+    }
 
     def save(self, *args, **kwargs):
             # Store the old image paths before saving the new images
@@ -151,40 +185,20 @@ class User(AbstractBaseUser, PermissionsMixin):
             else:
                 old_profile_pic_path = None
                 old_cover_pic_path = None
-            profile_pic_modified = False
-            cover_pic_modified = False
-            if self.userProfilePictureUrl and hasattr(self.userProfilePictureUrl, 'file') and self.userProfilePictureUrl.file:
-                # Open the image using Pillow
-                img = Image.open(self.userProfilePictureUrl)
-                aspect_ratio = img.height / img.width
-                new_width = 1290
-                new_height = int(new_width * aspect_ratio)
-                # Resize the image.
-                img = img.resize((new_width, new_height), Image.ANTIALIAS)
-                # Save the image back to userProfilePictureUrl
-                buffer = BytesIO()
-                img.save(fp=buffer, format="JPEG", quality=85)
-                buffer.seek(0)
-                self.userProfilePictureUrl.save(
-                    name=self.userProfilePictureUrl.name, content=ContentFile(buffer.read()), save=False)
-                profile_pic_modified = True
-            if self.userCoverPictureUrl and hasattr(self.userCoverPictureUrl, 'file') and self.userCoverPictureUrl.file:
-                # Open the image using Pillow
-                img = Image.open(self.userCoverPictureUrl)
-                aspect_ratio = img.height / img.width
-                new_width = 1290
-                new_height = int(new_width * aspect_ratio)
-                # Resize the image.
-                img = img.resize((new_width, new_height), Image.ANTIALIAS)
-                # Save the image back to userCoverPictureUrl
-                buffer = BytesIO()
-                img.save(fp=buffer, format="JPEG", quality=85)
-                buffer.seek(0)
-                self.userCoverPictureUrl.save(
-                    name=self.userCoverPictureUrl.name, content=ContentFile(buffer.read()), save=False)
-                cover_pic_modified = True
-            # Call the "real" save() method once if any image field was modified
-            super(User, self).save(*args, **kwargs)
+            # New uploads are stored as sent and resized by process_image_jobs
+            profile_pic_modified = is_uploaded(self.userProfilePictureUrl)
+            cover_pic_modified = is_uploaded(self.userCoverPictureUrl)
+            mark_images_processing(self, [
+                field_name for field_name, modified in (
+                    ("userProfilePictureUrl", profile_pic_modified),
+                    ("userCoverPictureUrl", cover_pic_modified))
+                if modified], kwargs)
+            with transaction.atomic():
+                super(User, self).save(*args, **kwargs)
+                if profile_pic_modified:
+                    ImageJob.objects.enqueue(self, "userProfilePictureUrl")
+                if cover_pic_modified:
+                    ImageJob.objects.enqueue(self, "userCoverPictureUrl")
             # Delete the old image files from the filesystem
             if old_profile_pic_path and profile_pic_modified:
                 if os.path.exists(old_profile_pic_path):
@@ -228,6 +242,21 @@ class Business(models.Model):
     followers = models.ManyToManyField(
         settings.AUTH_USER_MODEL, related_name="following_businesses", blank=True
     )
+    businessGeohash = models.CharField(
+        max_length=12, blank=True, default="", db_index=True)
+
+    def save(self, *args, **kwargs):
+        # Keep the geohash used by proximity queries in sync with the location
+        if self.businessOperatingLatitude is not None and self.businessOperatingLongitude is not None:
+            self.businessGeohash = encode_geohash(
+                self.businessOperatingLatitude, self.businessOperatingLongitude)
+        else:
+            self.businessGeohash = ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and (
+                {"businessOperatingLatitude", "businessOperatingLongitude"} & set(update_fields)):
+            kwargs["update_fields"] = set(update_fields) | {"businessGeohash"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.businessName
@@ -299,12 +328,22 @@ class Post(models.Model):
     postDishSellerVisit = models.JSONField(default=dict, blank=True)
     postDishVisit = models.JSONField(default=dict, blank=True)
     postLikeCount = models.IntegerField(default=0)
+    # Whether the post was pushed to follower timelines when published
+    postFannedOut = models.BooleanField(default=False)
     menuItem = models.ForeignKey(
         MenuItem, null=True, blank=True, related_name="posts", on_delete=models.SET_NULL)
 
+    PHOTO_READY = IMAGE_READY
+    PHOTO_PROCESSING = IMAGE_PROCESSING
+    PHOTO_FAILED = IMAGE_FAILED
+    postPhotoStatus = models.CharField(
+        max_length=20, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY)
+
+    # Image fields whose processing outcome is tracked in a status field
+    image_status_fields = {"postPhotoUrl": "postPhotoStatus"}
+
     def save(self, *args, **kwargs):
             # If the post is already in the database, retrieve the old image path
-    # If the post is already in the database, retrieve the old image path
             if self.pk:
                 try:
                     old_instance = Post.objects.get(pk=self.pk)
@@ -314,32 +353,34 @@ class Post(models.Model):
             else:
                 old_image_path = None
 
-            image_modified = False
-            if self.postPhotoUrl and hasattr(self.postPhotoUrl, 'file'):
-                # Open the image using Pillow
-                img = Image.open(self.postPhotoUrl)
-                # Calculate the aspect ratio
-                aspect_ratio = img.height / img.width
-                new_width = 1290
-                new_height = int(new_width * aspect_ratio)
-                # Resize the image.
-                img = img.resize((new_width, new_height), Image.ANTIALIAS)
-                # Save the image back to postPhotoUrl
-                buffer = BytesIO()
-                img.save(fp=buffer, format="JPEG", quality=85)
-                buffer.seek(0)
-                self.postPhotoUrl.save(name=self.postPhotoUrl.name, content=ContentFile(buffer.read()), save=False)
-                image_modified = True
-            # Call the parent class's save method only once, after all image modifications
-            super(Post, self).save(*args, **kwargs)
-            # If the image was modified, delete the old image file from the filesystem
+            # A new upload is stored as sent and resized by process_image_jobs
+            image_modified = is_uploaded(self.postPhotoUrl)
+            if image_modified:
+                mark_images_processing(self, ["postPhotoUrl"], kwargs)
+            adding = self._state.adding
+            with transaction.atomic():
+                super(Post, self).save(*args, **kwargs)
+                if image_modified:
+                    ImageJob.objects.enqueue(self, "postPhotoUrl")
+            # If the image was replaced, delete the old image file from the filesystem
             if image_modified and old_image_path:
                 if os.path.exists(old_image_path):
                     os.remove(old_image_path)
+            if adding:
+                TimelineEntry.objects.fan_out(self)
 
     def __str__(self):
         return self.postReview
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-postPublishDateTime", "-id"],
+                         name="core_post_recent_idx"),
+            models.Index(fields=["user", "-postPublishDateTime", "-id"],
+                         condition=models.Q(postFannedOut=False),
+                         name="core_post_pulled_idx"),
+        ]
+
 
 class PostLike(models.Model):
     user = models.ForeignKey(User, related_name="likes",
@@ -352,13 +393,104 @@ class PostLike(models.Model):
     likeUserAgent = models.TextField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        post = self.post
-        like_count = PostLike.objects.filter(post=post, isActive=True).count()
-        unlike_count = PostLike.objects.filter(
-            post=post, isActive=False).count()
-        post.postLikeCount = like_count - unlike_count
-        post.save()
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding and PostLikeState.apply(
+                    self.isActive, self.likeDateTime,
+                    user_id=self.user_id, post_id=self.post_id):
+                # Apply the like/unlike as an atomic delta on the counter
+                delta = 1 if self.isActive else -1
+                Post.objects.filter(pk=self.post_id).update(
+                    postLikeCount=F("postLikeCount") + delta)
+
+
+class TimelineEntryManager(models.Manager):
+    """Manager for the materialized following feeds"""
+
+    def is_fanned_out(self, author):
+        """Return True if the author's new posts are pushed to follower feeds.
+
+        Posts of authors above the follower limit are pulled on read instead.
+        """
+        return (author.userFollowers or 0) <= settings.TIMELINE_FANOUT_FOLLOWER_LIMIT
+
+    def fan_out(self, post):
+        """Deliver a new post to the feed of every follower of its author.
+
+        The post is marked fanned out along with its entries, so it stops
+        being pulled on read whatever the author's follower count becomes.
+        """
+        author = post.user
+        if not self.is_fanned_out(author):
+            return
+        follower_ids = author.followers.values_list("id", flat=True)
+        with transaction.atomic():
+            Post.objects.filter(pk=post.pk).update(postFannedOut=True)
+            self.bulk_create(
+                [
+                    self.model(
+                        user_id=follower_id,
+                        post=post,
+                        author=author,
+                        postPublishDateTime=post.postPublishDateTime,
+                    )
+                    for follower_id in follower_ids.iterator()
+                ],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+        post.postFannedOut = True
+
+    def backfill(self, user, author):
+        """Copy the latest posts of a newly followed author to the feed.
+
+        Posts that are also pulled on read are copied too, as the feed
+        skips duplicates, so a follow never depends on the delivery mode.
+        """
+        posts = Post.objects.filter(user=author).order_by(
+            "-postPublishDateTime", "-id")[:settings.TIMELINE_BACKFILL_SIZE]
+        self.bulk_create(
+            [
+                self.model(
+                    user=user,
+                    post_id=post_id,
+                    author=author,
+                    postPublishDateTime=published,
+                )
+                for post_id, published in posts.values_list(
+                    "id", "postPublishDateTime")
+            ],
+            ignore_conflicts=True,
+        )
+
+    def remove_author(self, user, author):
+        """Drop the posts of an unfollowed author from the feed"""
+        self.filter(user=user, author=author).delete()
+
+
+class TimelineEntry(models.Model):
+    """Post delivered to the following feed of a user"""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+")
+    postPublishDateTime = models.DateTimeField()
+
+    objects = TimelineEntryManager()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(
+                fields=["user", "-postPublishDateTime", "-post"],
+                name="core_timeline_feed_idx",
+            ),
+            models.Index(fields=["user", "author"],
+                         name="core_timeline_author_idx"),
+        ]
 
 
 class PostSave(models.Model):
@@ -381,6 +513,37 @@ class PostView(models.Model):
     viewDateTime = models.DateTimeField(auto_now_add=True)
     viewUserAgent = models.TextField(null=True, blank=True)
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            PostSeen.objects.bulk_create(
+                [PostSeen(user_id=self.user_id, post_id=self.post_id,
+                          postPublishDateTime=self.post.postPublishDateTime)],
+                ignore_conflicts=True,
+            )
+
+
+class PostSeen(models.Model):
+    """Post viewed at least once by a user, one row per (user, post).
+
+    Backs the unseen-first for-you feed without joining every PostView.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="seen_posts")
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="seen_by")
+    postPublishDateTime = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(
+                fields=["user", "-postPublishDateTime", "-post"],
+                name="core_postseen_feed_idx",
+            ),
+        ]
+
 
 class PostComment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -411,14 +574,65 @@ class CommentLike(models.Model):
     likeUserAgent = models.TextField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        comment = self.comment
-        like_count = CommentLike.objects.filter(
-            comment=comment, isActive=True).count()
-        unlike_count = CommentLike.objects.filter(
-            comment=comment, isActive=False).count()
-        comment.commentLikeCount = like_count - unlike_count
-        comment.save()
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding and CommentLikeState.apply(
+                    self.isActive, self.likeDateTime,
+                    user_id=self.user_id, comment_id=self.comment_id):
+                # Apply the like/unlike as an atomic delta on the counter
+                delta = 1 if self.isActive else -1
+                PostComment.objects.filter(pk=self.comment_id).update(
+                    commentLikeCount=F("commentLikeCount") + delta)
+
+
+class LikeState(models.Model):
+    """Current like state of a user on a target, one row per pair.
+
+    PostLike and CommentLike keep the full like/unlike history, this
+    table only answers "does the user like it now?".
+    """
+    isLiked = models.BooleanField(default=False)
+    likedDateTime = models.DateTimeField(null=True, blank=True)
+    unlikedDateTime = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def apply(cls, isLiked, dateTime, **pair):
+        """Move the pair to the given state, return True if it changed"""
+        if isLiked:
+            timestamps = {"likedDateTime": dateTime}
+        else:
+            timestamps = {"unlikedDateTime": dateTime}
+        changed = cls.objects.filter(**pair).exclude(
+            isLiked=isLiked).update(isLiked=isLiked, **timestamps)
+        if changed:
+            return True
+        _, created = cls.objects.get_or_create(
+            defaults={"isLiked": isLiked, **timestamps}, **pair)
+        return created and isLiked
+
+
+class PostLikeState(LikeState):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="post_like_states")
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="like_states")
+
+    class Meta:
+        unique_together = ("user", "post")
+
+
+class CommentLikeState(LikeState):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="comment_like_states")
+    comment = models.ForeignKey(
+        PostComment, on_delete=models.CASCADE, related_name="like_states")
+
+    class Meta:
+        unique_together = ("user", "comment")
 
 
 class PostShare(models.Model):
@@ -430,6 +644,88 @@ class PostShare(models.Model):
     sharedDateTime = models.DateTimeField(auto_now_add=True)
 
 
+class Conversation(models.Model):
+    """Chat conversation between its members"""
+    participants = models.ManyToManyField(
+        User, through="ConversationMember", related_name="conversations")
+    createdDateTime = models.DateTimeField(auto_now_add=True)
+    lastMessageDateTime = models.DateTimeField(default=timezone.now)
+
+
+class ConversationMember(models.Model):
+    """Membership of a user in a conversation.
+
+    unreadCount is incremented by every batch of messages written from the
+    other members and reset when the user reads the conversation, so it is
+    never counted from the messages.
+    """
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name="members")
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="conversation_members")
+    unreadCount = models.IntegerField(default=0)
+    lastReadDateTime = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("conversation", "user")
+
+
+class ChatMessageManager(models.Manager):
+    """Manager for the messages of conversations"""
+
+    def write(self, messages):
+        """Insert a batch of messages with one statement and count them unread.
+
+        Every other member of a conversation gets the number of messages of
+        the batch that they did not send added to their unread count.
+        Returns the messages with their ids.
+        """
+        senders = defaultdict(Counter)
+        last_message = {}
+        for message in messages:
+            senders[message.conversation_id][message.sender_id] += 1
+            last_message[message.conversation_id] = max(
+                message.createdDateTime,
+                last_message.get(message.conversation_id, message.createdDateTime))
+
+        with transaction.atomic():
+            messages = self.bulk_create(messages)
+            # Lock the members of conversations in the same order everywhere
+            for conversation_id in sorted(senders):
+                sent = senders[conversation_id]
+                total = sum(sent.values())
+                ConversationMember.objects.filter(
+                    conversation_id=conversation_id,
+                ).update(unreadCount=F("unreadCount") + models.Case(
+                    *[models.When(user_id=sender_id, then=total - count)
+                      for sender_id, count in sent.items()],
+                    default=total,
+                ))
+                Conversation.objects.filter(
+                    pk=conversation_id,
+                    lastMessageDateTime__lt=last_message[conversation_id],
+                ).update(lastMessageDateTime=last_message[conversation_id])
+        return messages
+
+
+class ChatMessage(models.Model):
+    """Message sent to a conversation"""
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name="messages")
+    sender = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="chat_messages")
+    text = models.TextField()
+    createdDateTime = models.DateTimeField(default=timezone.now)
+
+    objects = ChatMessageManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["conversation", "createdDateTime", "id"],
+                         name="core_chatmessage_history_idx"),
+        ]
+
+
 class Seller(models.Model):
     """Seller object"""
     user = models.ForeignKey(
@@ -469,3 +765,536 @@ class Dish(models.Model):
     sellerId = models.IntegerField(null=True, blank=True)
     postId = models.JSONField(null=True, blank=True, default=list)
     dishInfoContributor = models.JSONField(default=dict, blank=True)
+
+
+# Posts ranked by likes, the newer first among equals
+TOP_POST_ORDER = ["-postLikeCount", "-id"]
+
+
+def ranks_above(post, other):
+    """Return True if post comes before other in TOP_POST_ORDER"""
+    return (post.postLikeCount, post.id) > (other.postLikeCount, other.id)
+
+
+class BusinessStatsManager(models.Manager):
+    """Manager recomputing the per-business rollups"""
+
+    def refresh(self, business_id):
+        """Recompute every rollup of a business"""
+        if not Business.objects.filter(pk=business_id).exists():
+            return None
+        items = MenuItem.objects.filter(business_id=business_id).annotate(
+            delicious=models.Avg("posts__postRatingDelicious"),
+            eatAgain=models.Avg("posts__postRatingEatAgain"),
+            worthIt=models.Avg("posts__postRatingWorthIt"),
+        ).values_list("price", "delicious", "eatAgain", "worthIt")
+        prices, ratings = [], ([], [], [])
+        for price, *averages in items:
+            prices.append(price)
+            # Averaged per menu item first, so each item weighs the same
+            for values, average in zip(ratings, averages):
+                if average is not None:
+                    values.append(average)
+        posts = Post.objects.filter(menuItem__business_id=business_id)
+        post_ids = list(posts.order_by("id").values_list("id", flat=True))
+        stats, _ = self.update_or_create(business_id=business_id, defaults={
+            "deliciousRating": self.mean(ratings[0]),
+            "eatAgainRating": self.mean(ratings[1]),
+            "worthItRating": self.mean(ratings[2]),
+            "lowestPrice": min(prices, default=None),
+            "highestPrice": max(prices, default=None),
+            "postCount": len(post_ids),
+            "postIds": post_ids,
+            "topPost_id": self.top_post_id(business_id),
+            **self.followers(business_id),
+        })
+        return stats
+
+    def refresh_top_post(self, business_id):
+        """Recompute the top post of a business from all its posts"""
+        self.filter(business_id=business_id).update(
+            topPost_id=self.top_post_id(business_id),
+            updatedDateTime=timezone.now())
+
+    def update_top_post(self, business_id, post_id, liked):
+        """Update the top post of a business after a like or unlike.
+
+        A liked post replaces the top post if it now ranks above it. The
+        posts are only sorted again when the top post itself was unliked,
+        or when the stats changed since they were read.
+        """
+        stats = self.filter(business_id=business_id).select_related("topPost").first()
+        post = Post.objects.filter(pk=post_id).only("postLikeCount").first()
+        if stats is None or post is None:
+            return
+        top = stats.topPost
+        if not liked:
+            if top is not None and top.pk == post.pk:
+                self.refresh_top_post(business_id)
+            return
+        if top is None or ranks_above(post, top):
+            if not self.filter(
+                    business_id=business_id,
+                    updatedDateTime=stats.updatedDateTime,
+            ).update(topPost_id=post.pk, updatedDateTime=timezone.now()):
+                self.refresh_top_post(business_id)
+
+    def refresh_followers(self, business_id):
+        """Recompute the followers of a business"""
+        if not self.filter(business_id=business_id).update(
+                **self.followers(business_id)):
+            self.refresh(business_id)
+
+    @staticmethod
+    def mean(values):
+        return sum(values) / len(values) if values else None
+
+    @staticmethod
+    def top_post_id(business_id):
+        return Post.objects.filter(menuItem__business_id=business_id).order_by(
+            *TOP_POST_ORDER).values_list("id", flat=True).first()
+
+    @staticmethod
+    def followers(business_id):
+        follower_ids = list(
+            Business.followers.through.objects.filter(business_id=business_id)
+            .order_by("user_id").values_list("user_id", flat=True))
+        return {"followerCount": len(follower_ids), "followerIds": follower_ids}
+
+
+class BusinessStats(models.Model):
+    """Rollup of the menu item, post and follower figures of a business.
+
+    Kept up to date by the receivers in core.stats and rebuilt with the
+    rebuild_business_stats command.
+    """
+    business = models.OneToOneField(
+        Business, on_delete=models.CASCADE, primary_key=True,
+        related_name="stats")
+    deliciousRating = models.FloatField(null=True, blank=True)
+    eatAgainRating = models.FloatField(null=True, blank=True)
+    worthItRating = models.FloatField(null=True, blank=True)
+    lowestPrice = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True)
+    highestPrice = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True)
+    postCount = models.IntegerField(default=0)
+    postIds = models.JSONField(default=list, blank=True)
+    followerCount = models.IntegerField(default=0)
+    followerIds = models.JSONField(default=list, blank=True)
+    topPost = models.ForeignKey(
+        Post, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name="+")
+    updatedDateTime = models.DateTimeField(auto_now=True)
+
+    objects = BusinessStatsManager()
+
+
+class MenuItemStatsManager(models.Manager):
+    """Manager recomputing the per-menu-item rollups"""
+
+    def refresh(self, menu_item_id):
+        """Recompute every rollup of a menu item"""
+        if not MenuItem.objects.filter(pk=menu_item_id).exists():
+            return None
+        figures = Post.objects.filter(menuItem_id=menu_item_id).aggregate(
+            deliciousRating=models.Avg("postRatingDelicious"),
+            eatAgainRating=models.Avg("postRatingEatAgain"),
+            worthItRating=models.Avg("postRatingWorthIt"),
+            postCount=models.Count("id"),
+        )
+        stats, _ = self.update_or_create(menuItem_id=menu_item_id, defaults={
+            **figures, **self.top_posts(menu_item_id)})
+        return stats
+
+    def refresh_top_post(self, menu_item_id):
+        """Recompute the top post and photos of a menu item from all its posts"""
+        self.filter(menuItem_id=menu_item_id).update(
+            **self.top_posts(menu_item_id), updatedDateTime=timezone.now())
+
+    def update_top_post(self, menu_item_id, post_id, liked):
+        """Update the top post and photos of a menu item after a like or
+        unlike.
+
+        A liked post can only move up, so it is ranked against the current
+        top post and photos alone. The posts are only sorted again when an
+        unliked post was among them, or when the stats changed since they
+        were read.
+        """
+        stats = self.filter(menuItem_id=menu_item_id).select_related("topPost").first()
+        post = Post.objects.filter(pk=post_id).only(
+            "postLikeCount", "postPhotoUrl").first()
+        if stats is None or post is None:
+            return
+        top = stats.topPost
+        if not liked:
+            if (top is not None and top.pk == post.pk) or post.pk in stats.photoPostIds:
+                self.refresh_top_post(menu_item_id)
+            return
+
+        update = {}
+        if top is None or ranks_above(post, top):
+            update["topPost_id"] = post.pk
+        if post.postPhotoUrl:
+            photo_post_ids = list(
+                Post.objects.filter(pk__in=[*stats.photoPostIds, post.pk])
+                .order_by(*TOP_POST_ORDER)
+                .values_list("id", flat=True)[:settings.MENU_ITEM_PHOTOS_LIMIT])
+            if photo_post_ids != stats.photoPostIds:
+                update["photoPostIds"] = photo_post_ids
+        if update and not self.filter(
+                menuItem_id=menu_item_id,
+                updatedDateTime=stats.updatedDateTime,
+        ).update(**update, updatedDateTime=timezone.now()):
+            self.refresh_top_post(menu_item_id)
+
+    @staticmethod
+    def top_posts(menu_item_id):
+        posts = Post.objects.filter(menuItem_id=menu_item_id).order_by(
+            *TOP_POST_ORDER)
+        photo_post_ids = posts.exclude(postPhotoUrl="").exclude(
+            postPhotoUrl__isnull=True).values_list("id", flat=True)
+        return {
+            "topPost_id": posts.values_list("id", flat=True).first(),
+            "photoPostIds": list(photo_post_ids[:settings.MENU_ITEM_PHOTOS_LIMIT]),
+        }
+
+
+class MenuItemStats(models.Model):
+    """Rollup of the posts of a menu item.
+
+    Kept up to date by the receivers in core.stats. photoPostIds holds the
+    most liked posts with a photo, up to MENU_ITEM_PHOTOS_LIMIT.
+    """
+    menuItem = models.OneToOneField(
+        MenuItem, on_delete=models.CASCADE, primary_key=True,
+        related_name="stats")
+    deliciousRating = models.FloatField(null=True, blank=True)
+    eatAgainRating = models.FloatField(null=True, blank=True)
+    worthItRating = models.FloatField(null=True, blank=True)
+    postCount = models.IntegerField(default=0)
+    topPost = models.ForeignKey(
+        Post, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name="+")
+    photoPostIds = models.JSONField(default=list, blank=True)
+    updatedDateTime = models.DateTimeField(auto_now=True)
+
+    objects = MenuItemStatsManager()
+
+
+class EngagementHour(models.Model):
+    """Engagement events within one hour starting at hour.
+
+    Filled incrementally by the rollup_engagement command, see core.rollups.
+    """
+    hour = models.DateTimeField()
+    likes = models.IntegerField(default=0)
+    unlikes = models.IntegerField(default=0)
+    saves = models.IntegerField(default=0)
+    unsaves = models.IntegerField(default=0)
+    shares = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    views = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class PostEngagementHour(EngagementHour):
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="engagement_hours")
+
+    class Meta:
+        unique_together = ("post", "hour")
+
+
+class MenuItemEngagementHour(EngagementHour):
+    menuItem = models.ForeignKey(
+        MenuItem, on_delete=models.CASCADE, related_name="engagement_hours")
+
+    class Meta:
+        unique_together = ("menuItem", "hour")
+
+
+class BusinessEngagementHour(EngagementHour):
+    business = models.ForeignKey(
+        Business, on_delete=models.CASCADE, related_name="engagement_hours")
+
+    class Meta:
+        unique_together = ("business", "hour")
+
+
+class EngagementWatermarkManager(models.Manager):
+    """Manager for the positions of the engagement rollups"""
+
+    def positions(self):
+        """Return {source: watermark}, unsaved watermarks for new sources"""
+        watermarks = {watermark.source: watermark for watermark in self.all()}
+        return defaultdict(EngagementWatermark, watermarks)
+
+
+class EngagementWatermark(models.Model):
+    """Last event of a source included in the engagement rollups.
+
+    Append-only sources are followed by id in lastId, PostSave rows are
+    updated in place and followed by time in lastDateTime.
+    """
+    source = models.CharField(max_length=32, unique=True)
+    lastId = models.BigIntegerField(default=0)
+    lastDateTime = models.DateTimeField(null=True, blank=True)
+    updatedDateTime = models.DateTimeField(auto_now=True)
+
+    objects = EngagementWatermarkManager()
+
+
+class ImageJobManager(models.Manager):
+    """Manager for the image processing queue"""
+
+    def enqueue(self, instance, field_name):
+        """Queue the resize of the file just stored in an image field"""
+        return self.create(
+            targetModel=instance._meta.label_lower,
+            targetId=instance.pk,
+            fieldName=field_name,
+            sourceName=getattr(instance, field_name).name,
+        )
+
+    def claim(self, batch_size):
+        """Mark up to batch_size pending jobs as processing and return them.
+
+        Rows locked by another worker are skipped, so several workers can
+        share the queue.
+        """
+        with transaction.atomic():
+            ids = list(
+                self.filter(status=ImageJob.PENDING)
+                .order_by("id")
+                .select_for_update(skip_locked=True)
+                .values_list("id", flat=True)[:batch_size]
+            )
+            self.filter(id__in=ids).update(
+                status=ImageJob.PROCESSING,
+                attempts=F("attempts") + 1,
+                updatedDateTime=timezone.now(),
+            )
+        return list(self.filter(id__in=ids).order_by("id"))
+
+    def requeue_stale(self, age):
+        """Return jobs left processing for longer than age to the queue.
+
+        Such a job likely took its worker down, so once it has had
+        IMAGE_JOB_MAX_ATTEMPTS it fails instead of being claimed again.
+        """
+        now = timezone.now()
+        stale = self.filter(status=ImageJob.PROCESSING,
+                            updatedDateTime__lt=now - age)
+        for job in stale.filter(attempts__gte=settings.IMAGE_JOB_MAX_ATTEMPTS):
+            if stale.filter(pk=job.pk).update(
+                    status=ImageJob.FAILED,
+                    error="Worker stopped while processing the image",
+                    updatedDateTime=now):
+                job.set_target_status(apps.get_model(job.targetModel), IMAGE_FAILED)
+        return stale.update(status=ImageJob.PENDING, updatedDateTime=now)
+
+
+class ImageJob(models.Model):
+    """Resize of an uploaded image, run by the process_image_jobs command"""
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    targetModel = models.CharField(max_length=100)
+    targetId = models.PositiveBigIntegerField()
+    fieldName = models.CharField(max_length=100)
+    sourceName = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    createdDateTime = models.DateTimeField(auto_now_add=True)
+    updatedDateTime = models.DateTimeField(auto_now=True)
+
+    objects = ImageJobManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"],
+                         name="core_imagejob_queue_idx"),
+        ]
+
+    def finish(self, status, error=""):
+        self.status = status
+        self.error = error
+        self.save(update_fields=["status", "error", "updatedDateTime"])
+
+    def update_target(self, model, **update):
+        """Update the target if its field still holds the source file"""
+        updated = model.objects.filter(
+            pk=self.targetId, **{self.fieldName: self.sourceName}
+        ).update(**update)
+        if updated and model is User:
+            # update() sends no post_save to drop cached token owners
+            from core.authentication import invalidate_users
+            invalidate_users([self.targetId])
+        return updated
+
+    def set_target_status(self, model, status):
+        status_field = getattr(model, "image_status_fields", {}).get(self.fieldName)
+        if status_field:
+            self.update_target(model, **{status_field: status})
+
+    def run(self):
+        """Resize the source image and swap it into the target field.
+
+        The swap only happens if the field still holds the source file, so
+        a newer upload is never overwritten.
+        """
+        model = apps.get_model(self.targetModel)
+        instance = model.objects.filter(pk=self.targetId).first()
+        field_file = getattr(instance, self.fieldName, None)
+        if field_file is None or field_file.name != self.sourceName:
+            self.finish(self.DONE, "Image replaced before processing")
+            return
+
+        try:
+            with field_file.open("rb"):
+                content = resize_to_width(
+                    field_file, settings.IMAGE_MAX_WIDTH,
+                    settings.IMAGE_JPEG_QUALITY)
+            field_file.save(jpeg_name(self.sourceName), content, save=False)
+            generate_renditions(field_file)
+        except Exception as e:
+            if field_file.name != self.sourceName:
+                field_file.storage.delete(field_file.name)
+            if self.attempts >= settings.IMAGE_JOB_MAX_ATTEMPTS:
+                self.set_target_status(model, IMAGE_FAILED)
+                self.finish(self.FAILED, str(e))
+            else:
+                self.finish(self.PENDING, str(e))
+            return
+
+        update = {self.fieldName: field_file.name}
+        status_field = getattr(model, "image_status_fields", {}).get(self.fieldName)
+        if status_field:
+            update[status_field] = IMAGE_READY
+        if self.update_target(model, **update):
+            field_file.storage.delete(self.sourceName)
+        else:
+            field_file.storage.delete(field_file.name)
+        self.finish(self.DONE)
+
+
+class OutboxMessageManager(models.Manager):
+    """Manager for the outbox of channel layer messages"""
+
+    def enqueue(self, recipient, message):
+        """Queue a message to the recipient group.
+
+        Call it in the transaction of the change it announces, so the
+        message is sent if and only if the change commits.
+        """
+        return self.create(recipient=recipient, message=message)
+
+    def enqueue_many(self, recipients, message):
+        """Queue the same message to several recipient groups in one insert"""
+        return self.bulk_create(
+            [self.model(recipient=recipient, message=message)
+             for recipient in recipients])
+
+    def claim(self, batch_size):
+        """Mark up to batch_size due messages as processing and return them.
+
+        Only the oldest unsent message of each recipient is due, so a
+        recipient gets its messages in order even with several workers.
+        """
+        now = timezone.now()
+        earlier = self.filter(
+            recipient=models.OuterRef("recipient"),
+            id__lt=models.OuterRef("id"),
+            status__in=[OutboxMessage.PENDING, OutboxMessage.PROCESSING],
+        )
+        with transaction.atomic():
+            ids = list(
+                self.filter(status=OutboxMessage.PENDING, availableDateTime__lte=now)
+                .exclude(models.Exists(earlier))
+                .order_by("id")
+                .select_for_update(skip_locked=True)
+                .values_list("id", flat=True)[:batch_size]
+            )
+            self.filter(id__in=ids).update(
+                status=OutboxMessage.PROCESSING,
+                attempts=F("attempts") + 1,
+                updatedDateTime=now,
+            )
+        return list(self.filter(id__in=ids).order_by("id"))
+
+    def requeue_stale(self, age):
+        """Return messages left processing for longer than age to the queue"""
+        return self.filter(
+            status=OutboxMessage.PROCESSING,
+            updatedDateTime__lt=timezone.now() - age,
+        ).update(status=OutboxMessage.PENDING, updatedDateTime=timezone.now())
+
+
+class OutboxMessage(models.Model):
+    """Channel layer message to a group, sent and deleted by the
+    dispatch_outbox command once the transaction that queued it commits.
+    """
+    PENDING = "pending"
+    PROCESSING = "processing"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (FAILED, "Failed"),
+    ]
+
+    recipient = models.CharField(max_length=100)
+    message = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    availableDateTime = models.DateTimeField(default=timezone.now)
+    createdDateTime = models.DateTimeField(auto_now_add=True)
+    updatedDateTime = models.DateTimeField(auto_now=True)
+
+    objects = OutboxMessageManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"],
+                         name="core_outbox_queue_idx"),
+            models.Index(fields=["recipient", "id"],
+                         name="core_outbox_recipient_idx"),
+        ]
+
+    def retry(self, error):
+        """Send the message again later, or give up after too many attempts"""
+        self.error = error
+        if self.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            self.status = self.FAILED
+        else:
+            self.status = self.PENDING
+            self.availableDateTime = timezone.now() + timedelta(
+                seconds=settings.OUTBOX_RETRY_DELAY * 2 ** (self.attempts - 1))
+        self.save(update_fields=[
+            "status", "error", "availableDateTime", "updatedDateTime"])
+
+
+class RevokedToken(models.Model):
+    """Signed token or token session revoked before its expiry.
+
+    Rows are read incrementally into each process's in-memory revocation
+    set and can be removed once expiresDateTime has passed.
+    """
+    tokenId = models.BigIntegerField(unique=True)
+    expiresDateTime = models.DateTimeField()
+    createdDateTime = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,196 @@
+"""
+Pagination helpers shared by the list APIs.
+"""
+import json
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_right
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Model, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_cursor_value(value):
+    if isinstance(value, date):
+        # Full precision isoformat, parsed back by the view owning the key
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(position):
+    """Return an opaque cursor for a sort key position"""
+    data = json.dumps(position, default=_encode_cursor_value)
+    return urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the sort key position stored in a cursor"""
+    try:
+        position = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (BinasciiError, UnicodeError, ValueError):
+        raise NotFound("Invalid cursor")
+    if not isinstance(position, list):
+        raise NotFound("Invalid cursor")
+    return position
+
+
+def get_keyset_ordering(queryset):
+    """Return the ordering of a queryset made unique with a pk tie-breaker"""
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    for field in ordering:
+        if not isinstance(field, str) or field == "?":
+            raise ImproperlyConfigured(
+                "Cursor pagination needs an ordering by field names")
+    if not any(field.lstrip("-") in ("pk", "id") for field in ordering):
+        descending = bool(ordering) and ordering[0].startswith("-")
+        ordering.append("-pk" if descending else "pk")
+    return ordering
+
+
+def _after(field, value):
+    """Return the lookup for rows sorted after value on one field.
+
+    Follows the PostgreSQL defaults of NULLS LAST ascending and NULLS
+    FIRST descending.
+    """
+    name = field.lstrip("-")
+    if field.startswith("-"):
+        if value is None:
+            return Q(**{f"{name}__isnull": False})
+        return Q(**{f"{name}__lt": value})
+    if value is None:
+        return Q(pk__in=[])
+    return Q(**{f"{name}__gt": value}) | Q(**{f"{name}__isnull": True})
+
+
+def _equal(field, value):
+    name = field.lstrip("-")
+    if value is None:
+        return Q(**{f"{name}__isnull": True})
+    return Q(**{name: value})
+
+
+def keyset_filter(ordering, position):
+    """Return the filter for rows sorted after position in ordering"""
+    condition = Q(pk__in=[])
+    for i, field in enumerate(ordering):
+        branch = _after(field, position[i])
+        for prior, value in zip(ordering[:i], position[:i]):
+            branch &= _equal(prior, value)
+        condition |= branch
+    return condition
+
+
+def keyset_position(obj, ordering):
+    """Return the sort key values of obj for ordering"""
+    position = []
+    for field in ordering:
+        value = obj
+        for attr in field.lstrip("-").split("__"):
+            value = getattr(value, attr)
+            if value is None:
+                break
+        if isinstance(value, Model):
+            value = value.pk
+        position.append(value)
+    return position
+
+
+class CursorPaginationMixin:
+    """Add an opt-in keyset mode, selected with ?cursor=, to a paginator.
+
+    Without the cursor parameter the paginator behaves as before. With it,
+    a page starts right after the sort key position stored in the cursor,
+    so rows inserted while scrolling are neither repeated nor skipped.
+    """
+    cursor_query_param = "cursor"
+
+    def use_cursor(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_cursor_position(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        return decode_cursor(cursor)
+
+    def paginate_keys(self, fetch, request):
+        """Return a page of sort key tuples read with fetch(position, limit).
+
+        fetch returns up to limit keys following the decoded cursor position
+        (None on the first page), in page order.
+        """
+        self.request = request
+        self.cursor_mode = True
+        page_size = self.get_page_size(request)
+        keys = list(fetch(self.get_cursor_position(request), page_size + 1))
+        page = keys[:page_size]
+        self.next_position = list(page[-1]) if len(keys) > page_size else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            return self.paginate_keyset(queryset, request)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def paginate_keyset(self, queryset, request):
+        """Return the page of a queryset following the cursor position.
+
+        The queryset ordering, made unique with the pk, is the sort key.
+        """
+        ordering = get_keyset_ordering(queryset)
+        queryset = queryset.order_by(*ordering)
+        position = self.get_cursor_position(request)
+        if position is not None:
+            if len(position) != len(ordering):
+                raise NotFound("Invalid cursor")
+            try:
+                queryset = queryset.filter(keyset_filter(ordering, position))
+            except (TypeError, ValueError):
+                raise NotFound("Invalid cursor")
+
+        self.request = request
+        self.cursor_mode = True
+        page_size = self.get_page_size(request)
+        try:
+            rows = list(queryset[:page_size + 1])
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound("Invalid cursor")
+        page = rows[:page_size]
+        self.next_position = (
+            keyset_position(page[-1], ordering) if len(rows) > page_size else None)
+        return page
+
+    def paginate_sorted_keys(self, keys, request):
+        """Return the page of an ascending list of sort key tuples"""
+        def fetch(position, limit):
+            start = 0 if position is None else bisect_right(keys, tuple(position))
+            return keys[start:start + limit]
+
+        return self.paginate_keys(fetch, request)
+
+    def get_next_link(self):
+        if getattr(self, "cursor_mode", False):
+            if self.next_position is None:
+                return None
+            url = self.request.build_absolute_uri()
+            return replace_query_param(
+                url, self.cursor_query_param, encode_cursor(self.next_position))
+        return super().get_next_link()
+
+    def get_paginated_response(self, data):
+        if getattr(self, "cursor_mode", False):
+            return Response({
+                "next": self.get_next_link(),
+                "previous": None,
+                "results": data,
+            })
+        return super().get_paginated_response(data)
@@ -0,0 +1,119 @@
+"""
+Resized copies of uploaded pictures, generated with imagekit.
+
+Renditions are made by process_image_jobs once an upload is processed, so
+serving their URLs never touches the image data.
+"""
+from django.conf import settings
+from django.db import models
+from imagekit import ImageSpec
+from imagekit.cachefiles import ImageCacheFile
+from imagekit.processors import ResizeToFit
+from PIL import features
+from rest_framework import serializers
+
+from core.images import is_ready
+
+# Query format name: PIL format, WebP only when Pillow is built with it
+RENDITION_FORMATS = {"jpeg": "JPEG"}
+if features.check("webp"):
+    RENDITION_FORMATS = {"webp": "WEBP", **RENDITION_FORMATS}
+
+
+class Rendition(ImageSpec):
+    """Picture scaled down to a width, in one of RENDITION_FORMATS"""
+    cachefile_strategy = "imagekit.cachefiles.strategies.Optimistic"
+
+    def __init__(self, source, width, image_format):
+        self.processors = [ResizeToFit(width=width, upscale=False)]
+        self.format = RENDITION_FORMATS[image_format]
+        self.options = {"quality": settings.IMAGE_RENDITION_QUALITY}
+        super().__init__(source=source)
+
+
+def rendition_file(field_file, width, image_format):
+    return ImageCacheFile(Rendition(field_file, width, image_format))
+
+
+def generate_renditions(field_file):
+    """Write every width and format of a picture that is not stored yet"""
+    for width in settings.IMAGE_RENDITION_WIDTHS:
+        for image_format in RENDITION_FORMATS:
+            rendition_file(field_file, width, image_format).generate()
+
+
+def requested_rendition(request):
+    """Return the (width, format) asked for with ?image_width=, or None.
+
+    The format is ?image_format=, else WebP when the client accepts it.
+    """
+    if request is None:
+        return None
+    try:
+        width = int(request.query_params.get("image_width", ""))
+    except ValueError:
+        return None
+    image_format = request.query_params.get("image_format")
+    if image_format not in RENDITION_FORMATS:
+        accept = request.META.get("HTTP_ACCEPT", "")
+        webp = "webp" in RENDITION_FORMATS and "image/webp" in accept
+        image_format = "webp" if webp else "jpeg"
+    return width, image_format
+
+
+def absolute_url(url, request):
+    return request.build_absolute_uri(url) if request else url
+
+
+def image_url(field_file, request):
+    """Return the URL of a picture, or of the rendition the request asks for.
+
+    The smallest rendition at least as wide as ?image_width= is used, and
+    the full-size picture when none is wide enough or it is still processing.
+    """
+    if not field_file:
+        return None
+    url = field_file.url
+    requested = requested_rendition(request)
+    if requested is not None and is_ready(field_file):
+        width, image_format = requested
+        fitting = [w for w in settings.IMAGE_RENDITION_WIDTHS if w >= width]
+        if fitting:
+            url = rendition_file(field_file, min(fitting), image_format).url
+    return absolute_url(url, request)
+
+
+def rendition_urls(field_file, request):
+    """Return {format: {width: url}} of the renditions of a picture"""
+    if not field_file or not is_ready(field_file):
+        return {}
+    return {
+        image_format: {
+            str(width): absolute_url(
+                rendition_file(field_file, width, image_format).url, request)
+            for width in settings.IMAGE_RENDITION_WIDTHS
+        }
+        for image_format in RENDITION_FORMATS
+    }
+
+
+class RenditionImageField(serializers.ImageField):
+    """Image field serving the rendition requested with ?image_width="""
+
+    def to_representation(self, value):
+        return image_url(value, self.context.get("request"))
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """Map of the rendition URLs of an image field, for building a srcset"""
+
+    def to_representation(self, value):
+        return rendition_urls(value, self.context.get("request"))
+
+
+class RenditionSerializerMixin:
+    """Serve the model image fields of a ModelSerializer with RenditionImageField"""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: RenditionImageField,
+    }
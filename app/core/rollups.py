@@ -0,0 +1,123 @@
+"""
+Incremental hourly engagement rollups of posts, menu items and businesses.
+
+Append-only event tables are rolled up in order of id from their watermark.
+Only events older than ENGAGEMENT_ROLLUP_LAG set the next watermark, so rows
+of transactions still in flight are not skipped. PostSave rows are updated
+in place and are rolled up by their save and unsave times instead.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Value, When
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from core.models import (
+    BusinessEngagementHour, EngagementWatermark, MenuItemEngagementHour,
+    PostComment, PostEngagementHour, PostLike, PostSave, PostShare, PostView,
+)
+
+SAVE_SOURCE = "save"
+
+# source: (model, time field, rollup column of each event)
+EVENT_SOURCES = {
+    "like": (PostLike, "likeDateTime", Case(
+        When(isActive=True, then=Value("likes")), default=Value("unlikes"),
+        output_field=CharField())),
+    "share": (PostShare, "sharedDateTime", Value("shares")),
+    "comment": (PostComment, "commentPublishDateTime", Value("comments")),
+    "view": (PostView, "viewDateTime", Value("views")),
+}
+
+# Rollup model and target field of each level, by the post column naming it
+ROLLUP_TARGETS = {
+    "post_id": (PostEngagementHour, "post_id"),
+    "post__menuItem_id": (MenuItemEngagementHour, "menuItem_id"),
+    "post__menuItem__business_id": (BusinessEngagementHour, "business_id"),
+}
+
+
+def grouped_counts(queryset, hour, column):
+    """Return the rows of queryset counted by target, hour and column"""
+    return (
+        queryset.annotate(hour=TruncHour(hour), column=column)
+        .values(*ROLLUP_TARGETS, "hour", "column")
+        .annotate(total=Count("id"))
+    )
+
+
+def collect(counts, rows):
+    """Add grouped rows to counts, {(target, id, hour): Counter of columns}"""
+    for row in rows:
+        for target in ROLLUP_TARGETS:
+            if row[target] is not None:
+                counts[target, row[target], row["hour"]][row["column"]] += row["total"]
+
+
+def event_counts(counts, watermark, model, hour, column, cutoff, batch_size):
+    """Collect up to batch_size events after watermark, returning how many"""
+    ids = list(
+        model.objects.filter(id__gt=watermark.lastId, **{f"{hour}__lte": cutoff})
+        .order_by("id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return 0
+    collect(counts, grouped_counts(
+        model.objects.filter(id__gt=watermark.lastId, id__lte=ids[-1]),
+        hour, column))
+    watermark.lastId = ids[-1]
+    return len(ids)
+
+
+def save_counts(counts, watermark, cutoff):
+    """Collect the saves and unsaves after watermark up to cutoff"""
+    saves = PostSave.objects.filter(savedDateTime__lte=cutoff)
+    unsaves = PostSave.objects.filter(postIsSaved=False, unsavedDateTime__lte=cutoff)
+    if watermark.lastDateTime is not None:
+        saves = saves.filter(savedDateTime__gt=watermark.lastDateTime)
+        unsaves = unsaves.filter(unsavedDateTime__gt=watermark.lastDateTime)
+    collect(counts, grouped_counts(saves, "savedDateTime", Value("saves")))
+    collect(counts, grouped_counts(unsaves, "unsavedDateTime", Value("unsaves")))
+    watermark.lastDateTime = cutoff
+
+
+def add_counts(counts):
+    """Add the collected counts to the rollup rows, creating missing hours"""
+    for (target, target_id, hour), columns in counts.items():
+        model, field = ROLLUP_TARGETS[target]
+        rows = model.objects.filter(**{field: target_id}, hour=hour)
+        if not rows.update(**{name: F(name) + n for name, n in columns.items()}):
+            model.objects.create(**{field: target_id}, hour=hour, **columns)
+
+
+def roll_up(batch_size=10000, now=None):
+    """Roll one batch of each source into the hourly rollups.
+
+    Returns the number of append-only events processed; the watermarks are
+    locked for the whole batch so concurrent runs do not count events twice.
+    """
+    cutoff = (now or timezone.now()) - timedelta(
+        seconds=settings.ENGAGEMENT_ROLLUP_LAG)
+    sources = [*EVENT_SOURCES, SAVE_SOURCE]
+    EngagementWatermark.objects.bulk_create(
+        [EngagementWatermark(source=source) for source in sources],
+        ignore_conflicts=True)
+
+    with transaction.atomic():
+        watermarks = {
+            watermark.source: watermark
+            for watermark in EngagementWatermark.objects.select_for_update()
+            .filter(source__in=sources).order_by("source")
+        }
+        counts = defaultdict(Counter)
+        processed = 0
+        for source, (model, hour, column) in EVENT_SOURCES.items():
+            processed += event_counts(counts, watermarks[source], model, hour,
+                                      column, cutoff, batch_size)
+        save_counts(counts, watermarks[SAVE_SOURCE], cutoff)
+        add_counts(counts)
+        for watermark in watermarks.values():
+            watermark.save()
+    return processed
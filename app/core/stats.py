@@ -0,0 +1,123 @@
+"""
+Receivers keeping the BusinessStats and MenuItemStats rollups up to date.
+
+Rollups are recomputed after the transaction that changed their inputs
+commits, so a business or menu item deleted in the same transaction is
+skipped.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import (
+    Business, BusinessStats, MenuItem, MenuItemStats, Post, PostLike,
+)
+
+# Post fields feeding the rollups; saves of other fields are ignored
+POST_STATS_FIELDS = {
+    "menuItem", "postRatingDelicious", "postRatingEatAgain",
+    "postRatingWorthIt", "postLikeCount", "postPhotoUrl",
+}
+
+
+def refresh_on_commit(manager, ids, method="refresh"):
+    for pk in set(ids) - {None}:
+        transaction.on_commit(partial(getattr(manager, method), pk))
+
+
+def refresh_post_rollups(menu_item_ids, business_ids):
+    refresh_on_commit(MenuItemStats.objects, menu_item_ids)
+    refresh_on_commit(BusinessStats.objects, business_ids)
+
+
+def post_rollup_ids(**filters):
+    """Return the (menu item ids, business ids) of the matching posts"""
+    rows = set(Post.objects.filter(**filters).values_list(
+        "menuItem_id", "menuItem__business_id"))
+    return {row[0] for row in rows}, {row[1] for row in rows}
+
+
+def skip_save(raw, update_fields, fields):
+    return raw or (update_fields is not None and not fields & set(update_fields))
+
+
+@receiver(post_save, sender=Business)
+def create_business_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        refresh_on_commit(BusinessStats.objects, [instance.pk])
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_rollups(sender, instance, raw, update_fields, **kwargs):
+    if instance.pk and not skip_save(raw, update_fields, POST_STATS_FIELDS):
+        instance._stats_rollup_ids = post_rollup_ids(pk=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def refresh_post(sender, instance, raw, update_fields, **kwargs):
+    if skip_save(raw, update_fields, POST_STATS_FIELDS):
+        return
+    menu_item_ids, business_ids = post_rollup_ids(pk=instance.pk)
+    previous = instance.__dict__.pop("_stats_rollup_ids", (set(), set()))
+    refresh_post_rollups(menu_item_ids | previous[0], business_ids | previous[1])
+
+
+@receiver(post_delete, sender=Post)
+def refresh_deleted_post(sender, instance, **kwargs):
+    if instance.menuItem_id:
+        refresh_post_rollups(
+            [instance.menuItem_id],
+            MenuItem.objects.filter(pk=instance.menuItem_id).values_list(
+                "business_id", flat=True))
+
+
+@receiver(post_save, sender=PostLike)
+def update_top_posts(sender, instance, created, raw, **kwargs):
+    if not created or raw:
+        return
+    menu_item_ids, business_ids = post_rollup_ids(pk=instance.post_id)
+    for manager, ids in ((MenuItemStats.objects, menu_item_ids),
+                         (BusinessStats.objects, business_ids)):
+        for pk in ids - {None}:
+            transaction.on_commit(partial(
+                manager.update_top_post, pk, instance.post_id, instance.isActive))
+
+
+@receiver(pre_save, sender=MenuItem)
+def remember_menu_item_business(sender, instance, raw, **kwargs):
+    if instance.pk and not raw:
+        instance._stats_business_ids = set(MenuItem.objects.filter(
+            pk=instance.pk).values_list("business_id", flat=True))
+
+
+@receiver(post_save, sender=MenuItem)
+def refresh_menu_item(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        refresh_on_commit(MenuItemStats.objects, [instance.pk])
+    previous = instance.__dict__.pop("_stats_business_ids", set())
+    refresh_on_commit(BusinessStats.objects, previous | {instance.business_id})
+
+
+@receiver(post_delete, sender=MenuItem)
+def refresh_deleted_menu_item_business(sender, instance, **kwargs):
+    refresh_on_commit(BusinessStats.objects, [instance.business_id])
+
+
+@receiver(m2m_changed, sender=Business.followers.through)
+def refresh_business_followers(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        instance._stats_business_ids = set(
+            instance.following_businesses.values_list("id", flat=True))
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        business_ids = [instance.pk]
+    elif action == "post_clear":
+        business_ids = instance.__dict__.pop("_stats_business_ids", set())
+    else:
+        business_ids = pk_set
+    refresh_on_commit(BusinessStats.objects, business_ids, "refresh_followers")
@@ -0,0 +1,134 @@
+"""
+Tests for the engagement series of the dashboards
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import analytics
+from core.models import (
+    Business, BusinessEngagementHour, MenuItem, Post, PostComment, PostLike,
+    PostSave, PostShare,
+)
+
+START = datetime(2024, 1, 1)
+
+
+def at(hours):
+    return (START + timedelta(hours=hours)).replace(tzinfo=timezone.utc)
+
+
+class SeriesStepTests(SimpleTestCase):
+    """Test choosing the distance between the points of a series."""
+
+    def test_series_step(self):
+        """Test longer ranges get coarser points"""
+        cases = [
+            (timedelta(hours=24), timedelta(hours=2)),
+            (timedelta(days=7), timedelta(days=1)),
+            (timedelta(days=31), timedelta(days=7)),
+            (timedelta(days=90), timedelta(days=30)),
+            (timedelta(days=365), timedelta(days=30)),
+            (timedelta(days=400), timedelta(days=1)),
+        ]
+        for delta, step in cases:
+            self.assertEqual(analytics.series_step(START, START + delta), step)
+
+    def test_parse_datetime_param(self):
+        """Test quoted and encoded datetimes are parsed"""
+        self.assertEqual(
+            analytics.parse_datetime_param('%222024-01-01T02%3A00%3A00.000Z%22'),
+            datetime(2024, 1, 1, 2))
+        with self.assertRaises(ValueError):
+            analytics.parse_datetime_param("2024-01-01")
+
+
+class EngagementSeriesTests(TestCase):
+    """Test computing the cumulative engagement of posts."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+        self.other = get_user_model().objects.create_user(
+            userEmailAddress="other@example.com",
+            password="test123",
+            userUsername="other",
+        )
+        self.business = Business.objects.create(businessName="Stall")
+        menu_item = MenuItem.objects.create(
+            name="Noodles", business=self.business, price=8.50)
+        self.post = Post.objects.create(
+            user=self.user,
+            menuItem=menu_item,
+            postReview="review",
+            postRatingDelicious=5,
+            postRatingEatAgain=4,
+            postRatingWorthIt=3,
+        )
+        self.unrelated = Post.objects.create(
+            user=self.user,
+            postReview="review",
+            postRatingDelicious=5,
+            postRatingEatAgain=4,
+            postRatingWorthIt=3,
+        )
+
+    def like(self, user, post, hours, isActive=True):
+        like = PostLike.objects.create(user=user, post=post, isActive=isActive)
+        PostLike.objects.filter(pk=like.pk).update(likeDateTime=at(hours))
+
+    def test_cumulative_series(self):
+        """Test each point totals the events up to its time"""
+        self.like(self.user, self.post, -5)
+        self.like(self.other, self.post, 3)
+        self.like(self.other, self.post, 9, isActive=False)
+        self.like(self.user, self.unrelated, 1)
+        PostSave.objects.create(user=self.user, post=self.post, postIsSaved=True,
+                                savedDateTime=at(2))
+        PostSave.objects.create(user=self.other, post=self.post, postIsSaved=False,
+                                savedDateTime=at(1), unsavedDateTime=at(5))
+        share = PostShare.objects.create(post=self.post, sharedBy=self.user,
+                                         sharedTo=self.other)
+        PostShare.objects.filter(pk=share.pk).update(sharedDateTime=at(4))
+        comment = PostComment.objects.create(user=self.user, post=self.post)
+        PostComment.objects.filter(pk=comment.pk).update(
+            commentPublishDateTime=at(30))
+        posts = Post.objects.filter(menuItem__business=self.business)
+        rollups = BusinessEngagementHour.objects.filter(business=self.business)
+
+        with CaptureQueriesContext(connection) as queries:
+            series = analytics.engagement_series(
+                rollups, posts, START, START + timedelta(hours=12))
+
+        self.assertEqual(len(queries), 6)
+        self.assertEqual([point["timestamp"] for point in series[:2]],
+                         ["2024-01-01T02:00:00", "2024-01-01T04:00:00"])
+        self.assertEqual([point["like"] for point in series], [1, 2, 2, 2, 1, 1])
+        self.assertEqual([point["save"] for point in series], [2, 2, 1, 1, 1, 1])
+        self.assertEqual([point["share"] for point in series], [0, 1, 1, 1, 1, 1])
+        self.assertEqual([point["comment"] for point in series], [0] * 6)
+
+    def test_business_endpoint(self):
+        """Test the dashboard endpoint serves the series of the business"""
+        self.like(self.other, self.post, 3)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse("business:analytic_interest_performance", args=[
+            self.business.id, "2024-01-01T00:00:00.000Z", "2024-01-02T00:00:00.000Z"])
+
+        res = client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 12)
+        self.assertEqual(res.data[1], {"timestamp": "2024-01-01T04:00:00",
+                                       "like": 1, "save": 0, "share": 0,
+                                       "comment": 0})
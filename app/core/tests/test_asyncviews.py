@@ -0,0 +1,80 @@
+"""
+Tests for async API views
+"""
+import asyncio
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from asgiref.sync import async_to_sync
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import force_authenticate
+
+from core.asyncviews import AsyncAPIView, offload
+
+
+class WhoAmIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        thread = await offload(lambda: threading.current_thread().name)
+        return Response({"userId": request.user.id, "thread": thread})
+
+
+class AsyncAPIViewTests(TestCase):
+    """Test async views and offloading their blocking calls."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = WhoAmIView.as_view()
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com", password="test123")
+
+    def test_handler_is_awaited(self):
+        """Test the handler runs after authentication, offloading its calls"""
+        request = self.factory.get("/")
+        force_authenticate(request, self.user)
+
+        response = async_to_sync(self.view)(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["userId"], self.user.id)
+        self.assertTrue(response.data["thread"].startswith("offload"))
+
+    def test_permission_denied(self):
+        """Test permissions are checked before the handler"""
+        response = async_to_sync(self.view)(self.factory.get("/"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_method_not_allowed(self):
+        """Test methods without a handler are refused"""
+        request = self.factory.post("/")
+        force_authenticate(request, self.user)
+
+        response = async_to_sync(self.view)(request)
+
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    @override_settings(ASYNC_OFFLOAD_THREADS=2)
+    def test_offload_is_bounded(self):
+        """Test no more calls run at once than the pool has threads"""
+        running = []
+        peak = []
+
+        def call():
+            running.append(1)
+            peak.append(len(running))
+            time.sleep(0.05)
+            running.pop()
+
+        async def burst():
+            await asyncio.gather(*(offload(call) for _ in range(6)))
+
+        async_to_sync(burst)()
+
+        self.assertEqual(max(peak), 2)
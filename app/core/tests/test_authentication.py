@@ -0,0 +1,182 @@
+"""
+Tests for the cached token authentication
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import authentication
+from core.caching import LRUCache
+from core.models import Post
+
+
+class LRUCacheTests(SimpleTestCase):
+    """Test the bounded in-process cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the least recently read entry is dropped first"""
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        """Test entries are gone once their ttl has passed"""
+        cache = LRUCache(maxsize=2, ttl=10)
+        with mock.patch("core.caching.time.monotonic", return_value=100):
+            cache.set("a", 1)
+            cache.set("b", 2, ttl=30)
+        with mock.patch("core.caching.time.monotonic", return_value=115):
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(cache.get("b"), 2)
+
+
+@override_settings(AUTH_TOKEN_CACHE_ENABLED=True)
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with cached tokens."""
+
+    def setUp(self):
+        authentication.reset_token_cache(setting="AUTH_TOKEN_CACHE_ENABLED")
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.post = Post.objects.create(
+            user=self.user,
+            postReview="review",
+            postRatingDelicious=5,
+            postRatingEatAgain=3,
+            postRatingWorthIt=2,
+        )
+        self.url = reverse("post:single-post", args=[self.post.id])
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_cached_token_skips_lookup(self):
+        """Test a repeated request authenticates without a query.
+
+        The view itself reads the post and its relations; only the token
+        lookup differs between the two modes.
+        """
+        with override_settings(AUTH_TOKEN_CACHE_ENABLED=False):
+            uncached = self.count_queries()
+            self.assertEqual(self.count_queries(), uncached)
+
+        self.count_queries()
+        cached = self.count_queries()
+
+        self.assertEqual(cached, uncached - 1)
+
+    def test_cached_request_user(self):
+        """Test the restored user carries the stored fields"""
+        self.count_queries()
+        with mock.patch.object(authentication.TokenAuthentication,
+                               "authenticate_credentials") as lookup:
+            user, token = authentication.CachedTokenAuthentication() \
+                .authenticate_credentials(self.token.key)
+
+        lookup.assert_not_called()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.userUsername, "user")
+        self.assertEqual(user.password, self.user.password)
+        self.assertEqual(token.key, self.token.key)
+        self.assertEqual(token.user, user)
+
+    def test_logout_revokes_cached_token(self):
+        """Test a token deleted on logout stops authenticating at once"""
+        self.count_queries()
+
+        res = self.client.post(reverse("user:logout"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_save_invalidates_snapshot(self):
+        """Test changes to the user are seen by the next request"""
+        self.count_queries()
+
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_follow_invalidates_snapshot(self):
+        """Test counters written with update() drop the cached snapshot"""
+        self.count_queries()
+        follower = get_user_model().objects.create_user(
+            userEmailAddress="follower@example.com", password="test123")
+        client = APIClient()
+        client.force_authenticate(follower)
+
+        client.post(reverse("user:follow_user", args=[self.user.id]))
+
+        self.assertIsNone(authentication.get_token_cache().get(self.token.key))
+
+    def test_write_starts_from_stored_user(self):
+        """Test a stale snapshot is not saved back over newer columns"""
+        self.count_queries()
+        # Written by another process, whose invalidation this one misses
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            userFollowers=5, userProfilePictureUrl="uploads/user/new.jpg")
+
+        res = self.client.patch(reverse("user:me"), {"userBio": "Hello"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.userBio, "Hello")
+        self.assertEqual(self.user.userFollowers, 5)
+        self.assertEqual(self.user.userProfilePictureUrl.name, "uploads/user/new.jpg")
+
+    def test_read_returns_stored_user(self):
+        """Test the profile shows writes another process made after caching"""
+        self.count_queries()
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            userBio="Written elsewhere")
+
+        res = self.client.get(reverse("user:me"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["userBio"], "Written elsewhere")
+
+    @override_settings(AUTH_TOKEN_CACHE_ALIAS="default")
+    def test_shared_cache_invalidation_reaches_other_processes(self):
+        """Test a token revoked in one process is refused by another"""
+        other_process = authentication.TokenCache()
+        self.count_queries()
+        self.assertIsNotNone(other_process.get(self.token.key))
+
+        self.client.post(reverse("user:logout"))
+
+        self.assertIsNone(other_process.get(self.token.key))
+
+    def test_invalid_token(self):
+        """Test an unknown token is rejected and not cached"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(authentication.get_token_cache().get("invalid"))
@@ -2,13 +2,28 @@
 Test custom Django management commands/
 """
 
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
+from PIL import Image
+
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.models import (
+    Post, PostLike, PostComment, CommentLike, ImageJob, Business, BusinessStats,
+    MenuItem, PostEngagementHour, OutboxMessage,
+)
+from core.renditions import RENDITION_FORMATS, rendition_file
 
 
 @patch("core.management.commands.wait_for_db.Command.check")
@@ -33,3 +48,297 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=["default"])
+
+
+class RebuildLikeCountsTests(TestCase):
+    """Test rebuilding like counters from the like history."""
+
+    def test_rebuild_like_counts_repairs_drift(self):
+        """Test drifted post and comment counters are rebuilt"""
+        user = get_user_model().objects.create_user(
+            userEmailAddress="test@example.com",
+            password="testpass123",
+            userUsername="username1"
+        )
+        post = Post.objects.create(
+            user=user,
+            postReview="Sample post review",
+            postRatingDelicious=5,
+            postRatingEatAgain=5,
+            postRatingWorthIt=5
+        )
+        untouched = Post.objects.create(
+            user=user,
+            postReview="Sample post review",
+            postRatingDelicious=5,
+            postRatingEatAgain=5,
+            postRatingWorthIt=5
+        )
+        comment = PostComment.objects.create(user=user, post=post)
+        PostLike.objects.create(user=user, post=post, isActive=True)
+        PostLike.objects.create(user=user, post=post, isActive=False)
+        PostLike.objects.create(user=user, post=post, isActive=True)
+        CommentLike.objects.create(user=user, comment=comment, isActive=True)
+        Post.objects.filter(pk=post.pk).update(postLikeCount=42)
+        Post.objects.filter(pk=untouched.pk).update(postLikeCount=7)
+        PostComment.objects.filter(pk=comment.pk).update(commentLikeCount=0)
+
+        call_command("rebuild_like_counts")
+
+        post.refresh_from_db()
+        untouched.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual(post.postLikeCount, 1)
+        self.assertEqual(untouched.postLikeCount, 0)
+        self.assertEqual(comment.commentLikeCount, 1)
+
+
+class RebuildBusinessStatsTests(TestCase):
+    """Test rebuilding the business stats rollups."""
+
+    def test_rebuild_business_stats(self):
+        """Test missing and drifted rollups are recomputed"""
+        user = get_user_model().objects.create_user(
+            userEmailAddress="test@example.com",
+            password="testpass123",
+            userUsername="username1"
+        )
+        business = Business.objects.create(user=user, businessName="Stall")
+        empty = Business.objects.create(user=user, businessName="Empty")
+        menu_item = MenuItem.objects.create(
+            name="Noodles", business=business, price=8.50)
+        post = Post.objects.create(
+            user=user,
+            menuItem=menu_item,
+            postReview="Sample post review",
+            postRatingDelicious=4,
+            postRatingEatAgain=3,
+            postRatingWorthIt=2
+        )
+        business.followers.add(user)
+        BusinessStats.objects.create(business=empty, postCount=9)
+
+        out = StringIO()
+        call_command("rebuild_business_stats", stdout=out)
+
+        stats = BusinessStats.objects.get(business=business)
+        self.assertEqual(stats.deliciousRating, 4)
+        self.assertEqual(stats.worthItRating, 2)
+        self.assertEqual(str(stats.lowestPrice), "8.50")
+        self.assertEqual(stats.postIds, [post.id])
+        self.assertEqual(stats.topPost, post)
+        self.assertEqual(stats.followerIds, [user.id])
+        self.assertEqual(BusinessStats.objects.get(business=empty).postCount, 0)
+        self.assertIn("2 businesses", out.getvalue())
+
+
+class RollupEngagementTests(TestCase):
+    """Test rolling up engagement events."""
+
+    def test_rollup_engagement_once(self):
+        """Test the command rolls up the pending events and exits"""
+        user = get_user_model().objects.create_user(
+            userEmailAddress="test@example.com",
+            password="testpass123",
+            userUsername="username1"
+        )
+        post = Post.objects.create(
+            user=user,
+            postReview="Sample post review",
+            postRatingDelicious=4,
+            postRatingEatAgain=3,
+            postRatingWorthIt=2
+        )
+        like = PostLike.objects.create(user=user, post=post)
+        PostLike.objects.filter(pk=like.pk).update(
+            likeDateTime=like.likeDateTime - timedelta(hours=1))
+
+        out = StringIO()
+        call_command("rollup_engagement", "--once", stdout=out)
+
+        self.assertEqual(PostEngagementHour.objects.get(post=post).likes, 1)
+        self.assertIn("Rolled up 1 events", out.getvalue())
+
+
+class DispatchOutboxTests(TestCase):
+    """Test sending the outbox messages to the channel layer."""
+
+    def test_claim_keeps_recipient_order(self):
+        """Test only the oldest unsent message of a recipient is claimed"""
+        first = OutboxMessage.objects.enqueue("user_1", {"type": "a"})
+        OutboxMessage.objects.enqueue("user_1", {"type": "b"})
+        other = OutboxMessage.objects.enqueue("user_2", {"type": "c"})
+
+        claimed = OutboxMessage.objects.claim(10)
+
+        self.assertEqual(claimed, [first, other])
+        self.assertEqual(OutboxMessage.objects.claim(10), [])
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_DELAY=60)
+    def test_failed_message_is_retried_later(self):
+        """Test a failed send backs off and is given up after max attempts"""
+        message = OutboxMessage.objects.enqueue("user_1", {"type": "a"})
+        OutboxMessage.objects.enqueue("user_1", {"type": "b"})
+        message = OutboxMessage.objects.claim(10)[0]
+
+        message.retry("layer down")
+
+        self.assertEqual(message.status, OutboxMessage.PENDING)
+        self.assertGreater(message.availableDateTime, timezone.now())
+        self.assertEqual(OutboxMessage.objects.claim(10), [])
+        OutboxMessage.objects.filter(pk=message.pk).update(
+            availableDateTime=timezone.now())
+        message = OutboxMessage.objects.claim(10)[0]
+        message.retry("layer down")
+        self.assertEqual(message.status, OutboxMessage.FAILED)
+        self.assertEqual([m.message for m in OutboxMessage.objects.claim(10)],
+                         [{"type": "b"}])
+
+    def test_dispatch_outbox_sends_and_deletes(self):
+        """Test the command sends the due messages and removes them"""
+        OutboxMessage.objects.enqueue("user_1", {"type": "a"})
+        OutboxMessage.objects.enqueue("user_1", {"type": "b"})
+        sent = []
+
+        async def group_send(group, message):
+            sent.append((group, message["type"]))
+
+        out = StringIO()
+        with patch("core.layers.PostgresChannelLayer.group_send",
+                   side_effect=group_send):
+            call_command("dispatch_outbox", "--once", stdout=out)
+
+        self.assertEqual(sent, [("user_1", "a"), ("user_1", "b")])
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertIn("Sent 2 outbox messages", out.getvalue())
+
+
+@override_settings(IMAGE_MAX_WIDTH=40, IMAGE_RENDITION_WIDTHS=[10, 20])
+class ProcessImageJobsTests(TestCase):
+    """Test the background image processing worker."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.storage = override_settings(MEDIA_ROOT=self.media.name)
+        self.storage.enable()
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+
+    def tearDown(self):
+        self.storage.disable()
+        self.media.cleanup()
+
+    def upload(self, name="photo.png", size=(20, 10)):
+        buffer = tempfile.SpooledTemporaryFile()
+        Image.new("RGBA", size).save(buffer, format="PNG")
+        buffer.seek(0)
+        return SimpleUploadedFile(name, buffer.read(), "image/png")
+
+    def create_post(self, **params):
+        return Post.objects.create(
+            user=self.user, postReview="review", postRatingDelicious=4,
+            postRatingEatAgain=4, postRatingWorthIt=4, **params)
+
+    def test_upload_is_stored_and_queued(self):
+        """Test an upload keeps the original bytes and queues a job"""
+        post = self.create_post(postPhotoUrl=self.upload())
+
+        self.assertEqual(post.postPhotoStatus, Post.PHOTO_PROCESSING)
+        with Image.open(post.postPhotoUrl.path) as img:
+            self.assertEqual((img.format, img.size), ("PNG", (20, 10)))
+        job = ImageJob.objects.get()
+        self.assertEqual((job.targetId, job.fieldName, job.sourceName),
+                         (post.id, "postPhotoUrl", post.postPhotoUrl.name))
+
+    def test_process_swaps_resized_image(self):
+        """Test the worker swaps in the resized JPEG and drops the original"""
+        post = self.create_post(postPhotoUrl=self.upload())
+        original = post.postPhotoUrl.path
+
+        call_command("process_image_jobs", "--once", stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.postPhotoStatus, Post.PHOTO_READY)
+        self.assertNotEqual(post.postPhotoUrl.path, original)
+        self.assertFalse(os.path.exists(original))
+        with Image.open(post.postPhotoUrl.path) as img:
+            self.assertEqual((img.format, img.size), ("JPEG", (40, 20)))
+        self.assertEqual(ImageJob.objects.get().status, ImageJob.DONE)
+
+    def test_process_generates_renditions(self):
+        """Test the worker writes every rendition of the processed image"""
+        post = self.create_post(postPhotoUrl=self.upload())
+
+        call_command("process_image_jobs", "--once", stdout=StringIO())
+
+        post.refresh_from_db()
+        for width in (10, 20):
+            for image_format, pil_format in RENDITION_FORMATS.items():
+                path = rendition_file(post.postPhotoUrl, width, image_format).path
+                with Image.open(path) as img:
+                    self.assertEqual((img.format, img.width), (pil_format, width))
+
+    def test_process_skips_replaced_image(self):
+        """Test a job for an image replaced before processing is dropped"""
+        post = self.create_post(postPhotoUrl=self.upload())
+        post.postPhotoUrl = self.upload()
+        post.save()
+
+        call_command("process_image_jobs", "--once", stdout=StringIO())
+
+        post.refresh_from_db()
+        first, second = ImageJob.objects.order_by("id")
+        self.assertEqual(first.error, "Image replaced before processing")
+        self.assertEqual(second.status, ImageJob.DONE)
+        self.assertEqual(post.postPhotoStatus, Post.PHOTO_READY)
+
+    def test_process_marks_unreadable_image_failed(self):
+        """Test a file that is not an image fails after the last attempt"""
+        post = self.create_post(postPhotoUrl=self.upload())
+        with open(post.postPhotoUrl.path, "wb") as image_file:
+            image_file.write(b"not an image")
+
+        call_command("process_image_jobs", "--once", stdout=StringIO())
+
+        post.refresh_from_db()
+        job = ImageJob.objects.get()
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(post.postPhotoStatus, Post.PHOTO_FAILED)
+
+    def test_stale_jobs_fail_after_last_attempt(self):
+        """Test a job that keeps stopping its worker is not claimed again"""
+        post = self.create_post(postPhotoUrl=self.upload())
+        other = self.create_post(postPhotoUrl=self.upload())
+        ImageJob.objects.update(status=ImageJob.PROCESSING, attempts=2,
+                                updatedDateTime=timezone.now() - timedelta(hours=1))
+        ImageJob.objects.filter(targetId=post.id).update(attempts=3)
+
+        requeued = ImageJob.objects.requeue_stale(timedelta(minutes=10))
+
+        self.assertEqual(requeued, 1)
+        job = ImageJob.objects.get(targetId=post.id)
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertEqual(job.error, "Worker stopped while processing the image")
+        post.refresh_from_db()
+        self.assertEqual(post.postPhotoStatus, Post.PHOTO_FAILED)
+        self.assertEqual(ImageJob.objects.get(targetId=other.id).status,
+                         ImageJob.PENDING)
+
+    def test_profile_pictures_are_queued(self):
+        """Test profile and cover uploads are processed in the background"""
+        self.user.userProfilePictureUrl = self.upload()
+        self.user.userCoverPictureUrl = self.upload()
+        self.user.save()
+
+        call_command("process_image_jobs", "--once", stdout=StringIO())
+
+        self.user.refresh_from_db()
+        self.assertEqual(ImageJob.objects.filter(status=ImageJob.DONE).count(), 2)
+        for field_file in (self.user.userProfilePictureUrl,
+                           self.user.userCoverPictureUrl):
+            with Image.open(field_file.path) as img:
+                self.assertEqual(img.size, (40, 20))
@@ -0,0 +1,161 @@
+"""
+Tests for the Firebase ID token verifier
+"""
+import time
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from google.auth import crypt, jwt
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import firebase
+from core.models import User
+
+PROJECT_ID = "test-project"
+KEY_ID = "test-key"
+
+
+def generate_key_pair():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return private_pem, public_pem
+
+
+PRIVATE_KEY, PUBLIC_KEY = generate_key_pair()
+
+
+class LocalKeyVerifier(firebase.IdTokenVerifier):
+    """Verifier trusting the key pair generated for the tests"""
+
+    def __init__(self, project_id=PROJECT_ID, cache_size=16):
+        super().__init__(project_id, cache_size)
+
+    def get_certificate_source(self):
+        return firebase.StaticCertificateSource({KEY_ID: PUBLIC_KEY})
+
+
+def create_id_token(private_key=PRIVATE_KEY, **claims):
+    """Return an ID token as Firebase would issue it"""
+    now = int(time.time())
+    payload = {
+        "iss": firebase.ID_TOKEN_ISSUER_PREFIX + PROJECT_ID,
+        "aud": PROJECT_ID,
+        "sub": "firebase-uid",
+        "iat": now - 10,
+        "exp": now + 3600,
+        "email": "user@example.com",
+        "name": "Firebase User",
+    }
+    payload.update(claims)
+    signer = crypt.RSASigner.from_string(private_key, key_id=KEY_ID)
+    return jwt.encode(signer, payload).decode()
+
+
+class IdTokenVerifierTests(SimpleTestCase):
+    """Test verifying ID tokens against cached certificates."""
+
+    def setUp(self):
+        self.verifier = LocalKeyVerifier()
+
+    def test_verify_valid_token(self):
+        """Test the claims of a valid token are returned with the uid"""
+        claims = self.verifier.verify(create_id_token())
+
+        self.assertEqual(claims["uid"], "firebase-uid")
+        self.assertEqual(claims["email"], "user@example.com")
+
+    def test_verified_tokens_are_memoized(self):
+        """Test a token is decoded once until it expires"""
+        id_token = create_id_token()
+
+        with mock.patch("core.firebase.jwt.decode", wraps=jwt.decode) as decode:
+            first = self.verifier.verify(id_token)
+            first["uid"] = "changed"
+            second = self.verifier.verify(id_token)
+
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(second["uid"], "firebase-uid")
+
+    def test_invalid_tokens(self):
+        """Test tokens with a bad signature or claims are rejected"""
+        other_private_key, _ = generate_key_pair()
+        now = int(time.time())
+        id_tokens = [
+            create_id_token(private_key=other_private_key),
+            create_id_token(aud="other-project"),
+            create_id_token(iss="https://securetoken.google.com/other-project"),
+            create_id_token(sub=""),
+            create_id_token(iat=now - 7200, exp=now - 3600),
+            "not a token",
+            "",
+        ]
+
+        for id_token in id_tokens:
+            with self.assertRaises(firebase.InvalidIdToken):
+                self.verifier.verify(id_token)
+
+    def test_parse_max_age(self):
+        """Test reading the max-age of a Cache-Control header"""
+        self.assertEqual(firebase.parse_max_age(
+            "public, max-age=19572, must-revalidate, no-transform"), 19572)
+        self.assertEqual(firebase.parse_max_age("no-cache"), 0)
+        self.assertEqual(firebase.parse_max_age(None), 0)
+
+
+class CertificateSourceTests(SimpleTestCase):
+    """Test caching fetched certificates."""
+
+    def test_certificates_kept_for_max_age(self):
+        """Test certificates are fetched again only after max-age"""
+        source = firebase.CertificateSource()
+        with mock.patch.object(source, "fetch",
+                               return_value=({KEY_ID: "cert"}, 100)) as fetch, \
+                mock.patch("core.firebase.time.monotonic") as monotonic:
+            monotonic.return_value = 1000
+            source.get()
+            monotonic.return_value = 1099
+            self.assertEqual(source.get(), {KEY_ID: "cert"})
+            self.assertEqual(fetch.call_count, 1)
+
+            monotonic.return_value = 1100
+            source.get()
+            self.assertEqual(fetch.call_count, 2)
+
+
+@override_settings(
+    FIREBASE_TOKEN_VERIFIER="core.tests.test_firebase.LocalKeyVerifier")
+class FirebaseAuthViewTests(TestCase):
+    """Test logging in with a Firebase ID token."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_login_registers_user(self):
+        """Test a verified token registers the Firebase user"""
+        res = self.client.post(reverse("user:firebase_auth"),
+                               {"idToken": create_id_token()})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user = User.objects.get(firebase_uid="firebase-uid")
+        self.assertEqual(res.data["localId"], user.id)
+        self.assertEqual(user.userEmailAddress, "user@example.com")
+
+    def test_login_invalid_token(self):
+        """Test an invalid token is refused"""
+        res = self.client.post(reverse("user:firebase_auth"),
+                               {"idToken": create_id_token(aud="other-project")})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,37 @@
+"""
+Tests for the geospatial helpers
+"""
+from django.test import SimpleTestCase
+
+from core import geo
+
+
+class GeoTests(SimpleTestCase):
+    """Test geohash encoding and bounding box coverage."""
+
+    def test_encode_geohash(self):
+        """Test encoding a known coordinate"""
+        self.assertEqual(geo.encode_geohash(57.64911, 10.40744, 11),
+                         "u4pruydqqvj")
+
+    def test_bounding_box_contains_radius(self):
+        """Test the bounding box reaches at least the radius"""
+        min_lat, min_lng, max_lat, max_lng = geo.bounding_box(3.139, 101.6869, 10)
+
+        self.assertGreater(max_lat - 3.139, 10 / 111.7)
+        self.assertGreater(101.6869 - min_lng, 10 / 111.7)
+
+    def test_covering_geohashes_cover_points_in_box(self):
+        """Test every point inside the box matches one of the prefixes"""
+        box = geo.bounding_box(3.139, 101.6869, 25)
+        prefixes = geo.covering_geohashes(box)
+        min_lat, min_lng, max_lat, max_lng = box
+
+        self.assertLessEqual(len(prefixes), 16)
+        for step_lat in range(11):
+            for step_lng in range(11):
+                geohash = geo.encode_geohash(
+                    min_lat + (max_lat - min_lat) * step_lat / 10,
+                    min_lng + (max_lng - min_lng) * step_lng / 10)
+                self.assertTrue(any(geohash.startswith(prefix)
+                                    for prefix in prefixes))
@@ -0,0 +1,116 @@
+"""
+Tests for the IP geolocation providers
+"""
+import importlib
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import geoip
+
+ROWS = """\
+1.0.0.0,1.0.0.255,OC,AU,Queensland,Brisbane
+1.0.1.0,1.0.3.255,AS,CN,Fujian,Fuzhou
+60.48.0.0,60.54.255.255,AS,MY,Kuala Lumpur,Kuala Lumpur
+2001:200::,2001:200:ffff:ffff:ffff:ffff:ffff:ffff,AS,JP,Tokyo,Tokyo
+"""
+
+
+def write_database(rows=ROWS):
+    database = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False)
+    with database:
+        database.write(rows)
+    return database.name
+
+
+class RangeFileProviderTests(SimpleTestCase):
+    """Test looking up addresses in a range file."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.path = write_database()
+        cls.provider = geoip.RangeFileProvider(cls.path, cache_size=8)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.path)
+        super().tearDownClass()
+
+    def test_lookup_inside_ranges(self):
+        """Test addresses resolve to the range that contains them"""
+        self.assertEqual(self.provider.lookup("1.0.0.0"),
+                         geoip.GeoLocation("AU", "Queensland"))
+        self.assertEqual(self.provider.lookup("1.0.2.7"),
+                         geoip.GeoLocation("CN", "Fujian"))
+        self.assertEqual(self.provider.lookup("60.54.255.255"),
+                         geoip.GeoLocation("MY", "Kuala Lumpur"))
+        self.assertEqual(self.provider.lookup("2001:200::1"),
+                         geoip.GeoLocation("JP", "Tokyo"))
+
+    def test_lookup_outside_ranges(self):
+        """Test gaps, invalid and missing addresses resolve to None"""
+        for ip in ["0.255.255.255", "1.0.4.0", "255.255.255.255",
+                   "::1", "not an ip", None]:
+            self.assertIsNone(self.provider.lookup(ip))
+
+    def test_lookups_are_cached(self):
+        """Test repeated lookups are served from the LRU cache"""
+        self.provider.lookup_cached.cache_clear()
+        for _ in range(3):
+            self.provider.lookup("60.50.1.1")
+
+        info = self.provider.lookup_cached.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+
+    def test_missing_database(self):
+        """Test a missing database file resolves nothing"""
+        provider = geoip.RangeFileProvider("/nonexistent/geoip.csv")
+
+        self.assertIsNone(provider.lookup("1.0.0.1"))
+
+
+class ServerStartTests(SimpleTestCase):
+    """Test the servers load the provider before serving."""
+
+    @override_settings(GEOIP_PROVIDER="core.geoip.NullProvider")
+    def test_servers_load_provider(self):
+        """Test importing the WSGI and ASGI applications loads the provider"""
+        for module in ("app.wsgi", "app.asgi"):
+            with self.subTest(module=module):
+                geoip.reset_geoip_provider(setting="GEOIP_PROVIDER")
+                importlib.reload(importlib.import_module(module))
+
+                self.assertIsInstance(geoip._provider, geoip.NullProvider)
+
+
+class GeoIPViewTests(TestCase):
+    """Test the views locating requests with the configured provider."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_records_location(self):
+        """Test the profile view stores the location of the client address"""
+        path = write_database()
+        self.addCleanup(os.remove, path)
+        with override_settings(GEOIP_DATABASE_PATH=path,
+                               LAST_SEEN_FLUSH_INTERVAL=0):
+            self.client.get(reverse("user:me"),
+                            HTTP_X_FORWARDED_FOR="60.50.1.1, 10.0.0.1")
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.IPv4, {
+            "ipAddress": "60.50.1.1",
+            "location": {"state": "Kuala Lumpur", "country": "MY"},
+        })
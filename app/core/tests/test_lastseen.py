@@ -0,0 +1,105 @@
+"""
+Tests for the write-behind last-seen address tracking
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.lastseen import LastSeenTracker, last_seen
+
+ME_URL = reverse("user:me")
+
+
+def create_user(**params):
+    return get_user_model().objects.create_user(password="test123", **params)
+
+
+class LastSeenTrackerTests(TestCase):
+    """Test coalescing and flushing last-seen addresses."""
+
+    def setUp(self):
+        self.tracker = LastSeenTracker()
+        self.user = create_user(userEmailAddress="user@example.com",
+                                userUsername="user")
+        self.other = create_user(userEmailAddress="other@example.com",
+                                 userUsername="other")
+
+    @override_settings(LAST_SEEN_FLUSH_INTERVAL=3600,
+                       AUTH_TOKEN_CACHE_ENABLED=True)
+    def test_changes_are_coalesced_until_flush(self):
+        """Test queued addresses are written in one batch on flush"""
+        with self.assertNumQueries(0):
+            self.tracker.record(self.user, "10.0.0.1")
+            self.tracker.record(self.user, "10.0.0.2")
+            self.tracker.record(self.other, "10.0.0.3")
+
+        # The batch, then the tokens of the users whose snapshots are dropped
+        with self.assertNumQueries(2):
+            self.assertEqual(self.tracker.flush(), 2)
+
+        self.user.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.user.IPv4["ipAddress"], "10.0.0.2")
+        self.assertEqual(self.other.IPv4["ipAddress"], "10.0.0.3")
+
+    @override_settings(LAST_SEEN_FLUSH_INTERVAL=0)
+    def test_unchanged_address_is_not_written(self):
+        """Test a request from the stored address causes no write"""
+        self.user.IPv4 = {"ipAddress": "10.0.0.1", "location": "Location unavailable"}
+        self.user.save()
+
+        with self.assertNumQueries(0):
+            self.tracker.record(self.user, "10.0.0.1")
+
+    @override_settings(LAST_SEEN_FLUSH_INTERVAL=3600)
+    def test_return_to_stored_address_drops_queued(self):
+        """Test moving back to the stored address discards the queued one"""
+        self.user.IPv4 = {"ipAddress": "10.0.0.1"}
+        self.user.save()
+
+        self.tracker.record(self.user, "10.0.0.2")
+        self.tracker.record(self.user, "10.0.0.1")
+
+        self.assertEqual(self.tracker.flush(), 0)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.IPv4["ipAddress"], "10.0.0.1")
+
+    @override_settings(LAST_SEEN_FLUSH_INTERVAL=0)
+    def test_failed_flush_keeps_addresses(self):
+        """Test a database error neither fails the request nor loses entries"""
+        with mock.patch.object(get_user_model().objects, "bulk_update",
+                               side_effect=DatabaseError("down")):
+            self.tracker.record(self.user, "10.0.0.1")
+        self.tracker.pending[self.other.pk] = "10.0.0.3"
+
+        self.assertEqual(self.tracker.flush(), 2)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.IPv4["ipAddress"], "10.0.0.1")
+
+
+class ManagerUserViewLastSeenTests(TestCase):
+    """Test GET /user/me/ does not write the user row."""
+
+    def setUp(self):
+        self.user = create_user(userEmailAddress="user@example.com",
+                                userUsername="user")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        last_seen.flush()
+
+    @override_settings(LAST_SEEN_FLUSH_INTERVAL=3600)
+    def test_profile_get_defers_write(self):
+        """Test the address is reported at once and stored on flush"""
+        res = self.client.get(ME_URL, REMOTE_ADDR="10.1.1.1")
+
+        self.assertEqual(res.data["IPv4"]["ipAddress"], "10.1.1.1")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.IPv4, {})
+
+        last_seen.flush()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.IPv4["ipAddress"], "10.1.1.1")
@@ -0,0 +1,118 @@
+"""
+Tests for the Postgres channel layer
+"""
+import asyncio
+
+from channels.exceptions import ChannelFull
+from django.test import TransactionTestCase
+
+from core.layers import PostgresChannelLayer
+
+
+class PostgresChannelLayerTests(TransactionTestCase):
+    """Test delivering messages between layers of different processes."""
+
+    def setUp(self):
+        self.layers = []
+
+    def layer(self, **config):
+        layer = PostgresChannelLayer(**config)
+        self.layers.append(layer)
+        return layer
+
+    def tearDown(self):
+        for layer in self.layers:
+            layer.stop_listener()
+
+    async def receive(self, layer, channel):
+        return await asyncio.wait_for(layer.receive(channel), timeout=2)
+
+    async def test_group_send_reaches_other_process(self):
+        """Test a group message reaches every member in every process"""
+        worker, other, sender = self.layer(), self.layer(), self.layer()
+        first = await worker.new_channel()
+        second = await other.new_channel()
+        await worker.group_add("user_1", first)
+        await other.group_add("user_1", second)
+        await other.group_add("user_2", await other.new_channel())
+
+        await sender.group_send("user_1", {"type": "share.post", "post_id": 1})
+
+        self.assertEqual(await self.receive(worker, first),
+                         {"type": "share.post", "post_id": 1})
+        self.assertEqual(await self.receive(other, second),
+                         {"type": "share.post", "post_id": 1})
+
+    async def test_send_to_specific_channel(self):
+        """Test a process-specific channel is reached from another process"""
+        worker, sender = self.layer(), self.layer()
+        channel = await worker.new_channel()
+        worker.ensure_listener()
+
+        await sender.send(channel, {"type": "hello"})
+
+        self.assertEqual(await self.receive(worker, channel), {"type": "hello"})
+
+    async def test_discarded_member_is_skipped(self):
+        """Test the process stops listening once its group is empty"""
+        worker, sender = self.layer(), self.layer()
+        channel = await worker.new_channel()
+        await worker.group_add("user_1", channel)
+        await worker.group_discard("user_1", channel)
+
+        await sender.group_send("user_1", {"type": "share.post"})
+        await asyncio.sleep(0.1)
+
+        self.assertNotIn(worker.group_channel("user_1"), worker.listening)
+        self.assertNotIn(channel, worker.channels)
+
+    async def test_capacity_bounds_queues(self):
+        """Test full queues drop group messages and refuse local sends"""
+        worker = self.layer(capacity=2, channel_capacity={"slow.*": 1})
+        sender = self.layer()
+        channel = await worker.new_channel()
+        slow = await worker.new_channel("slow")
+        await worker.group_add("user_1", channel)
+        await worker.group_add("user_1", slow)
+
+        for index in range(3):
+            await sender.group_send("user_1", {"type": "share.post", "n": index})
+        await asyncio.sleep(0.2)
+
+        self.assertEqual(worker.channels[channel].qsize(), 2)
+        self.assertEqual(worker.channels[slow].qsize(), 1)
+        with self.assertRaises(ChannelFull):
+            await worker.send(channel, {"type": "local"})
+
+    async def test_expired_messages_end_membership(self):
+        """Test expired messages are dropped and their channel leaves groups"""
+        worker = self.layer(expiry=-1)
+        channel = await worker.new_channel()
+        await worker.group_add("user_1", channel)
+        await worker.send(channel, {"type": "stale"})
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(worker.receive(channel), timeout=0.2)
+
+        self.assertNotIn("user_1", worker.groups)
+        self.assertNotIn(worker.group_channel("user_1"), worker.listening)
+
+    async def test_large_message_is_refused(self):
+        """Test messages beyond the NOTIFY payload limit raise"""
+        sender = self.layer()
+
+        with self.assertRaises(ValueError):
+            await sender.group_send("user_1", {"type": "big", "text": "x" * 8000})
+
+    async def test_idle_process_stops_listening(self):
+        """Test the listener is closed once the last receiver is cancelled"""
+        worker = self.layer()
+        receive = asyncio.ensure_future(worker.receive(await worker.new_channel()))
+        await asyncio.sleep(0.05)
+        self.assertIsNotNone(worker.listener)
+
+        receive.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await receive
+
+        self.assertIsNone(worker.listener)
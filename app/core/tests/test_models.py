@@ -158,4 +158,85 @@ class ModelTests(TestCase):
         )
         file_path = models.post_image_file_path(post, "example.jpg")
 
-        self.assertEqual(file_path, f"uploads/posts/user{user.id}/images/{uuid}.jpg")
\ No newline at end of file
+        self.assertEqual(file_path, f"uploads/posts/user{user.id}/images/{uuid}.jpg")
+
+    def test_post_like_updates_counter_incrementally(self):
+        """Test likes and unlikes apply a delta to the post like counter"""
+        user = get_user_model().objects.create_user(
+            userEmailAddress="test@example.com",
+            password="testpass123",
+            userUsername="username1123"
+        )
+        post = models.Post.objects.create(
+            user=user,
+            postReview="Sample post review",
+            postRatingDelicious=5,
+            postRatingEatAgain=5,
+            postRatingWorthIt=5
+        )
+
+        # The counter column is updated without going through Post.save
+        with patch.object(models.Post, "save") as patched_save:
+            models.PostLike.objects.create(
+                user=user, post=post, isActive=True)
+        patched_save.assert_not_called()
+        post.refresh_from_db()
+        self.assertEqual(post.postLikeCount, 1)
+
+        models.PostLike.objects.create(user=user, post=post, isActive=False)
+        post.refresh_from_db()
+        self.assertEqual(post.postLikeCount, 0)
+
+    def test_post_like_state_tracks_latest_event(self):
+        """Test the like state keeps one row per user and post"""
+        user = get_user_model().objects.create_user(
+            userEmailAddress="test@example.com",
+            password="testpass123",
+            userUsername="username1123"
+        )
+        post = models.Post.objects.create(
+            user=user,
+            postReview="Sample post review",
+            postRatingDelicious=5,
+            postRatingEatAgain=5,
+            postRatingWorthIt=5
+        )
+
+        models.PostLike.objects.create(user=user, post=post, isActive=True)
+        models.PostLike.objects.create(user=user, post=post, isActive=True)
+        post.refresh_from_db()
+        self.assertEqual(post.postLikeCount, 1)
+
+        models.PostLike.objects.create(user=user, post=post, isActive=False)
+        state = models.PostLikeState.objects.get(user=user, post=post)
+        self.assertFalse(state.isLiked)
+        self.assertEqual(models.PostLike.objects.filter(post=post).count(), 3)
+
+        with self.assertRaises(IntegrityError):
+            models.PostLikeState.objects.create(user=user, post=post)
+
+    def test_comment_like_updates_counter_incrementally(self):
+        """Test comment likes apply a delta to the comment like counter"""
+        user = get_user_model().objects.create_user(
+            userEmailAddress="test@example.com",
+            password="testpass123",
+            userUsername="username1123"
+        )
+        post = models.Post.objects.create(
+            user=user,
+            postReview="Sample post review",
+            postRatingDelicious=5,
+            postRatingEatAgain=5,
+            postRatingWorthIt=5
+        )
+        comment = models.PostComment.objects.create(user=user, post=post)
+
+        models.CommentLike.objects.create(
+            user=user, comment=comment, isActive=True)
+        comment.refresh_from_db()
+        self.assertEqual(comment.commentLikeCount, 1)
+
+        models.CommentLike.objects.create(
+            user=user, comment=comment, isActive=False)
+        comment.refresh_from_db()
+        self.assertEqual(comment.commentLikeCount, 0)
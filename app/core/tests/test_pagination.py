@@ -0,0 +1,75 @@
+"""
+Tests for the cursor pagination helpers
+"""
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.pagination import CursorPaginationMixin, decode_cursor
+
+
+class SamplePagination(CursorPaginationMixin, PageNumberPagination):
+    page_size = 2
+
+
+class CursorPaginationTests(TestCase):
+    """Test keyset paging of querysets."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        followers = [3, None, 1, 3, None]
+        self.users = [
+            get_user_model().objects.create_user(
+                userEmailAddress=f"user{i}@example.com",
+                password="test123",
+                userUsername=f"user{i}",
+                userFollowers=count,
+            )
+            for i, count in enumerate(followers)
+        ]
+
+    def collect(self, queryset):
+        """Return the ids of every page read by following the cursors"""
+        url = "/users/?cursor="
+        ids = []
+        while url:
+            paginator = SamplePagination()
+            request = Request(self.factory.get(url))
+            ids += [user.id for user in paginator.paginate_queryset(
+                queryset, request)]
+            url = paginator.get_next_link()
+        return ids
+
+    def test_pages_follow_ordering_with_nulls(self):
+        """Test cursor pages match the queryset ordering, nulls included"""
+        users = get_user_model().objects.all()
+        for ordering in [("userFollowers", "pk"), ("-userFollowers", "-pk")]:
+            expected = list(users.order_by(*ordering).values_list("id", flat=True))
+            self.assertEqual(self.collect(users.order_by(ordering[0])), expected)
+
+    def test_page_number_mode_is_default(self):
+        """Test requests without a cursor keep the page number mode"""
+        paginator = SamplePagination()
+        request = Request(self.factory.get("/users/"))
+        page = paginator.paginate_queryset(
+            get_user_model().objects.order_by("id"), request)
+
+        self.assertEqual([user.id for user in page],
+                         [user.id for user in self.users[:2]])
+        self.assertEqual(paginator.get_paginated_response([]).data["count"], 5)
+
+    def test_next_cursor_holds_sort_key(self):
+        """Test the next cursor stores the last row's sort key and pk"""
+        paginator = SamplePagination()
+        request = Request(self.factory.get("/users/?cursor="))
+        page = paginator.paginate_queryset(
+            get_user_model().objects.order_by("-userFollowers"), request)
+        query = parse_qs(urlparse(paginator.get_next_link()).query)
+        cursor = query["cursor"][0]
+
+        self.assertEqual(decode_cursor(cursor),
+                         [page[-1].userFollowers, page[-1].id])
@@ -0,0 +1,66 @@
+"""
+Tests for the picture renditions
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Post
+from core.renditions import image_url, rendition_file, rendition_urls
+
+
+@override_settings(IMAGE_RENDITION_WIDTHS=[160, 320])
+class RenditionTests(TestCase):
+    """Test choosing picture renditions for a request."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+        self.post = Post.objects.create(
+            user=user, postReview="review", postRatingDelicious=4,
+            postRatingEatAgain=4, postRatingWorthIt=4)
+        self.post.postPhotoUrl.name = "uploads/posts/photo.jpeg"
+
+    def request(self, query="", **extra):
+        return Request(self.factory.get(f"/posts/{query}", **extra))
+
+    def test_full_size_without_width(self):
+        """Test the full-size picture is served when no width is asked"""
+        request = self.request()
+        url = image_url(self.post.postPhotoUrl, request)
+
+        self.assertEqual(
+            url, request.build_absolute_uri(self.post.postPhotoUrl.url))
+
+    def test_smallest_fitting_rendition(self):
+        """Test the smallest rendition at least as wide as asked is served"""
+        photo = self.post.postPhotoUrl
+        request = self.request("?image_width=200&image_format=jpeg")
+
+        self.assertEqual(
+            image_url(photo, request),
+            request.build_absolute_uri(rendition_file(photo, 320, "jpeg").url))
+        self.assertEqual(
+            image_url(photo, self.request("?image_width=1000")),
+            image_url(photo, self.request()))
+
+    def test_processing_picture_has_no_renditions(self):
+        """Test a picture still being processed is served at full size"""
+        self.post.postPhotoStatus = Post.PHOTO_PROCESSING
+        photo = self.post.postPhotoUrl
+
+        self.assertEqual(image_url(photo, self.request("?image_width=100")),
+                         image_url(photo, self.request()))
+        self.assertEqual(rendition_urls(photo, self.request()), {})
+
+    def test_rendition_map(self):
+        """Test the rendition map lists every width of the JPEG format"""
+        urls = rendition_urls(self.post.postPhotoUrl, self.request())
+
+        self.assertEqual(list(urls["jpeg"]), ["160", "320"])
+        self.assertNotEqual(urls["jpeg"]["160"], urls["jpeg"]["320"])
@@ -0,0 +1,151 @@
+"""
+Tests for the hourly engagement rollups
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import analytics
+from core.models import (
+    Business, BusinessEngagementHour, EngagementWatermark, MenuItem,
+    MenuItemEngagementHour, Post, PostComment, PostEngagementHour, PostLike,
+    PostSave, PostShare, PostView,
+)
+from core.rollups import roll_up
+
+START = datetime(2024, 1, 1)
+
+
+def at(hours):
+    return (START + timedelta(hours=hours)).replace(tzinfo=timezone.utc)
+
+
+class RollUpTests(TestCase):
+    """Test rolling engagement events into hourly rollups."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+        self.other = get_user_model().objects.create_user(
+            userEmailAddress="other@example.com",
+            password="test123",
+            userUsername="other",
+        )
+        self.business = Business.objects.create(businessName="Stall")
+        self.menu_item = MenuItem.objects.create(
+            name="Noodles", business=self.business, price=8.50)
+        self.post = Post.objects.create(
+            user=self.user,
+            menuItem=self.menu_item,
+            postReview="review",
+            postRatingDelicious=5,
+            postRatingEatAgain=4,
+            postRatingWorthIt=3,
+        )
+        self.posts = Post.objects.filter(menuItem__business=self.business)
+        self.rollups = BusinessEngagementHour.objects.filter(business=self.business)
+
+    def event(self, model, field, hours, **params):
+        event = model.objects.create(post=self.post, **params)
+        model.objects.filter(pk=event.pk).update(**{field: at(hours)})
+
+    def like(self, user, hours, isActive=True):
+        self.event(PostLike, "likeDateTime", hours, user=user, isActive=isActive)
+
+    def test_roll_up_counts_events_by_hour(self):
+        """Test each event is counted once in the hour it happened"""
+        self.like(self.user, 1.5)
+        self.like(self.other, 1.75)
+        self.like(self.other, 3.5, isActive=False)
+        self.event(PostShare, "sharedDateTime", 1.25,
+                   sharedBy=self.user, sharedTo=self.other)
+        self.event(PostComment, "commentPublishDateTime", 3.25, user=self.user)
+        self.event(PostView, "viewDateTime", 3.5, user=self.other)
+        PostSave.objects.create(user=self.other, post=self.post, postIsSaved=False,
+                                savedDateTime=at(1.5), unsavedDateTime=at(3.5))
+
+        self.assertEqual(roll_up(), 6)
+        self.assertEqual(roll_up(), 0)
+
+        first, second = PostEngagementHour.objects.filter(
+            post=self.post).order_by("hour")
+        self.assertEqual(first.hour, at(1))
+        self.assertEqual((first.likes, first.shares, first.saves), (2, 1, 1))
+        self.assertEqual(second.hour, at(3))
+        self.assertEqual(
+            (second.unlikes, second.comments, second.views, second.unsaves),
+            (1, 1, 1, 1))
+        menu_item_hours = MenuItemEngagementHour.objects.filter(
+            menuItem=self.menu_item).values_list("hour", "likes")
+        self.assertEqual(set(menu_item_hours), {(at(1), 2), (at(3), 0)})
+        self.assertEqual(self.rollups.count(), 2)
+
+    def test_roll_up_is_incremental(self):
+        """Test later events are added to the existing hours"""
+        self.like(self.user, 1.5)
+        roll_up(batch_size=1)
+        self.like(self.other, 1.75)
+
+        self.assertEqual(roll_up(batch_size=1), 1)
+
+        self.assertEqual(self.rollups.get().likes, 2)
+        self.assertEqual(EngagementWatermark.objects.get(source="like").lastId,
+                         PostLike.objects.latest("id").id)
+
+    def test_roll_up_waits_for_recent_events(self):
+        """Test events within the lag are left for the next run"""
+        self.like(self.user, 1.5)
+
+        self.assertEqual(roll_up(now=at(1.5)), 0)
+        self.assertEqual(roll_up(now=at(2)), 1)
+
+    def test_series_matches_raw_events(self):
+        """Test the series is unchanged by rolling the events up"""
+        self.like(self.user, -5)
+        self.like(self.user, 2.5)
+        self.like(self.other, 5.5)
+        self.like(self.other, 9.5, isActive=False)
+        PostSave.objects.create(user=self.other, post=self.post, postIsSaved=False,
+                                savedDateTime=at(0.5), unsavedDateTime=at(4.5))
+        self.event(PostShare, "sharedDateTime", 7.5,
+                   sharedBy=self.user, sharedTo=self.other)
+        end = START + timedelta(hours=12)
+        before = analytics.engagement_series(self.rollups, self.posts, START, end)
+
+        roll_up()
+        self.like(self.user, 11.5, isActive=False)
+        with CaptureQueriesContext(connection) as queries:
+            after = analytics.engagement_series(
+                self.rollups, self.posts, START, end)
+
+        self.assertEqual(len(queries), 6)
+        self.assertEqual([point["like"] for point in before], [1, 2, 3, 3, 2, 2])
+        self.assertEqual([point["like"] for point in after], [1, 2, 3, 3, 2, 1])
+        for metric in ("save", "share", "comment"):
+            self.assertEqual([point[metric] for point in after],
+                             [point[metric] for point in before])
+
+    def test_like_percentage_endpoint(self):
+        """Test the like trend compares the net likes at both times"""
+        self.like(self.user, 1.5)
+        self.like(self.other, 5.5)
+        roll_up()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse("business:analytic_total_post_like", args=[
+            self.business.id, "2024-01-01T03:00:00.000Z", "2024-01-02T00:00:00.000Z"])
+
+        res = client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"amount": 2, "trend": "up",
+                                    "trendPercentage": 100.0})
@@ -0,0 +1,211 @@
+"""
+Tests for the signed access and refresh tokens
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import tokens
+from core.authentication import CachedTokenAuthentication
+from core.models import RevokedToken
+
+TOKEN_URL = reverse("user:token")
+REFRESH_URL = reverse("user:token_refresh")
+LOGOUT_URL = reverse("user:logout")
+ME_URL = reverse("user:me")
+
+
+class SignedTokenTests(SimpleTestCase):
+    """Test signing and verifying tokens."""
+
+    def test_verify_issued_token(self):
+        """Test a token carries its user, session and expiry"""
+        now = time.time()
+        key = tokens.issue_token(tokens.ACCESS, 7, 42, now=now)
+
+        token = tokens.verify_token(key)
+
+        self.assertEqual(token.user_id, 7)
+        self.assertEqual(token.session_id, 42)
+        self.assertEqual(token.expires, int(now) + 3600)
+
+    def test_expired_token(self):
+        """Test a token is rejected once its lifetime has passed"""
+        key = tokens.issue_token(tokens.ACCESS, 7, 42, now=time.time() - 3601)
+
+        self.assertIsNone(tokens.verify_token(key))
+
+    def test_tampered_token(self):
+        """Test a token with a changed payload or signature is rejected"""
+        key = tokens.issue_token(tokens.ACCESS, 7, 42)
+        payload, signature = key.rsplit(":", 1)
+        with self.settings(SECRET_KEY="other"):
+            forged = tokens.issue_token(tokens.ACCESS, 8, 42)
+
+        self.assertIsNone(tokens.verify_token(payload + ":" + signature[::-1]))
+        self.assertIsNone(tokens.verify_token(forged))
+
+    def test_token_kinds_are_not_interchangeable(self):
+        """Test a refresh token is not accepted as an access token"""
+        access, refresh = tokens.issue_token_pair(7)
+
+        self.assertIsNone(tokens.verify_token(refresh, tokens.ACCESS))
+        self.assertIsNone(tokens.verify_token(access, tokens.REFRESH))
+        self.assertFalse(tokens.is_signed_token("a" * 40))
+        self.assertTrue(tokens.is_signed_token(access))
+
+
+@override_settings(AUTH_SIGNED_TOKENS=True, AUTH_REVOCATION_SYNC_INTERVAL=0)
+class SignedTokenApiTests(TestCase):
+    """Test logging in and authenticating with signed tokens."""
+
+    def setUp(self):
+        # Each test starts from an empty, unsynced process-wide list
+        tokens.reset_revocation_list(setting="AUTH_REVOCATION_SYNC_INTERVAL")
+        self.user = get_user_model().objects.create_user(
+            userEmailAddress="user@example.com",
+            password="test123",
+            userUsername="user",
+        )
+        self.client = APIClient()
+
+    def login(self):
+        res = self.client.post(TOKEN_URL, {
+            "userEmailAddress": "user@example.com",
+            "password": "test123",
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_login_issues_signed_tokens(self):
+        """Test login returns signed tokens that authenticate requests"""
+        data = self.login()
+
+        self.assertEqual(data["localId"], self.user.id)
+        self.assertEqual(data["expiresIn"], 3600)
+        self.assertEqual(tokens.verify_token(data["idToken"]).user_id, self.user.id)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {data['idToken']}")
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["userUsername"], "user")
+
+    def test_authentication_without_queries(self):
+        """Test a warm process authenticates a signed token with no query"""
+        key = self.login()["idToken"]
+        authentication = CachedTokenAuthentication()
+
+        with self.settings(AUTH_REVOCATION_SYNC_INTERVAL=3600,
+                           AUTH_TOKEN_CACHE_ENABLED=True):
+            authentication.authenticate_credentials(key)
+            with CaptureQueriesContext(connection) as queries:
+                user, token = authentication.authenticate_credentials(key)
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.user_id, self.user.pk)
+
+    def test_expired_token_rejected(self):
+        """Test an expired access token gets a 401"""
+        key = tokens.issue_token(tokens.ACCESS, self.user.id, 1,
+                                 now=time.time() - 3601)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates_tokens(self):
+        """Test a refresh token is exchanged once for a new pair"""
+        refresh = self.login()["refreshToken"]
+
+        res = self.client.post(REFRESH_URL, {"refreshToken": refresh})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["localId"], self.user.id)
+        self.assertIsNotNone(tokens.verify_token(res.data["idToken"]))
+
+        res = self.client.post(REFRESH_URL, {"refreshToken": refresh})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rejects_access_token(self):
+        """Test an access token cannot be used to refresh"""
+        access = self.login()["idToken"]
+
+        res = self.client.post(REFRESH_URL, {"refreshToken": access})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_session(self):
+        """Test logout revokes the access and the refresh token"""
+        data = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {data['idToken']}")
+
+        res = self.client.post(LOGOUT_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(REFRESH_URL, {"refreshToken": data["refreshToken"]})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_from_other_process(self):
+        """Test revocations stored by another process are read on sync"""
+        key = self.login()["idToken"]
+        token = tokens.verify_token(key)
+        RevokedToken.objects.create(tokenId=token.token_id,
+                                    expiresDateTime="2100-01-01T00:00:00Z")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_checks_stored_revocations(self):
+        """Test a refresh token used by another process is not accepted"""
+        refresh = self.login()["refreshToken"]
+        token = tokens.verify_token(refresh, tokens.REFRESH)
+
+        with self.settings(AUTH_REVOCATION_SYNC_INTERVAL=3600,
+                           AUTH_TOKEN_CACHE_ENABLED=True):
+            tokens.get_revocation_list().sync()
+            # Used by another process since this one last synced
+            RevokedToken.objects.create(tokenId=token.token_id,
+                                        expiresDateTime="2100-01-01T00:00:00Z")
+            res = self.client.post(REFRESH_URL, {"refreshToken": refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_signed_tokens_disabled(self):
+        """Test signed tokens are refused when the scheme is turned off"""
+        key = self.login()["idToken"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+
+        with self.settings(AUTH_SIGNED_TOKENS=False):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RevocationListTests(TestCase):
+    """Test reading revocations stored by other processes."""
+
+    def test_late_commit_is_read(self):
+        """Test a row with a lower id committed after a sync is still read"""
+        revocations = tokens.RevocationList()
+        first = RevokedToken.objects.create(
+            tokenId=1, expiresDateTime="2100-01-01T00:00:00Z")
+        RevokedToken.objects.create(tokenId=2, expiresDateTime="2100-01-01T00:00:00Z")
+        first.delete()
+        revocations.sync(now=time.time())
+
+        # Its transaction started first but committed after the sync
+        RevokedToken.objects.create(id=first.id, tokenId=1,
+                                    expiresDateTime="2100-01-01T00:00:00Z")
+        revocations.sync(now=time.time() + 3600)
+
+        self.assertEqual(set(revocations.expires), {1, 2})
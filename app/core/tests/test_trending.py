@@ -0,0 +1,106 @@
+"""
+Tests for the trending positions of menu items and businesses
+"""
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from core.models import (
+    Business, BusinessEngagementHour, MenuItem, MenuItemEngagementHour,
+)
+from core.trending import refresh_trending
+
+NOW = datetime(2024, 1, 8, tzinfo=timezone.utc)
+
+
+class TrendingTests(TestCase):
+    """Test ranking menu items and businesses by recent engagement."""
+
+    def setUp(self):
+        self.business = Business.objects.create(businessName="Stall")
+        self.other_business = Business.objects.create(businessName="Cafe")
+        self.noodles = MenuItem.objects.create(
+            name="Noodles", business=self.business, price=8.50)
+        self.rice = MenuItem.objects.create(
+            name="Rice", business=self.business, price=6.50)
+        self.coffee = MenuItem.objects.create(
+            name="Coffee", business=self.other_business, price=3.50)
+
+    def engage(self, menu_item, hours_ago, **counts):
+        hour = NOW - timedelta(hours=hours_ago)
+        MenuItemEngagementHour.objects.create(
+            menuItem=menu_item, hour=hour, **counts)
+        rollup, _ = BusinessEngagementHour.objects.get_or_create(
+            business=menu_item.business, hour=hour)
+        BusinessEngagementHour.objects.filter(pk=rollup.pk).update(
+            **{column: F(column) + n for column, n in counts.items()})
+
+    def positions(self):
+        return {
+            menu_item.name: (menu_item.trendingPosition,
+                             menu_item.trendingDirection)
+            for menu_item in MenuItem.objects.all()
+        }
+
+    def test_recent_engagement_ranks_higher(self):
+        """Test older engagement is decayed and expired engagement ignored"""
+        self.engage(self.noodles, 2, likes=4)
+        self.engage(self.rice, 48, likes=10)
+        self.engage(self.coffee, 24 * 8, shares=100)
+
+        refresh_trending(now=NOW)
+
+        self.assertEqual(self.positions(), {
+            "Noodles": (1, "up"),
+            "Rice": (2, "up"),
+            "Coffee": (None, None),
+        })
+        self.business.refresh_from_db()
+        self.other_business.refresh_from_db()
+        self.assertEqual(self.business.businessTrendRanking, 1)
+        self.assertIsNone(self.other_business.businessTrendRanking)
+
+    def test_direction_compares_previous_run(self):
+        """Test items moving, staying and dropping out of the ranking"""
+        self.engage(self.noodles, 1, likes=5)
+        self.engage(self.rice, 1, likes=3)
+        self.engage(self.coffee, 1, likes=1)
+        refresh_trending(now=NOW)
+        self.engage(self.rice, 0, saves=2)
+        self.engage(self.coffee, 0, unlikes=1)
+
+        self.assertEqual(refresh_trending(now=NOW), 4)
+
+        self.assertEqual(self.positions(), {
+            "Rice": (1, "up"),
+            "Noodles": (2, "down"),
+            "Coffee": (None, None),
+        })
+        self.assertEqual(refresh_trending(now=NOW), 2)
+        self.assertEqual(self.positions()["Rice"], (1, "constant"))
+
+    @override_settings(TRENDING_LIMIT=1)
+    def test_limit(self):
+        """Test only the best items are given a position"""
+        self.engage(self.noodles, 1, likes=5)
+        self.engage(self.rice, 1, likes=3)
+
+        refresh_trending(now=NOW)
+
+        self.assertEqual(self.positions()["Rice"], (None, None))
+
+    def test_update_trending_command(self):
+        """Test the command refreshes the positions once"""
+        MenuItemEngagementHour.objects.create(
+            menuItem=self.noodles, likes=1,
+            hour=datetime.now(timezone.utc) - timedelta(hours=1))
+
+        out = StringIO()
+        call_command("update_trending", "--once", stdout=out)
+
+        self.noodles.refresh_from_db()
+        self.assertEqual(self.noodles.trendingPosition, 1)
+        self.assertIn("Updated 1 trending positions", out.getvalue())
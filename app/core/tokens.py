@@ -0,0 +1,179 @@
+"""
+Stateless access and refresh tokens signed with the SECRET_KEY.
+"""
+import secrets
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+# Token id and session id are random positive 63-bit integers so they fit a
+# BigIntegerField and stay small in the revocation set
+SignedToken = namedtuple(
+    "SignedToken", ["kind", "user_id", "session_id", "token_id", "expires"])
+
+
+def _salt(kind):
+    # Signing each kind with its own salt keeps refresh tokens from being
+    # accepted as access tokens and the other way round
+    return f"core.tokens.{kind}"
+
+
+def _new_id():
+    return secrets.randbits(63)
+
+
+def token_lifetime(kind):
+    if kind == REFRESH:
+        return settings.AUTH_REFRESH_TOKEN_LIFETIME
+    return settings.EXPIRATION_TIME
+
+
+def issue_token(kind, user_id, session_id, now=None):
+    """Return a signed token of kind for the user, expiring after its lifetime"""
+    now = time.time() if now is None else now
+    payload = {
+        "u": user_id,
+        "s": session_id,
+        "j": _new_id(),
+        "e": int(now) + token_lifetime(kind),
+    }
+    return signing.dumps(payload, salt=_salt(kind))
+
+
+def issue_token_pair(user_id, session_id=None):
+    """Return (access, refresh) tokens of a new or an existing session"""
+    session_id = _new_id() if session_id is None else session_id
+    return (issue_token(ACCESS, user_id, session_id),
+            issue_token(REFRESH, user_id, session_id))
+
+
+def is_signed_token(key):
+    """Return True if key has the shape of a signed token, not a DRF token key"""
+    return ":" in key
+
+
+def verify_token(key, kind=ACCESS, now=None):
+    """Return the SignedToken in key, or None if it is invalid or expired.
+
+    Checks the signature and the expiry only; no database access.
+    """
+    try:
+        payload = signing.loads(key, salt=_salt(kind))
+        token = SignedToken(kind, int(payload["u"]), int(payload["s"]),
+                            int(payload["j"]), int(payload["e"]))
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    if token.expires <= now:
+        return None
+    return token
+
+
+class RevocationList:
+    """In-memory set of revoked token and session ids.
+
+    Revocations are stored as RevokedToken rows and read at most every
+    AUTH_REVOCATION_SYNC_INTERVAL seconds, so checking a token costs no
+    query in between. Each sync re-reads the rows created since
+    AUTH_REVOCATION_SYNC_MARGIN seconds before the previous one, as ids and
+    creation times are not committed in order. Ids are forgotten once they
+    expire.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.expires = {}
+        self.since = None
+        self.synced = None
+
+    def sync(self, now=None):
+        from core.models import RevokedToken
+
+        now = time.time() if now is None else now
+        with self.lock:
+            if (self.synced is not None
+                    and now - self.synced < settings.AUTH_REVOCATION_SYNC_INTERVAL):
+                return
+            self.synced = now
+            rows = RevokedToken.objects.values_list("tokenId", "expiresDateTime")
+            if self.since is not None:
+                rows = rows.filter(createdDateTime__gte=self.since)
+            self.since = timezone.now() - timedelta(
+                seconds=settings.AUTH_REVOCATION_SYNC_MARGIN)
+            for token_id, expires in rows:
+                self.expires[token_id] = expires.timestamp()
+            self.expires = {token_id: expires
+                            for token_id, expires in self.expires.items()
+                            if expires > now}
+
+    def is_revoked(self, token):
+        self.sync()
+        return token.token_id in self.expires or token.session_id in self.expires
+
+    def revoke(self, token_id, expires):
+        """Revoke a token or session id until the epoch time expires"""
+        from core.models import RevokedToken
+
+        RevokedToken.objects.filter(expiresDateTime__lte=timezone.now()).delete()
+        RevokedToken.objects.bulk_create([RevokedToken(
+            tokenId=token_id,
+            expiresDateTime=datetime.fromtimestamp(expires, tz=dt_timezone.utc),
+        )], ignore_conflicts=True)
+        with self.lock:
+            self.expires[token_id] = expires
+
+    def claim(self, token):
+        """Revoke a refresh token as it is used, returning False if it or its
+        session was revoked already.
+
+        Checked against the table rather than the in-memory set, so a
+        refresh token is accepted once across processes, even between syncs.
+        """
+        from core.models import RevokedToken
+
+        if RevokedToken.objects.filter(tokenId=token.session_id).exists():
+            return False
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(
+                    tokenId=token.token_id,
+                    expiresDateTime=datetime.fromtimestamp(
+                        token.expires, tz=dt_timezone.utc))
+        except IntegrityError:
+            return False
+        with self.lock:
+            self.expires[token.token_id] = token.expires
+        return True
+
+    def revoke_session(self, token):
+        """Revoke every token sharing the session of token, on logout"""
+        self.revoke(token.session_id,
+                    int(time.time()) + settings.AUTH_REFRESH_TOKEN_LIFETIME)
+
+
+_revocations = None
+
+
+def get_revocation_list():
+    global _revocations
+    if _revocations is None:
+        _revocations = RevocationList()
+    return _revocations
+
+
+@receiver(setting_changed)
+def reset_revocation_list(*, setting, **kwargs):
+    global _revocations
+    if setting.startswith("AUTH_REVOCATION"):
+        _revocations = None
@@ -0,0 +1,108 @@
+"""
+Trending positions of menu items and businesses.
+
+Each item is scored by the engagement of its hourly rollups within
+TRENDING_WINDOW, every column weighted by TRENDING_WEIGHTS and every hour
+decayed by half each TRENDING_HALF_LIFE. All items are scored with one
+grouped query; the TRENDING_LIMIT best are given positions 1, 2, ... and
+only the rows whose position or direction changed are written.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    DateTimeField, ExpressionWrapper, F, FloatField, Q, Sum, Value,
+)
+from django.db.models.functions import Extract, Power
+from django.utils import timezone
+
+from core.models import (
+    Business, BusinessEngagementHour, MenuItem, MenuItemEngagementHour,
+)
+
+UP = "up"
+DOWN = "down"
+CONSTANT = "constant"
+
+
+def decayed_score(now):
+    """Return the expression of the decayed, weighted engagement of a row"""
+    engagement = sum(
+        F(column) * Value(float(weight))
+        for column, weight in settings.TRENDING_WEIGHTS.items()
+    )
+    age = Extract(Value(now, output_field=DateTimeField()) - F("hour"), "epoch")
+    decay = Power(Value(0.5), age / settings.TRENDING_HALF_LIFE)
+    return ExpressionWrapper(engagement * decay, output_field=FloatField())
+
+
+def scores(rollups, target, now):
+    """Return {target id: score} of the items engaged with in the window"""
+    window = timedelta(seconds=settings.TRENDING_WINDOW)
+    return dict(
+        rollups.filter(hour__gt=now - window, hour__lte=now)
+        .values(target)
+        .annotate(score=Sum(decayed_score(now)))
+        .filter(score__gt=0)
+        .values_list(target, "score")
+    )
+
+
+def rank(scores):
+    """Return {id: position} of the best scores, ties broken by id"""
+    best = sorted(scores, key=lambda pk: (-scores[pk], pk))
+    return {pk: position for position, pk in enumerate(
+        best[:settings.TRENDING_LIMIT], 1)}
+
+
+def direction(previous, position):
+    """Return how an item moved since its previous position"""
+    if position is None:
+        return None
+    if previous is None or position < previous:
+        return UP
+    if position > previous:
+        return DOWN
+    return CONSTANT
+
+
+def update_positions(model, fields, positions, batch_size):
+    """Write the new positions, and directions if the model keeps them.
+
+    fields is (position field, direction field or None). Returns the
+    number of rows changed.
+    """
+    position_field, direction_field = fields
+    columns = [position_field] + ([direction_field] if direction_field else [])
+    current = {
+        row[0]: row[1:] for row in model.objects.filter(
+            Q(pk__in=list(positions))
+            | Q(**{f"{position_field}__isnull": False})
+        ).values_list("pk", *columns)
+    }
+
+    changed = []
+    for pk, values in current.items():
+        position = positions.get(pk)
+        new = (position,)
+        if direction_field:
+            new += (direction(values[0], position),)
+        if new != values:
+            changed.append(model(pk=pk, **dict(zip(columns, new))))
+    model.objects.bulk_update(changed, columns, batch_size=batch_size)
+    return len(changed)
+
+
+def refresh_trending(now=None, batch_size=1000):
+    """Recompute the trending positions, returning the rows changed"""
+    now = now or timezone.now()
+    menu_items = rank(scores(MenuItemEngagementHour.objects, "menuItem_id", now))
+    businesses = rank(scores(BusinessEngagementHour.objects, "business_id", now))
+    with transaction.atomic():
+        return (
+            update_positions(MenuItem, ("trendingPosition", "trendingDirection"),
+                             menu_items, batch_size)
+            + update_positions(Business, ("businessTrendRanking", None),
+                               businesses, batch_size)
+        )
@@ -1,4 +1,4 @@
-from rest_framework import viewsets, status, permissions, authentication, generics, filters
+from rest_framework import viewsets, status, permissions, generics, filters
 from rest_framework.response import Response
 from core.models import Dish
 from dish.serializers import DishSerializer, DishDetailSerializer
@@ -6,12 +6,14 @@ from django.http import Http404
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
+from core.pagination import CursorPaginationMixin
+from core.authentication import CachedTokenAuthentication
 
 class DishViewset(viewsets.ModelViewSet):
     """Views for manage dish APIs"""
     serializer_class = DishDetailSerializer
     permissions_classes = [permissions.IsAuthenticated]
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     queryset = Dish.objects.all()
 
     def get_queryset(self):
@@ -30,7 +32,7 @@ class DishViewset(viewsets.ModelViewSet):
         user = self.request.user
         serializer.save(user=user)
 
-class CustomDishPagination(PageNumberPagination):
+class CustomDishPagination(CursorPaginationMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
@@ -38,7 +40,7 @@ class CustomDishPagination(PageNumberPagination):
 class DishListView(generics.ListAPIView):
     """Return a list of dish filtered by dishName and seach query"""
     permissions_classes = [permissions.IsAuthenticated]
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     serializer_class = DishSerializer
 
     queryset = Dish.objects.all().order_by("dishName")
@@ -50,7 +52,7 @@ class DishListView(generics.ListAPIView):
 class RetrieveDishView(generics.RetrieveAPIView):
     """Retrieve a dish"""
     serializer_class = DishSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
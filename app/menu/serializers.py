@@ -1,15 +1,33 @@
 from rest_framework import serializers
 
-from core.models import MenuItem
+from core.models import MenuItem, MenuItemStats, Post
+from core.renditions import image_url
 
-from django.core.exceptions import ValidationError
-from decimal import Decimal, InvalidOperation
 
-from core.models import MenuItem, Post
+def load_photo_posts(menu_items):
+    """Return {post id: post} of the photos embedded in a page of menu items"""
+    post_ids = set()
+    for menu_item in menu_items:
+        post_ids.update(get_stats(menu_item).photoPostIds)
+    return Post.objects.only("id", "postPhotoUrl", "postPhotoStatus").in_bulk(post_ids)
 
-from django.db.models import Avg
 
-from django.conf import settings
+def get_stats(menu_item):
+    """Return the rollup of the menu item, empty if not computed yet"""
+    try:
+        return menu_item.stats
+    except MenuItemStats.DoesNotExist:
+        return MenuItemStats(menuItem=menu_item)
+
+
+class MenuItemListSerializer(serializers.ListSerializer):
+    """Serialize a page of menu items, loading their photos in bulk"""
+
+    def to_representation(self, data):
+        menu_items = list(data.all() if hasattr(data, "all") else data)
+        self.context["menu_item_photos"] = load_photo_posts(menu_items)
+        return super().to_representation(menu_items)
+
 
 class MenuItemSerializer(serializers.ModelSerializer):
     """Serializer for menu item """
@@ -34,36 +52,29 @@ class MenuItemSerializer(serializers.ModelSerializer):
                   "menuItemTotalPostCount",
                   "business"
                   ]
+        list_serializer_class = MenuItemListSerializer
 
     def get_post_photo_url(self, obj):
-       post = obj.posts.order_by("-postLikeCount").first()
+       post = get_stats(obj).topPost
        if post and post.postPhotoUrl:
            request = self.context.get("request")
-           photo_url = post.postPhotoUrl.url
-           return request.build_absolute_uri(photo_url)
+           return image_url(post.postPhotoUrl, request)
        return None
 
     def get_delicious_rating(self, obj):
-        avg_rating = obj.posts.aggregate(Avg('postRatingDelicious'))
-        return avg_rating["postRatingDelicious__avg"]
+        return get_stats(obj).deliciousRating
 
     def get_eat_again_rating(self, obj):
-        avg_rating = obj.posts.aggregate(Avg('postRatingDelicious'))
-        return avg_rating["postRatingDelicious__avg"]
+        return get_stats(obj).eatAgainRating
 
     def get_worth_it_rating(self, obj):
-        avg_rating = obj.posts.aggregate(Avg('postRatingDelicious'))
-        return avg_rating["postRatingDelicious__avg"]
+        return get_stats(obj).worthItRating
 
     def get_menuItemTotalPostCount(self, obj):
-        total_post_count = obj.posts.count()
-        return total_post_count
+        return get_stats(obj).postCount
 
     def get_businessId(self, obj):
-        if obj.business:
-            return obj.business.id
-        else:
-            return None
+        return obj.business_id
 
 
 
@@ -82,8 +93,23 @@ class MenuItemDetailSerializer(MenuItemSerializer):
                   "post_photos_url"]
 
     def get_post_photos_url(self, obj):
+        """Return the most liked photos, the rest are paged by MenuItemPhotosView"""
         request = self.context.get("request")
-        posts = obj.posts.order_by("-postLikeCount")
-        return {post.id: request.build_absolute_uri(post.postPhotoUrl.url) for post in posts if post.postPhotoUrl}
+        photos = self.context.get("menu_item_photos")
+        post_ids = get_stats(obj).photoPostIds
+        if photos is None or not photos.keys() >= set(post_ids):
+            photos = load_photo_posts([obj])
+        return {post_id: image_url(photos[post_id].postPhotoUrl, request)
+                for post_id in post_ids if post_id in photos}
 
 
+class MenuItemPhotoSerializer(serializers.ModelSerializer):
+    """Serializer for a photo of a menu item"""
+    post_photo_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = ["id", "post_photo_url"]
+
+    def get_post_photo_url(self, obj):
+        return image_url(obj.postPhotoUrl, self.context.get("request"))
@@ -9,7 +9,11 @@ from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
-from core.models import MenuItem
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.models import MenuItem, MenuItemStats, Post, PostLike
 from menu.serializers import MenuItemSerializer, MenuItemDetailSerializer
 
 MY_MENU_URL = reverse("menu:my-menu-list")
@@ -303,7 +307,100 @@ class PrivateMenuAPITests(TestCase):
         self.assertEqual(len(res.data['results']), 2)
 
 
+class MenuItemStatsTests(TestCase):
+    """Test the menu item stats rollup read by the serializers."""
 
-
-
-
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(userEmailAddress="user@example.com", password="test123", userUsername="username03")
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menu = create_menu(user=self.user)
+
+    def create_post(self, menu, **params):
+        defaults = {
+            "postReview": "review",
+            "postRatingDelicious": 5,
+            "postRatingEatAgain": 4,
+            "postRatingWorthIt": 3,
+        }
+        defaults.update(params)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(user=self.user, menuItem=menu, **defaults)
+
+    def test_ratings_per_dimension(self):
+        """Test each rating averages its own dimension"""
+        self.create_post(self.menu, postRatingDelicious=5, postRatingEatAgain=4, postRatingWorthIt=1)
+        self.create_post(self.menu, postRatingDelicious=3, postRatingEatAgain=2, postRatingWorthIt=2)
+
+        res = self.client.get(specific_menu_url(self.menu.id))
+
+        self.assertEqual(res.data["delicious_rating"], 4)
+        self.assertEqual(res.data["eat_again_rating"], 3)
+        self.assertEqual(res.data["worth_it_rating"], 1.5)
+        self.assertEqual(res.data["menuItemTotalPostCount"], 2)
+
+    def test_top_post_follows_likes(self):
+        """Test the top photo is the most liked post"""
+        self.create_post(self.menu, postPhotoUrl="uploads/posts/first.jpeg")
+        liked = self.create_post(self.menu, postPhotoUrl="uploads/posts/liked.jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            PostLike.objects.create(user=self.user, post=liked)
+
+        res = self.client.get(specific_menu_url(self.menu.id))
+
+        self.assertTrue(res.data["post_photo_url"].endswith("liked.jpeg"))
+        self.assertEqual(list(res.data["post_photos_url"])[0], liked.id)
+
+    @override_settings(MENU_ITEM_PHOTOS_LIMIT=2)
+    def test_photos_capped_and_paginated(self):
+        """Test the embedded photos are capped and the rest are paged"""
+        posts = [self.create_post(self.menu, postPhotoUrl=f"uploads/posts/{i}.jpeg")
+                 for i in range(3)]
+        self.create_post(self.menu)
+
+        res = self.client.get(specific_menu_url(self.menu.id))
+        self.assertEqual(list(res.data["post_photos_url"]), [posts[2].id, posts[1].id])
+
+        url = reverse("menu:menu-photos", args=[self.menu.id])
+        res = self.client.get(url, {"page_size": 2, "cursor": ""})
+        self.assertEqual([photo["id"] for photo in res.data["results"]],
+                         [posts[2].id, posts[1].id])
+        res = self.client.get(res.data["next"])
+        self.assertEqual([photo["id"] for photo in res.data["results"]],
+                         [posts[0].id])
+
+    @override_settings(MENU_ITEM_PHOTOS_LIMIT=2)
+    def test_photos_follow_likes_and_unlikes(self):
+        """Test a liked photo joins the embedded photos and leaves on unlike"""
+        posts = [self.create_post(self.menu, postPhotoUrl=f"uploads/posts/{i}.jpeg")
+                 for i in range(3)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PostLike.objects.create(user=self.user, post=posts[0])
+        stats = MenuItemStats.objects.get()
+        self.assertEqual(stats.topPost, posts[0])
+        self.assertEqual(stats.photoPostIds, [posts[0].id, posts[2].id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PostLike.objects.create(user=self.user, post=posts[0], isActive=False)
+        stats = MenuItemStats.objects.get()
+        self.assertEqual(stats.topPost, posts[2])
+        self.assertEqual(stats.photoPostIds, [posts[2].id, posts[1].id])
+
+    def test_list_queries_do_not_grow(self):
+        """Test the menu item list reads the rollups without per-row queries"""
+        self.create_post(self.menu, postPhotoUrl="uploads/posts/0.jpeg")
+        with CaptureQueriesContext(connection) as one_item:
+            self.client.get(reverse("menu:retrieve-filter-menu"))
+
+        for i in range(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                menu = create_menu(user=self.user, name=f"menu {i}")
+            self.create_post(menu, postPhotoUrl=f"uploads/posts/{i + 1}.jpeg")
+        with CaptureQueriesContext(connection) as six_items:
+            res = self.client.get(reverse("menu:retrieve-filter-menu"))
+
+        self.assertEqual(len(res.data["results"]), 6)
+        self.assertEqual(len(six_items), len(one_item))
+        self.assertEqual(MenuItemStats.objects.count(), 6)
@@ -17,6 +17,7 @@ urlpatterns = [
     path("", include(router.urls)),
     path("menu-item/venture-day/", views.MenuItemListView.as_view(), name = 'retrieve-filter-menu'),
     path("menu-item/<int:id>/", views.RetrieveMenuItemView.as_view(), name='retrieve-menu'),
+    path("menu-item/<int:id>/photos/", views.MenuItemPhotosView.as_view(), name='menu-photos'),
     path("menu-item/explore/nearby/", views.MenuItemListView.as_view(), name = "menu-list"),
     path("menu-item/explore/trending/", views.MenuItemListView.as_view(), name = "menu-list"),
     path("menu-item/venture-day/trending/", views.MenuItemListView.as_view(), name="menu-list"),
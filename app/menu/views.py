@@ -1,22 +1,23 @@
-from rest_framework import viewsets, status, permissions, authentication, generics, filters
+from rest_framework import viewsets, status, permissions, generics, filters
 from rest_framework.response import Response
-from core.models import MenuItem
-from menu.serializers import MenuItemSerializer, MenuItemDetailSerializer
+from core.models import MenuItem, Post
+from menu.serializers import MenuItemSerializer, MenuItemDetailSerializer, MenuItemPhotoSerializer
 from django.http import Http404
 
-from rest_framework.authentication import TokenAuthentication
+from core.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
+from core.pagination import CursorPaginationMixin
 
 class MenuItemViewset(viewsets.ModelViewSet):
     """Views for manage menu item APIs"""
     serializer_class = MenuItemDetailSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
-    queryset = MenuItem.objects.all()
+    queryset = MenuItem.objects.select_related("stats__topPost")
 
     def get_queryset(self):
         """Retrieve menu items for authenticated users"""
@@ -34,7 +35,7 @@ class MenuItemViewset(viewsets.ModelViewSet):
         user = self.request.user
         serializer.save(user=user)
 
-class CustomMenuItemPagination(PageNumberPagination):
+class CustomMenuItemPagination(CursorPaginationMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
@@ -42,10 +43,10 @@ class CustomMenuItemPagination(PageNumberPagination):
 class MenuItemListView(generics.ListAPIView):
     """Return a list of menu filtered by menu item Name and seach query"""
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     serializer_class = MenuItemDetailSerializer
 
-    queryset = MenuItem.objects.all().order_by("name")
+    queryset = MenuItem.objects.select_related("stats__topPost").order_by("name")
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ["category", "business"]
     search_fields = ["name"]
@@ -54,32 +55,52 @@ class MenuItemListView(generics.ListAPIView):
 class RetrieveMenuItemView(generics.RetrieveAPIView):
     """Retrieve a menu item"""
     serializer_class = MenuItemDetailSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return a menu item"""
         try:
-            menuItem = MenuItem.objects.get(id=self.kwargs["id"])
+            menuItem = MenuItem.objects.select_related(
+                "stats__topPost").get(id=self.kwargs["id"])
         except MenuItem.DoesNotExist:
             raise Http404("Menu item not found")
         return menuItem
 
 class AllMenuItemListView(generics.ListAPIView):
     """Return a list of all existing menu items"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = MenuItemDetailSerializer
 
     def get_queryset(self):
         """Retrieve all the menu items"""
-        return MenuItem.objects.all().order_by("name")
+        return MenuItem.objects.select_related("stats__topPost").order_by("name")
+
+
+class MenuItemPhotosView(generics.ListAPIView):
+    """Return the photos posted for a menu item, most liked first"""
+    serializer_class = MenuItemPhotoSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomMenuItemPagination
+
+    def get_queryset(self):
+        """Retrieve the posts with a photo of the menu item"""
+        if not MenuItem.objects.filter(id=self.kwargs["id"]).exists():
+            raise Http404("Menu item not found")
+        return (
+            Post.objects.filter(menuItem_id=self.kwargs["id"])
+            .exclude(postPhotoUrl="")
+            .exclude(postPhotoUrl__isnull=True)
+            .order_by("-postLikeCount", "-id")
+        )
 
 
 # class CategoryMenuItemListView(generics.ListAPIView):
 #     """Return a list of all existing menu items based on category"""
 #     permission_classes = [permissions.IsAuthenticated]
-#     authentication_classes = [authentication.TokenAuthentication]
+#     authentication_classes = [CachedTokenAuthentication]
 #     serializer_class = MenuItemSerializer
 
 #     queryset = MenuItem.objects.all().order_by("name")
@@ -3,10 +3,66 @@ Serializers for posts APIs
 """
 from rest_framework import serializers
 
-from core.models import Post, User, PostLike, PostSave, PostView, PostComment, Business, PostShare, MenuItem, CommentLike
-
-
-class PostSerializer(serializers.ModelSerializer):
+from django.conf import settings
+from django.db.models import Count, prefetch_related_objects
+
+from core.renditions import RenditionSerializerMixin, RenditionsField, image_url
+from core.models import Post, User, PostLike, PostSave, PostView, PostComment, Business, PostShare, MenuItem, CommentLike, PostLikeState, CommentLikeState
+
+
+def hydrate_posts(posts, user=None):
+    """Load the related rows, counts and viewer state for a page of posts.
+
+    Every lookup is a single bulk query over the ids of the page, so the
+    cost of serializing a page does not grow with the page size.
+    """
+    posts = list(posts)
+    post_ids = [post.id for post in posts]
+    prefetch_related_objects(posts, "user", "menuItem__business")
+
+    def count_by_post(queryset):
+        return dict(
+            queryset.filter(post_id__in=post_ids)
+            .values("post_id")
+            .annotate(total=Count("id"))
+            .values_list("post_id", "total")
+        )
+
+    hydration = {
+        "post_ids": set(post_ids),
+        "comment_counts": count_by_post(PostComment.objects.all()),
+        "save_counts": count_by_post(PostSave.objects.all()),
+        "share_counts": count_by_post(PostShare.objects.all()),
+        "liked": set(),
+        "saved": {},
+    }
+
+    if user is not None and user.is_authenticated:
+        hydration["liked"] = set(
+            PostLikeState.objects.filter(
+                user=user, post_id__in=post_ids, isLiked=True)
+            .values_list("post_id", flat=True)
+        )
+        hydration["saved"] = dict(
+            PostSave.objects.filter(user=user, post_id__in=post_ids)
+            .values_list("post_id", "postIsSaved")
+        )
+
+    return hydration
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """Serialize a page of posts after hydrating it in bulk"""
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, "all") else data)
+        request = self.context.get("request")
+        self.context["post_hydration"] = hydrate_posts(
+            posts, getattr(request, "user", None))
+        return super().to_representation(posts)
+
+
+class PostSerializer(RenditionSerializerMixin, serializers.ModelSerializer):
     """Serializer for Post"""
     postPublishDateTime = serializers.SerializerMethodField()
     userId = serializers.ReadOnlyField(source="user.id")
@@ -27,6 +83,7 @@ class PostSerializer(serializers.ModelSerializer):
     postShareCount = serializers.SerializerMethodField()
     isSaved = serializers.SerializerMethodField()
     menuItemId = serializers.SerializerMethodField()
+    postPhotoRenditions = RenditionsField(source="postPhotoUrl")
 
     class Meta:
         model = Post
@@ -39,6 +96,8 @@ class PostSerializer(serializers.ModelSerializer):
             "postRatingEatAgain",
             "postRatingWorthIt",
             "postPhotoUrl",
+            "postPhotoStatus",
+            "postPhotoRenditions",
             "postPublishIpAddress",
             "postView",
             "postLikeCount",
@@ -63,9 +122,20 @@ class PostSerializer(serializers.ModelSerializer):
             "postShareCount",
             "isSaved",
             "menuItem",
-
+            "menuItemId",
         ]
-        read_only_fields = ["id", "userId", "postPublishDateTime", "isLiked"]
+        read_only_fields = ["id", "userId", "postPublishDateTime", "isLiked",
+                            "postPhotoStatus"]
+        list_serializer_class = PostListSerializer
+
+    def get_hydration(self, obj):
+        """Return the bulk-loaded state covering obj, loading it if needed"""
+        hydration = self.context.get("post_hydration")
+        if hydration is None or obj.id not in hydration["post_ids"]:
+            request = self.context.get("request")
+            hydration = hydrate_posts([obj], getattr(request, "user", None))
+            self.context["post_hydration"] = hydration
+        return hydration
 
     def get_postPublishDateTime(self, obj):
         return obj.postPublishDateTime.isoformat()
@@ -74,27 +144,16 @@ class PostSerializer(serializers.ModelSerializer):
         return obj.postPublishIpAddress
 
     def get_isLiked(self, obj):
-        request = self.context.get("request", None)
-        if request:
-            user = request.user
-            postLike = PostLike.objects.filter(
-                post=obj, user=user).order_by("-likeDateTime").first()
-            if postLike:
-                return postLike.isActive
-        return False
+        return obj.id in self.get_hydration(obj)["liked"]
 
     def get_postLikeCount(self, obj):
-        like_count = PostLike.objects.filter(post=obj, isActive=True).count()
-        unlike_count = PostLike.objects.filter(
-            post=obj, isActive=False).count()
-        return like_count - unlike_count
+        return obj.postLikeCount
 
     def get_userProfilePictureUrl(self, obj):
         user = obj.user
         if user and user.userProfilePictureUrl:
             request = self.context.get("request")
-            photo_url = user.userProfilePictureUrl.url
-            return request.build_absolute_uri(photo_url)
+            return image_url(user.userProfilePictureUrl, request)
         return None
 
     def get_businessOperatingLocation(self, obj):
@@ -141,23 +200,16 @@ class PostSerializer(serializers.ModelSerializer):
             return None
 
     def get_postCommentCount(self, obj):
-        return PostComment.objects.filter(post=obj).count()
+        return self.get_hydration(obj)["comment_counts"].get(obj.id, 0)
 
     def get_postSaveCount(self, obj):
-        return PostSave.objects.filter(post=obj).count()
+        return self.get_hydration(obj)["save_counts"].get(obj.id, 0)
 
     def get_postShareCount(self, obj):
-        return PostShare.objects.filter(post=obj).count()
+        return self.get_hydration(obj)["share_counts"].get(obj.id, 0)
 
     def get_isSaved(self, obj):
-        request = self.context.get("request", None)
-        if request:
-            user = request.user
-            postSave = PostSave.objects.filter(
-                post=obj, user=user).order_by("-savedDateTime").first()
-            if postSave:
-                return postSave.postIsSaved
-        return False
+        return self.get_hydration(obj)["saved"].get(obj.id, False)
 
     def get_menuItemId(self, obj):
         try:
@@ -309,18 +361,14 @@ class PostCommentSerializer(serializers.ModelSerializer):
         user = obj.user
         if user and user.userProfilePictureUrl:
             request = self.context.get("request")
-            photo_url = user.userProfilePictureUrl.url
-            return request.build_absolute_uri(photo_url)
+            return image_url(user.userProfilePictureUrl, request)
         return None
 
     def get_isLiked(self, obj):
         request = self.context.get("request", None)
         if request:
-            user = request.user
-            commentLike = CommentLike.objects.filter(
-                comment=obj, user=user).order_by("-likeDateTime").first()
-            if commentLike:
-                return commentLike.isActive
+            return CommentLikeState.objects.filter(
+                comment=obj, user=request.user, isLiked=True).exists()
         return False
 
 
@@ -354,6 +402,15 @@ class PostShareSerializer(serializers.ModelSerializer):
         return obj.post.id
 
 
+class PostBulkShareSerializer(serializers.Serializer):
+    """Serializer for the recipients of a post shared with many users"""
+    recipientIds = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.POST_SHARE_MAX_RECIPIENTS,
+    )
+
+
 class PostReviewRatingSerializer(serializers.ModelSerializer):
     """Serializer for filtering Post objects by menuItemId"""
     postId = serializers.ReadOnlyField(source="id")
@@ -384,12 +441,12 @@ class PostImageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = ["id", "postPhotoUrl"]
-        read_only_fields = ["id"]
+        fields = ["id", "postPhotoUrl", "postPhotoStatus"]
+        read_only_fields = ["id", "postPhotoStatus"]
         extra_kwargs = {"postPhotoUrl": {"required": "True"}}
 
 
-class UsersListSerializer(serializers.ModelSerializer):
+class UsersListSerializer(RenditionSerializerMixin, serializers.ModelSerializer):
     """Serializer for retrieving a list of users"""
     userId = serializers.ReadOnlyField(source="id")
 
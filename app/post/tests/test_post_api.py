@@ -7,7 +7,9 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from geopy.distance import geodesic
@@ -15,7 +17,7 @@ from geopy.distance import geodesic
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Post, PostLike, PostSave, PostView, PostComment, PostShare, Business, MenuItem
+from core.models import Post, PostLike, PostSave, PostView, PostComment, PostShare, Business, MenuItem, TimelineEntry, PostSeen, OutboxMessage
 
 from post.serializers import PostSerializer, PostDetailSerializer
 
@@ -83,6 +85,70 @@ class PrivatePostApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def create_engaged_posts(self, author, count):
+        """Create posts with likes, saves, comments and shares on each"""
+        business = Business.objects.create(
+            user=author, businessName="Business")
+        menu_item = MenuItem.objects.create(
+            name="Item", business=business, price=12.50)
+        for _ in range(count):
+            post = create_post(user=author, menuItem=menu_item)
+            PostLike.objects.create(user=self.user, post=post, isActive=True)
+            PostSave.objects.create(user=self.user, post=post, postIsSaved=True)
+            PostComment.objects.create(user=self.user, post=post)
+            PostShare.objects.create(
+                post=post, sharedBy=self.user, sharedTo=author)
+
+    def test_following_feed_query_count_is_flat(self):
+        """Test the following feed cost does not grow with the page size"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        self.user.following.add(author)
+        url = reverse("post:following-post")
+
+        self.create_engaged_posts(author, 2)
+        with CaptureQueriesContext(connection) as small_page:
+            res = self.client.get(url)
+        self.assertEqual(len(res.data), 2)
+
+        self.create_engaged_posts(author, 8)
+        with self.assertNumQueries(len(small_page)):
+            res = self.client.get(url)
+        self.assertEqual(len(res.data), 10)
+        self.assertTrue(all(post["isLiked"] for post in res.data))
+        self.assertTrue(all(post["isSaved"] for post in res.data))
+        self.assertTrue(all(post["postCommentCount"] == 1 for post in res.data))
+
+    def test_for_you_feed_query_count(self):
+        """Test a full for-you feed page is served in a fixed number of queries"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        self.create_engaged_posts(author, 10)
+        url = reverse("post:for-you-post-feed")
+
+        # page, count, liked, saved, comments, saves, shares
+        with self.assertNumQueries(7):
+            res = self.client.get(url)
+        self.assertEqual(len(res.data["results"]), 10)
+
+    def test_saved_posts_query_count_is_flat(self):
+        """Test listing saved posts does not issue queries per post"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        url = reverse("post:saved-post-list")
+
+        self.create_engaged_posts(author, 1)
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get(url)
+
+        self.create_engaged_posts(author, 9)
+        with self.assertNumQueries(len(small_page)):
+            res = self.client.get(url)
+        self.assertEqual(len(res.data), 10)
+
     def test_retrieve_followers_latest_posts(self):
         """Test retrieving followers latest posts"""
         new_user = create_user(userEmailAddress="user2@example.com",
@@ -118,6 +184,109 @@ class PrivatePostApiTests(TestCase):
         self.assertEqual(res.data[2]["postId"], post1.id)
         self.assertNotIn(post4, res.data)
 
+    def test_following_feed_cursor_pages(self):
+        """Test paging the following feed with a keyset cursor"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        self.user.following.add(author)
+        posts = [create_post(user=author) for _ in range(5)]
+        url = reverse("post:following-post")
+
+        res = self.client.get(url, {"cursor": "", "page_size": 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [post["postId"] for post in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [post["postId"] for post in res.data["results"]]
+
+        self.assertEqual(ids, [post.id for post in reversed(posts)])
+
+    def test_follow_backfills_and_unfollow_clears_timeline(self):
+        """Test following an author copies their posts to the feed"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        post = create_post(user=author)
+        follow_url = reverse("user:follow_user", args=[author.id])
+        url = reverse("post:following-post")
+
+        self.client.post(follow_url)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=post).exists())
+        res = self.client.get(url)
+        self.assertEqual([p["postId"] for p in res.data], [post.id])
+
+        self.client.post(follow_url)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+        res = self.client.get(url)
+        self.assertEqual(res.data, [])
+
+    @override_settings(TIMELINE_FANOUT_FOLLOWER_LIMIT=1)
+    def test_following_feed_pulls_popular_authors(self):
+        """Test posts of authors above the fan-out limit are read on request"""
+        popular = create_user(userEmailAddress="popular@example.com",
+                              password="test123",
+                              userUsername="popular",
+                              userFollowers=2)
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        self.user.following.add(popular, author)
+        post1 = create_post(user=author)
+        post2 = create_post(user=popular)
+        post3 = create_post(user=author)
+
+        self.assertFalse(TimelineEntry.objects.filter(post=post2).exists())
+        res = self.client.get(reverse("post:following-post"))
+        self.assertEqual([p["postId"] for p in res.data],
+                         [post3.id, post2.id, post1.id])
+
+    def test_following_feed_skips_entries_of_unfollowed_authors(self):
+        """Test a backfill landing after the unfollow shows nothing"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        create_post(user=author)
+
+        # A follow's backfill that ran after its unfollow had committed
+        TimelineEntry.objects.backfill(self.user, author)
+
+        res = self.client.get(reverse("post:following-post"))
+        self.assertEqual(res.data, [])
+
+    @override_settings(TIMELINE_FANOUT_FOLLOWER_LIMIT=1)
+    def test_following_feed_keeps_posts_when_author_drops_below_limit(self):
+        """Test posts pulled while the author was popular stay in the feed"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author",
+                             userFollowers=2)
+        self.user.following.add(author)
+        post1 = create_post(user=author)
+        get_user_model().objects.filter(pk=author.pk).update(userFollowers=1)
+        author.refresh_from_db()
+        post2 = create_post(user=author)
+
+        self.assertTrue(TimelineEntry.objects.filter(post=post2).exists())
+        res = self.client.get(reverse("post:following-post"))
+        self.assertEqual([p["postId"] for p in res.data], [post2.id, post1.id])
+
+    @override_settings(TIMELINE_FANOUT_FOLLOWER_LIMIT=1)
+    def test_follow_above_limit_backfills_fanned_out_posts(self):
+        """Test following a popular author copies their fanned-out posts"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        post = create_post(user=author)
+        get_user_model().objects.filter(pk=author.pk).update(userFollowers=5)
+
+        self.client.post(reverse("user:follow_user", args=[author.id]))
+        get_user_model().objects.filter(pk=author.pk).update(userFollowers=0)
+
+        res = self.client.get(reverse("post:following-post"))
+        self.assertEqual([p["postId"] for p in res.data], [post.id])
+
     def test_like_post(self):
         """Test if user is able to like a post"""
         new_user = create_user(userEmailAddress="user2@example.com",
@@ -207,6 +376,46 @@ class PrivatePostApiTests(TestCase):
         self.assertIn(post1.id, post_ids_in_response)
         self.assertIn(post2.id, post_ids_in_response)
 
+    def test_unliked_post_not_in_liked_posts(self):
+        """Test liked posts and likers only reflect the current like state"""
+        new_user = create_user(
+            userEmailAddress="user2@example.com",
+            password="test123",
+            userPhoneNumber="0123456789",
+            userUsername="username1"
+        )
+        post1 = create_post(user=new_user)
+        post2 = create_post(user=new_user)
+        url = reverse("post:like-post", kwargs={"post_id": post1.id})
+        self.client.post(url)
+        res = self.client.post(url)
+        self.assertFalse(res.data["isLiked"])
+        PostLike.objects.create(user=self.user, post=post2, isActive=True)
+
+        res = self.client.get(reverse("post:liked-post-list"))
+        self.assertEqual([post["postId"] for post in res.data], [post2.id])
+
+        res = self.client.get(reverse("post:post-liked-users-list",
+                                      kwargs={"post_id": post1.id}))
+        self.assertEqual(len(res.data), 0)
+
+    def test_like_comment(self):
+        """Test liking and unliking a comment"""
+        post = create_post(user=self.user)
+        comment = PostComment.objects.create(user=self.user, post=post)
+        url = reverse("post:like-comment",
+                      kwargs={"postcomment_id": comment.id})
+
+        res = self.client.post(url)
+        self.assertTrue(res.data["isLiked"])
+        comment.refresh_from_db()
+        self.assertEqual(comment.commentLikeCount, 1)
+
+        res = self.client.post(url)
+        self.assertFalse(res.data["isLiked"])
+        comment.refresh_from_db()
+        self.assertEqual(comment.commentLikeCount, 0)
+
     def test_retrieve_post_like_list(self):
         """Test retrieving a list of postLikes for a user"""
         other_user = create_user(
@@ -290,6 +499,46 @@ class PrivatePostApiTests(TestCase):
         res = self.client.post(url)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_for_you_feed_orders_unseen_first(self):
+        """Test the for-you feed lists unseen posts before seen ones, once each"""
+        author = create_user(userEmailAddress="author@example.com",
+                             password="test123",
+                             userUsername="author")
+        other = create_user(userEmailAddress="other@example.com",
+                            password="test123",
+                            userUsername="other")
+        posts = [create_post(user=author) for _ in range(5)]
+        for post in (posts[1], posts[3]):
+            PostView.objects.create(user=self.user, post=post)
+            PostView.objects.create(user=self.user, post=post)
+            PostView.objects.create(user=other, post=post)
+        expected = [posts[4].id, posts[2].id, posts[0].id,
+                    posts[3].id, posts[1].id]
+        url = reverse("post:for-you-post-feed")
+
+        res = self.client.get(url)
+        self.assertEqual(res.data["count"], 5)
+        self.assertEqual([p["postId"] for p in res.data["results"]], expected)
+
+        res = self.client.get(url, {"cursor": "", "page_size": 2})
+        ids = [p["postId"] for p in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [p["postId"] for p in res.data["results"]]
+        self.assertEqual(ids, expected)
+
+    def test_view_post_marks_post_seen(self):
+        """Test viewing a post adds it to the user's seen set once"""
+        post = create_post(user=self.user)
+        url = reverse("post:view-post", kwargs={"post_id": post.id})
+
+        self.client.post(url)
+        self.client.post(url)
+
+        self.assertEqual(PostView.objects.filter(post=post).count(), 2)
+        self.assertEqual(
+            PostSeen.objects.filter(user=self.user, post=post).count(), 1)
+
     def test_retrieve_post_view_list(self):
         """Test retrieving a list of postView for a user"""
         new_user = create_user(userEmailAddress="user2@example.com",
@@ -400,6 +649,52 @@ class PrivatePostApiTests(TestCase):
                 sharedTo=new_user
             ).exists()
         )
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.recipient, f"user_{new_user.id}")
+        self.assertEqual(message.message["post_id"], post.id)
+
+    def test_bulk_share_post(self):
+        """Test sharing a post with many users in one request"""
+        recipients = [
+            create_user(userEmailAddress=f"friend{i}@example.com",
+                        password="test123", userUsername=f"friend{i}")
+            for i in range(3)
+        ]
+        post = create_post(user=self.user)
+        url = reverse("post:share-post-bulk", kwargs={"post_id": post.id})
+        recipient_ids = [user.id for user in recipients]
+
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.post(url, {"recipientIds": recipient_ids + [
+                recipient_ids[0], 999999]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([result["status"] for result in res.data["results"]],
+                         ["shared", "shared", "shared", "not_found"])
+        self.assertEqual(
+            set(PostShare.objects.filter(post=post, sharedBy=self.user)
+                .values_list("sharedTo_id", flat=True)),
+            set(recipient_ids))
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list("recipient", flat=True)),
+            sorted(f"user_{user_id}" for user_id in recipient_ids))
+
+        with CaptureQueriesContext(connection) as one:
+            self.client.post(url, {"recipientIds": recipient_ids[:1]},
+                             format="json")
+        self.assertEqual(len(many), len(one))
+
+    def test_bulk_share_post_validation(self):
+        """Test bulk shares need recipients and an existing post"""
+        post = create_post(user=self.user)
+        url = reverse("post:share-post-bulk", kwargs={"post_id": post.id})
+
+        res = self.client.post(url, {"recipientIds": []}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        url = reverse("post:share-post-bulk", kwargs={"post_id": post.id + 1})
+        res = self.client.post(url, {"recipientIds": [self.user.id]}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_nearby_posts_list_view(self):
         """Test calculating the post"""
@@ -450,6 +745,61 @@ class PrivatePostApiTests(TestCase):
 
         self.assertLess(posts[0]['distance'], posts[1]['distance'])
 
+    def test_nearby_posts_radius_and_cursor(self):
+        """Test nearby posts honour radius_km and page by distance cursor"""
+        new_user = create_user(userEmailAddress="user2@example.com",
+                               password="test123",
+                               userPhoneNumber="0123456789",
+                               userUsername="username2", )
+        near = Business.objects.create(
+            user=new_user, businessOperatingLatitude=40.7130,
+            businessOperatingLongitude=-74.0050)
+        far = Business.objects.create(
+            user=new_user, businessOperatingLatitude=42.3601,
+            businessOperatingLongitude=-71.0589)
+        near_item = MenuItem.objects.create(
+            name="Near", business=near, price=12.50)
+        far_item = MenuItem.objects.create(
+            name="Far", business=far, price=12.50)
+        near_posts = [create_post(user=new_user, menuItem=near_item)
+                      for _ in range(3)]
+        create_post(user=new_user, menuItem=far_item)
+        url = reverse("post:nearby-post-feed")
+
+        res = self.client.get(url, {"radius_km": 10, "cursor": "",
+                                    "page_size": 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first_page = [post["postId"] for post in res.data["results"]]
+        self.assertEqual(first_page, [near_posts[0].id, near_posts[1].id])
+
+        res = self.client.get(res.data["next"])
+        self.assertEqual([post["postId"] for post in res.data["results"]],
+                         [near_posts[2].id])
+        self.assertIsNone(res.data["next"])
+
+        res = self.client.get(url, {"radius_km": 500})
+        self.assertEqual(res.data["count"], 4)
+
+        res = self.client.get(url, {"radius_km": "far"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rating_review_cursor_pages(self):
+        """Test paging rating reviews with a cursor over tied ratings"""
+        ratings = [5, 3, 5, 4, 3, 5]
+        posts = [create_post(user=self.user, postRatingEatAgain=rating,
+                             postRatingWorthIt=3, postRatingDelicious=3)
+                 for rating in ratings]
+        url = reverse("post:review-rating-eat-again")
+
+        res = self.client.get(url, {"cursor": "", "page_size": 4})
+        ids = [post["postId"] for post in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        ids += [post["postId"] for post in res.data["results"]]
+
+        self.assertIsNone(res.data["next"])
+        expected = sorted(posts, key=lambda p: (-p.postRatingEatAgain, -p.id))
+        self.assertEqual(ids, [post.id for post in expected])
+
     def test_retrieve_menus_category_food(self):
         """Test retrieving menus where category is 'Food'"""
         # create users
@@ -732,6 +1082,7 @@ class ImageUploadTests(TestCase):
         self.post.refresh_from_db()
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn("postPhotoUrl", res.data)
+        self.assertEqual(res.data["postPhotoStatus"], Post.PHOTO_PROCESSING)
         self.assertTrue(os.path.exists(self.post.postPhotoUrl.path))
 
     def test_upload_image_bad_request(self):
@@ -23,6 +23,7 @@ urlpatterns = [
     path("view/post/<int:post_id>/", views.ViewPostView.as_view(), name = "view-post"),
     path("save/post/<int:post_id>/", views.SavePostView.as_view(), name="save-post"),
     path("share/post/<int:post_id>/<int:user_id>/", views.SharePostView.as_view(), name="share-post"),
+    path("share/post/<int:post_id>/", views.BulkSharePostView.as_view(), name="share-post-bulk"),
     path("comment/post/<int:post_id>/create/", views.CretePostCommentView.as_view(), name="comment-post"),
     path("posts/feed/following/", views.FollowingPostsView.as_view(), name="following-post"),
     # path("posts/for-you/", views.AllPostsView.as_view(), name =  "for-you-post"),
@@ -5,43 +5,40 @@ Views for the post APIs.
 from rest_framework import viewsets, status, generics, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.authentication import TokenAuthentication
+from core.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError, NotFound
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
 from geopy.distance import geodesic
+import heapq
 
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from PIL import Image
-from io import BytesIO
-from django.core.files import File
-
-from core.models import Post, PostLike, User, PostSave, PostView, PostComment, PostShare, Business, CommentLike
+from core.models import Post, PostLike, User, PostSave, PostView, PostComment, PostShare, Business, PostLikeState, CommentLikeState, TimelineEntry, PostSeen, OutboxMessage
 from post import serializers
 
-from django.db import models
-from django.db.models import Max, Case, When, BooleanField, F, Value
+from django.db import transaction
+from django.db.models import Q, Exists, OuterRef
 from django.forms.models import model_to_dict
+from django.conf import settings
 
-
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
 
-from ip2geotools.databases.noncommercial import DbIpCity
+from core.geoip import get_client_ip, get_geoip_provider
 
-
-channel_layer = get_channel_layer()
+from core.geo import bounding_box, covering_geohashes
+from core.pagination import CursorPaginationMixin
 
 
 class PostViewset(viewsets.ModelViewSet):
     """View for manage post APIs. """
     serializer_class = serializers.PostDetailSerializer
     queryset = Post.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -57,29 +54,10 @@ class PostViewset(viewsets.ModelViewSet):
         return self.serializer_class
 
     def perform_create(self, serializer):
-        """Create a new post"""
+        """Create a new post, its photo is resized by process_image_jobs"""
         postPublishIpAddress = self.request.META.get("REMOTE_ADDR")
         serializer.save(user=self.request.user,
                         postPublishIpAddress=postPublishIpAddress)
-        image = self.request.data.get("postPhotoUrl")
-        if image:
-            # open image
-            img = Image.open(image)
-
-        # resize image
-            img.thumbnail((800, 600), Image.ANTIALIAS)
-
-        # save image back to image field
-            thumb_io = BytesIO()
-            img.save(thumb_io, format='JPEG', quality=50)
-
-            image_file = File(thumb_io, name=image.name)
-            serializer.save(user=self.request.user,
-                            postPublishIpAddress=postPublishIpAddress,
-                            postPhotoUrl=image_file)
-        else:
-            serializer.save(user=self.request.user,
-                            postPublishIpAddress=postPublishIpAddress)
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
@@ -94,7 +72,7 @@ class PostViewset(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CustomPostPagination(PageNumberPagination):
+class CustomPostPagination(CursorPaginationMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
@@ -102,7 +80,7 @@ class CustomPostPagination(PageNumberPagination):
 
 class LikePostView(generics.GenericAPIView):
     """this view is for users to like a post"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.PostLikeSerializer
 
@@ -119,9 +97,9 @@ class LikePostView(generics.GenericAPIView):
             "likeIpAddress": request.META.get("REMOTE_ADDR"),
             "likeUserAgent": request.META.get("HTTP_USER_AGENT"),
         }
-        existing_like = PostLike.objects.filter(
-            user=user, post=post).order_by("-likeDateTime").first()
-        if existing_like and existing_like.isActive == True:
+        is_liked = PostLikeState.objects.filter(
+            user=user, post=post, isLiked=True).exists()
+        if is_liked:
             data["isActive"] = False
             response_data = {"isLiked": False}
         else:
@@ -136,7 +114,7 @@ class LikePostView(generics.GenericAPIView):
 
 class LikeCommentView(generics.GenericAPIView):
     """This view is for users to like a comment"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.CommentLikeSerializer
 
@@ -153,14 +131,14 @@ class LikeCommentView(generics.GenericAPIView):
             "likeIpAddress": request.META.get("REMOTE_ADDR"),
             "likeUserAgent": request.META.get("HTTP_USER_AGENT"),
         }
-        existing_like = CommentLike.objects.filter(
-            user=user, comment=comment).order_by("-likeDateTime").first()
-        if existing_like and existing_like.isActive == True:
+        is_liked = CommentLikeState.objects.filter(
+            user=user, comment=comment, isLiked=True).exists()
+        if is_liked:
             data["isActive"] = False
             response_data = {"isLiked": False}
         else:
             data["isActive"] = True
-            response_data = {"isLiked": False}
+            response_data = {"isLiked": True}
 
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
@@ -170,7 +148,7 @@ class LikeCommentView(generics.GenericAPIView):
 
 class CommentLikeListView(generics.ListAPIView):
     serializer_class = serializers.CommentLikeSerializer
-    authentication_classess = [TokenAuthentication]
+    authentication_classess = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -181,20 +159,19 @@ class CommentLikeListView(generics.ListAPIView):
 
 class PostLikedUsersListView(generics.ListAPIView):
     serializer_class = serializers.UsersListSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """return a list of all of the users who liked  a particular post"""
         post_id = self.kwargs["post_id"]
-        liked_users_ids = PostLike.objects.filter(
-            post_id=post_id, isActive=True).values_list("user_id", flat=True)
-        return User.objects.filter(id__in=liked_users_ids)
+        return User.objects.filter(
+            post_like_states__post_id=post_id, post_like_states__isLiked=True)
 
 
 class PostLikeListView(generics.ListAPIView):
     serializer_class = serializers.PostLikeSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -207,7 +184,7 @@ class PostLikeListView(generics.ListAPIView):
 
 class UserlikedPostsListView(generics.ListAPIView):
     serializer_class = serializers.PostSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -215,35 +192,15 @@ class UserlikedPostsListView(generics.ListAPIView):
         This view should return a list of all the posts that have been
         liked by the currently authenticated user.
         """
-        user_id = self.request.user.id
-        # Annotate PostLike objects with the maximum likeDateTime for each post.
-        post_likes = PostLike.objects.filter(user_id=user_id).values(
-            "post").annotate(max_likeDateTime=Max("likeDateTime"))
-
-        if not post_likes:
-            return Post.objects.none()
-
-        # Create a dictionary with post id as key and like date time as value
-        liked_posts_dict = {
-            post_like["post"]: post_like["max_likeDateTime"] for post_like in post_likes}
-
-        # Get the list of post ids
-        liked_posts_ids = list(liked_posts_dict.keys())
-
-        # Get the queryset of liked posts
-        queryset = Post.objects.filter(id__in=liked_posts_ids)
-
-        # Order the queryset by like date time in descending order
-        queryset = queryset.annotate(likeDateTime=models.Case(
-            *[models.When(pk=pk, then=date) for pk, date in liked_posts_dict.items()]
-        )).order_by("-likeDateTime")
-
-        return queryset
+        user = self.request.user
+        return Post.objects.filter(
+            like_states__user=user, like_states__isLiked=True).select_related(
+            "user", "menuItem__business").order_by("-like_states__likedDateTime")
 
 
 class SavePostView(generics.GenericAPIView):
     """This view is for users to save a post"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.PostSaveSerializer
 
@@ -267,18 +224,19 @@ class SavePostView(generics.GenericAPIView):
 
 class ListSavedPostView(generics.ListAPIView):
     """This view is for users to view the saved posts"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.PostSerializer
 
     def get_queryset(self):
         user = self.request.user
-        return Post.objects.filter(saves__user=user, saves__postIsSaved=True).order_by("-saves__savedDateTime")
+        return Post.objects.filter(saves__user=user, saves__postIsSaved=True).select_related(
+            "user", "menuItem__business").order_by("-saves__savedDateTime")
 
 
 class ViewPostView(generics.GenericAPIView):
     """This view is to create a postView instance"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.PostViewSerializer
 
@@ -302,7 +260,7 @@ class ViewPostView(generics.GenericAPIView):
 
 class PostViewListView(generics.ListAPIView):
     serializer_class = serializers.PostViewSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -312,7 +270,7 @@ class PostViewListView(generics.ListAPIView):
 
 
 class CretePostCommentView(generics.CreateAPIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     serializer_class = serializers.PostCommentSerializer
     permission_classes = [IsAuthenticated]
 
@@ -323,17 +281,8 @@ class CretePostCommentView(generics.CreateAPIView):
         except Post.DoesNotExist:
             return Response({"detail": "Post not found"})
 
-        x_forwarded_for = self.request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = self.request.META.get("REMOTE_ADDR")
-
-        try:
-            response = DbIpCity.get(ip, api_key="free")
-            location = response.country
-        except Exception as e:
-            location = "Location unavailable"
+        geolocation = get_geoip_provider().lookup(get_client_ip(self.request))
+        location = geolocation.country if geolocation else "Location unavailable"
 
         serializer.save(
             user=self.request.user,
@@ -347,7 +296,7 @@ class CretePostCommentView(generics.CreateAPIView):
 class ListPostCommentView(generics.ListAPIView):
     """This view is for users to view the comments of a post"""
     serializer_class = serializers.PostCommentSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -357,7 +306,7 @@ class ListPostCommentView(generics.ListAPIView):
 
 class DeleteCommentView(generics.DestroyAPIView):
     """This view is for users to delete their comment"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.PostCommentSerializer
     queryset = PostComment.objects.all()
@@ -371,35 +320,99 @@ class DeleteCommentView(generics.DestroyAPIView):
 
 
 class FollowingPostsView(generics.ListAPIView):
+    """Posts of the followed users, newest first.
+
+    The feed is read from the user's materialized timeline, merged with the
+    posts of followed authors that were not fanned out to their followers.
+    With ?cursor= it is paged by (postPublishDateTime, id).
+    """
     serializer_class = serializers.PostSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = CustomPostPagination
 
-    def get_queryset(self):
+    def get_feed_keys(self, position, limit):
+        """Return up to limit (postPublishDateTime, post id) keys after position"""
         user = self.request.user
-        return Post.objects.filter(user__in=user.following.all()).order_by('-postPublishDateTime')
+        following = user.following.all()
+        # Entries of unfollowed authors may outlive a racing backfill or
+        # fan_out, so both sides keep to the current follows
+        entries = TimelineEntry.objects.filter(user=user, author__in=following)
+        pulled = Post.objects.filter(user__in=following, postFannedOut=False)
+
+        if position is not None:
+            try:
+                published, post_id = parse_datetime(position[0]), int(position[1])
+            except (IndexError, TypeError, ValueError):
+                raise NotFound("Invalid cursor")
+            if published is None:
+                raise NotFound("Invalid cursor")
+            entries = entries.filter(
+                Q(postPublishDateTime__lt=published)
+                | Q(postPublishDateTime=published, post_id__lt=post_id))
+            pulled = pulled.filter(
+                Q(postPublishDateTime__lt=published)
+                | Q(postPublishDateTime=published, id__lt=post_id))
+
+        entries = entries.order_by("-postPublishDateTime", "-post_id").values_list(
+            "postPublishDateTime", "post_id")
+        pulled = pulled.order_by("-postPublishDateTime", "-id").values_list(
+            "postPublishDateTime", "id")
+        if limit is not None:
+            entries = entries[:limit]
+            pulled = pulled[:limit]
+
+        keys = []
+        merged_ids = set()
+        for key in heapq.merge(entries, pulled, reverse=True):
+            if key[1] not in merged_ids:
+                merged_ids.add(key[1])
+                keys.append(key)
+        return keys[:limit]
+
+    def list(self, request, *args, **kwargs):
+        use_cursor = self.paginator.use_cursor(request)
+        if use_cursor:
+            keys = self.paginator.paginate_keys(self.get_feed_keys, request)
+        else:
+            keys = self.get_feed_keys(None, None)
+
+        posts = Post.objects.select_related("user", "menuItem__business").in_bulk(
+            [post_id for _, post_id in keys])
+        serializer = self.get_serializer(
+            [posts[post_id] for _, post_id in keys if post_id in posts], many=True)
+        if use_cursor:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
 
 
 class AllPostsView(generics.ListAPIView):
     serializer_class = serializers.PostSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        return Post.objects.exclude(user=user).order_by("-postPublishDateTime")
+        return Post.objects.exclude(user=user).select_related(
+            "user", "menuItem__business").order_by("-postPublishDateTime")
 
 
 class SinglePostView(generics.RetrieveAPIView):
     queryset = Post.objects.all()
     serializer_class = serializers.PostSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
 
 class SearchFilterPostsView(generics.ListAPIView):
+    """Posts the user has not seen yet first, then seen posts, newest first.
+
+    Seen posts come from the user's PostSeen rows. With ?cursor= the unseen
+    and the seen posts are read as two streams paged by
+    (postPublishDateTime, id), so a page costs the same at any depth.
+    """
     serializer_class = serializers.PostSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -407,80 +420,151 @@ class SearchFilterPostsView(generics.ListAPIView):
     pagination_class = CustomPostPagination
     queryset = Post.objects.all().order_by("postPublishDateTime")
 
-    def get_queryset(self):
-        user = self.request.user
+    def get_seen(self):
+        return PostSeen.objects.filter(user=self.request.user)
 
-        # Annotate each post with an is_viewed field
-        queryset = Post.objects.annotate(
-            is_viewed=Case(
-                When(post_views__user=user, then=True),
-                default=False,
-                output_field=BooleanField()
-            )
-        )
-
-        # Order by unseen post first, and then post
-        queryset = queryset.order_by("is_viewed", "-postPublishDateTime")
-
-        return queryset
+    def get_queryset(self):
+        seen = self.get_seen().filter(post=OuterRef("pk"))
+        return Post.objects.select_related(
+            "user", "menuItem__business").annotate(
+            is_viewed=Exists(seen)).order_by(
+            "is_viewed", "-postPublishDateTime", "-id")
+
+    def get_feed_keys(self, position, limit):
+        """Return up to limit (is_viewed, postPublishDateTime, post id) keys after position"""
+        after = None
+        if position is not None:
+            try:
+                viewed, published, post_id = position
+                after = (bool(viewed), parse_datetime(published), int(post_id))
+            except (TypeError, ValueError):
+                raise NotFound("Invalid cursor")
+            if after[1] is None:
+                raise NotFound("Invalid cursor")
+
+        posts = self.filter_queryset(Post.objects.all())
+        streams = [
+            (False, posts.exclude(Exists(self.get_seen().filter(post=OuterRef("pk"))))
+             .order_by("-postPublishDateTime", "-id")
+             .values_list("postPublishDateTime", "id")),
+            (True, self.get_seen().filter(post__in=posts)
+             .order_by("-postPublishDateTime", "-post_id")
+             .values_list("postPublishDateTime", "post_id")),
+        ]
+
+        keys = []
+        for viewed, stream in streams:
+            if after is not None and after[0] > viewed:
+                continue
+            if after is not None and after[0] == viewed:
+                id_field = "post_id" if viewed else "id"
+                stream = stream.filter(
+                    Q(postPublishDateTime__lt=after[1])
+                    | Q(postPublishDateTime=after[1], **{f"{id_field}__lt": after[2]}))
+            keys += [(viewed, published, post_id)
+                     for published, post_id in stream[:limit - len(keys)]]
+            if len(keys) >= limit:
+                break
+        return keys
+
+    def list(self, request, *args, **kwargs):
+        if not self.paginator.use_cursor(request):
+            return super().list(request, *args, **kwargs)
+
+        keys = self.paginator.paginate_keys(self.get_feed_keys, request)
+        posts = Post.objects.select_related("user", "menuItem__business").in_bulk(
+            [post_id for _, _, post_id in keys])
+        serializer = self.get_serializer(
+            [posts[post_id] for _, _, post_id in keys if post_id in posts], many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class NearbyPostsListView(generics.ListAPIView):
+    """Posts ordered by distance to the user, within radius_km kilometres.
+
+    Businesses are prefiltered with their geohash and a bounding box, so
+    distances are only computed for the candidates around the user.
+    """
     serializer_class = serializers.PostDistanceSerializer
-    authentication_classes = [TokenAuthentication]
-    permission_classess = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
 
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ["menuItem", "user"]
     pagination_class = CustomPostPagination
+    queryset = Post.objects.all()
 
-    def get_queryset(self):
+    def get_radius(self):
+        radius = self.request.query_params.get(
+            "radius_km", settings.NEARBY_POSTS_DEFAULT_RADIUS_KM)
+        try:
+            radius = float(radius)
+        except (TypeError, ValueError):
+            raise ValidationError({"radius_km": "A number is required."})
+        if not 0 < radius <= settings.NEARBY_POSTS_MAX_RADIUS_KM:
+            raise ValidationError({"radius_km": "Radius out of range."})
+        return radius
+
+    def get_business_distances(self, user_location, radius):
+        """Return {business id: distance in km} for businesses in radius"""
+        min_lat, min_lng, max_lat, max_lng = box = bounding_box(
+            *user_location, radius)
+        businesses = Business.objects.filter(
+            businessOperatingLatitude__range=(min_lat, max_lat),
+            businessOperatingLongitude__range=(min_lng, max_lng),
+        )
+        prefixes = covering_geohashes(box)
+        if prefixes is not None:
+            cells = Q()
+            for prefix in prefixes:
+                cells |= Q(businessGeohash__startswith=prefix)
+            businesses = businesses.filter(cells)
+
+        distances = {}
+        for business_id, latitude, longitude in businesses.values_list(
+                "id", "businessOperatingLatitude", "businessOperatingLongitude"):
+            distance = geodesic(user_location, (latitude, longitude)).kilometers
+            if distance <= radius:
+                distances[business_id] = distance
+        return distances
+
+    def get_ranking(self):
+        """Return (distance, post id) pairs of the nearby posts, nearest first"""
         user = self.request.user
+        if user.userLatitude is None or user.userLongitude is None:
+            return []
+        distances = self.get_business_distances(
+            (user.userLatitude, user.userLongitude), self.get_radius())
+        posts = self.filter_queryset(self.get_queryset()).filter(
+            menuItem__business_id__in=distances.keys())
+        return sorted(
+            (distances[business_id], post_id)
+            for post_id, business_id in posts.values_list(
+                "id", "menuItem__business_id")
+        )
 
-        # Get location
-        user_location = (user.userLatitude, user.userLongitude)
+    def list(self, request, *args, **kwargs):
+        ranking = self.get_ranking()
+        if self.paginator.use_cursor(request):
+            page = self.paginator.paginate_sorted_keys(ranking, request)
+        else:
+            page = self.paginator.paginate_queryset(ranking, request, view=self)
 
-        # Get all post
-        posts = Post.objects.all()
+        posts = Post.objects.select_related("user", "menuItem__business").in_bulk(
+            [post_id for _, post_id in page])
+        page_posts = []
+        for distance, post_id in page:
+            post = posts[post_id]
+            post.distance = distance
+            page_posts.append(post)
 
-        # Calculate the distance and add as an attribute to each post
-        for post in posts:
-            try:
-                if post.menuItem and post.menuItem.business:
-                    business = post.menuItem.business
-                    if business.businessOperatingLatitude and business.businessOperatingLongitude:
-                        business_location = (
-                            business.businessOperatingLatitude, business.businessOperatingLongitude)
-                        post.distance = geodesic(
-                            user_location, business_location).kilometers
-                    else:
-                        post.distance =9999
-                else:
-                    post.distance = 9999
-
-            except Business.DoesNotExist:
-                # If business does not exist, set a high distance value
-                post.distance = 99999
-
-        sorted_posts_list = sorted(posts, key=lambda x: x.distance)
-
-        # Convert the list of post objects back to a queryset
-        sorted_posts_ids = [post.id for post in sorted_posts_list]
-        sorted_posts = Post.objects.filter(id__in=sorted_posts_ids)
-        sorted_posts = sorted_posts.annotate(
-            distance=Case(
-                *[When(id=post.id, then=Value(post.distance))
-                  for post in sorted_posts_list],
-                output_field=models.FloatField()
-            )
-        ).order_by("distance")
-
-        return sorted_posts
+        serializer = self.get_serializer(page_posts, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class ReturnRatingReviewPostsView(generics.ListAPIView):
     serializer_class = serializers.PostReviewRatingSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     queryset = Post.objects.all().order_by("-postRatingEatAgain",
@@ -492,7 +576,7 @@ class ReturnRatingReviewPostsView(generics.ListAPIView):
 
 class ReturnHighestEatAgainRatingReview(generics.ListAPIView):
     serializer_class = serializers.PostReviewRatingSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     queryset = Post.objects.all().order_by("-postRatingEatAgain")
@@ -503,7 +587,7 @@ class ReturnHighestEatAgainRatingReview(generics.ListAPIView):
 
 class ReturnHighestWorthItRatingReview(generics.ListAPIView):
     serializer_class = serializers.PostReviewRatingSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     queryset = Post.objects.all().order_by("-postRatingWorthIt")
@@ -514,7 +598,7 @@ class ReturnHighestWorthItRatingReview(generics.ListAPIView):
 
 class ReturnHighestDeliciousRatinReview(generics.ListAPIView):
     serializer_class = serializers.PostReviewRatingSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     queryset = Post.objects.all().order_by("-postRatingDelicious")
@@ -525,7 +609,7 @@ class ReturnHighestDeliciousRatinReview(generics.ListAPIView):
 
 class SharePostView(generics.GenericAPIView):
     """This view is for user share the post"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.PostShareSerializer
 
@@ -552,15 +636,52 @@ class SharePostView(generics.GenericAPIView):
         }
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-
-        # Send a WebSocket message to the shared_to user
-        async_to_sync(channel_layer.group_send)(
-            f"user_{shared_to.id}",
-            {
+        with transaction.atomic():
+            serializer.save()
+            # Notify the shared_to user once the share is committed
+            OutboxMessage.objects.enqueue(f"user_{shared_to.id}", {
                 "type": "share.post",
                 "post_id": post.id,
                 "shared_by_username": shared_by.userName,
-            }
-        )
+            })
         return HttpResponse("Post shared successfully")
+
+
+class BulkSharePostView(generics.GenericAPIView):
+    """Share a post with many users in one request.
+
+    The recipients are validated with one query and the shares and their
+    notifications are inserted in bulk. Each recipient gets a result, so
+    unknown users do not fail the whole request.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = serializers.PostBulkShareSerializer
+
+    def post(self, request, post_id):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        post = get_object_or_404(Post.objects.only("id"), pk=post_id)
+
+        recipient_ids = list(dict.fromkeys(serializer.validated_data["recipientIds"]))
+        found = set(User.objects.filter(
+            pk__in=recipient_ids, is_active=True).values_list("id", flat=True))
+        shares = [PostShare(post=post, sharedBy=request.user, sharedTo_id=user_id)
+                  for user_id in recipient_ids if user_id in found]
+
+        with transaction.atomic():
+            shares = PostShare.objects.bulk_create(shares)
+            OutboxMessage.objects.enqueue_many(
+                [f"user_{share.sharedTo_id}" for share in shares], {
+                    "type": "share.post",
+                    "post_id": post.id,
+                    "shared_by_username": request.user.userName,
+                })
+
+        share_ids = {share.sharedTo_id: share.id for share in shares}
+        results = [
+            {"userId": user_id, "status": "shared", "shareId": share_ids[user_id]}
+            if user_id in share_ids else {"userId": user_id, "status": "not_found"}
+            for user_id in recipient_ids
+        ]
+        return Response({"postId": post.id, "results": results})
@@ -1,27 +1,25 @@
-from rest_framework import viewsets, status, permissions, authentication, generics
+from rest_framework import viewsets, status, permissions, generics
 from rest_framework.response import Response
-from core.models import Seller, Post, MenuItem, PostLike
+from core.models import Seller, Post, MenuItemEngagementHour
 from seller.serializers import SellerSerializer, SellerDetailSerializer
 from django.utils import timezone
 from rest_framework import filters
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
-
-from django.db.models import Sum
-
-from datetime import datetime, timedelta
+from core.pagination import CursorPaginationMixin
+from core.authentication import CachedTokenAuthentication
+from core.analytics import engagement_series, like_total, parse_datetime_param
 
 from django.http import Http404
 
-import random
 
 
 class SellerViewset(viewsets.ModelViewSet):
     """View for manage seller APIs"""
     serializer_class = SellerDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     queryset = Seller.objects.all()
 
     def get_queryset(self):
@@ -49,7 +47,7 @@ class SellerViewset(viewsets.ModelViewSet):
             user=user, sellerInfoContributor=seller_info_contributor)
 
 
-class CustomSellerPagination(PageNumberPagination):
+class CustomSellerPagination(CursorPaginationMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
@@ -58,7 +56,7 @@ class CustomSellerPagination(PageNumberPagination):
 class SellerListView(generics.ListAPIView):
     queryset = Seller.objects.all().order_by("sellerBusinessName")
     serializer_class = SellerSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ["sellerBusinessName"]
@@ -68,7 +66,7 @@ class SellerListView(generics.ListAPIView):
 class RetrieveSellerView(generics.RetrieveAPIView):
     """Retrieve a seller"""
     serializer_class = SellerDetailSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -82,7 +80,7 @@ class RetrieveSellerView(generics.RetrieveAPIView):
 
 class AllSellersListView(generics.ListAPIView):
     """Return a list of all existing menu items"""
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = SellerSerializer
 
@@ -92,7 +90,7 @@ class AllSellersListView(generics.ListAPIView):
 
 
 class LikePercentageChangeView(APIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, sellerId, startDateTime, endDateTime, *args, **kwargs):
@@ -107,33 +105,22 @@ class LikePercentageChangeView(APIView):
         if not startDateTime or not endDateTime:
             return Response({"error": "startDateTime and endDateTime query params are required"}, status=400)
 
-        startDateTime = startDateTime.replace("_", " ").replace(
-            "%20", " ").replace("%22", " ").replace("%3A", ":").strip('"').strip()
-        endDateTime = endDateTime.replace("_", " ").replace("%20", " ").replace(
-            "%22", " ").replace("%3A", ":").strip('"').strip()
-
         # Parse the datetime strings into datetime objects
         try:
-            startDateTime = datetime.strptime(
-                startDateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
-            endDateTime = datetime.strptime(
-                endDateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
+            startDateTime = parse_datetime_param(startDateTime)
+            endDateTime = parse_datetime_param(endDateTime)
         except ValueError:
             return Response({"error": "Invalid datetime format. Use ISO 8601 format 'YYYY-MM-DDTHH:MM:SS.sssZ'",
                              "startDate": startDateTime,
                              "sellerId": sellerId}, status=400,)
 
-        # Get the seller's menu items
-        menu_items = MenuItem.objects.filter(id__in=seller.menuItemId)
-
-        # Get posts associated with seller's menu items
-        posts = Post.objects.filter(menuItemId__in=menu_items)
+        rollups = MenuItemEngagementHour.objects.filter(
+            menuItem_id__in=seller.menuItemId or [])
+        posts = Post.objects.filter(menuItem_id__in=seller.menuItemId or [])
 
-        # Calcualte likes at startDateTime and endDateTie
-        start_likes = posts.filter(postPublishDateTime__lte=startDateTime).aggregate(
-            sum=Sum("postLikeCount"))["sum"] or 0
-        end_likes = posts.filter(postPublishDateTime__lte=endDateTime).aggregate(
-            sum=Sum("postLikeCount"))["sum"] or 0
+        # Calculate the net likes at startDateTime and endDateTime
+        start_likes = like_total(rollups, posts, startDateTime)
+        end_likes = like_total(rollups, posts, endDateTime)
 
         # calculate trend direction and percentage change
         if start_likes == 0:
@@ -161,7 +148,8 @@ class LikePercentageChangeView(APIView):
 
 
 class DailyCumulativePostLikesView(APIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    """Cumulative likes, saves, shares and comments over a time range"""
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, sellerId, startDateTime, endDateTime, *args, **kwargs):
@@ -175,63 +163,19 @@ class DailyCumulativePostLikesView(APIView):
         if not startDateTime or not endDateTime:
             return Response({"error": "startDateTime and endDateTime query params are required"}, status=400)
 
-        startDateTime = startDateTime.replace("_", " ").replace(
-            "%20", " ").replace("%22", " ").replace("%3A", ":").strip('"').strip()
-        endDateTime = endDateTime.replace("_", " ").replace("%20", " ").replace(
-            "%22", " ").replace("%3A", ":").strip('"').strip()
-
         # Parse the datetime strings into datetime objects
         try:
-            startDateTime = datetime.strptime(
-                startDateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
-            endDateTime = datetime.strptime(
-                endDateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
+            startDateTime = parse_datetime_param(startDateTime)
+            endDateTime = parse_datetime_param(endDateTime)
         except ValueError:
             return Response({"error": "Invalid datetime format. Use ISO 8601 format 'YYYY-MM-DDTHH:MM:SS.sssZ'",
                              "startDate": startDateTime,
                              "sellerId": sellerId}, status=400,)
 
-        # Get the seller's menu items
-        menu_items = MenuItem.objects.filter(id__in=seller.menuItemId)
-
-        # Get posts associated with seller's menu items
-        posts = Post.objects.filter(menuItemId__in=menu_items)
-
-        # Initialize the result list
-        results = []
-
-        delta = endDateTime - startDateTime
-        if delta <= timedelta(hours=24):
-            # If range is 24 hours, step is 2 hours
-            step = timedelta(hours=2)
-        elif delta <= timedelta(days=7):
-            # If range is a week, step is one day
-            step = timedelta(days=1)
-        elif delta <= timedelta(days=31):
-            # If range is a month, step is a week
-            step = timedelta(days=7)
-        elif delta <= timedelta(days=90):
-            # If range is a quarter, step is one month
-            step = timedelta(days=30)
-        elif delta <= timedelta(days=365):
-            # If range is a year, step is one month
-            step = timedelta(days=30)
-        else:
-            # Default step is one day
-            step = timedelta(days=1)
-
-        day = startDateTime + step
-        while day <= endDateTime:
-            # Get the cumulative sum of likes for posts up to and including this day
-            likes = PostLike.objects.filter(post__in = posts, likeDateTime__lte = day, isActive = True).count()
-            likes -= PostLike.objects.filter(post__in = posts, likeDateTime__lte = day, isActive = False).count()
-            save = random.randint(0, 100)
-            share = random.randint(0, 100)
-            comment = random.randint(0, 100)
-            # Append the result to the results list
-            results.append({"timestamp": day.isoformat(), "like": likes, "save": save, "share": share, "comment": comment})
-            # Move to the next step
-            day += step
+        # Get the rollups and posts of the seller's menu items
+        rollups = MenuItemEngagementHour.objects.filter(
+            menuItem_id__in=seller.menuItemId or [])
+        posts = Post.objects.filter(menuItem_id__in=seller.menuItemId or [])
 
-        # Return the result
-        return Response(results)
+        return Response(engagement_series(
+            rollups, posts, startDateTime, endDateTime))
@@ -14,13 +14,14 @@ from rest_framework import serializers
 from django.utils.translation import gettext as _
 
 from core.models import Post, User
+from core.renditions import RenditionSerializerMixin
 
 from django.db.models import Count, Case, When, IntegerField, F, Sum
 
 
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(RenditionSerializerMixin, serializers.ModelSerializer):
     """Serializer for the user object"""
     userPostId = serializers.SerializerMethodField()
     userId = serializers.ReadOnlyField(source="id")
@@ -163,7 +164,7 @@ class UserProfileCoverSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
         extra_kwargs = {"userCoverPictureUrl": {"required":"True"}}
 
-class UsersListSerializer(serializers.ModelSerializer):
+class UsersListSerializer(RenditionSerializerMixin, serializers.ModelSerializer):
     """Serializer for retrieving a list of users"""
     userId = serializers.ReadOnlyField(source="id")
     class Meta:
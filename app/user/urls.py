@@ -13,6 +13,7 @@ urlpatterns = [
     path("auth/firebase/", views.FirebaseAuthView.as_view(), name='firebase_auth'),
     path("user/me/", views.ManagerUserView.as_view(), name="me"),
     path("user/logout/", views.LogoutView.as_view(), name="logout"),
+    path("user/token/refresh/", views.RefreshTokenView.as_view(), name="token_refresh"),
     path("user/upload-profile-image/", views.UploadProfileImageView.as_view(), name="upload_profile_image"),
     path("user/upload-cover-picture/", views.UploadCoverPictureView.as_view(), name="upload_cover_picture"),
     path("user/<int:id>/", views.RetrieveUserView.as_view(), name="other_user"),
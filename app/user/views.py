@@ -2,7 +2,7 @@
 Views for the user API.
 """
 
-from rest_framework import generics, authentication, permissions, views
+from rest_framework import generics, permissions, views
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 from rest_framework.response import Response
@@ -12,29 +12,47 @@ from rest_framework import filters
 from django.http import Http404, JsonResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
+from core.pagination import CursorPaginationMixin
 from user.serializer import UserSerializer, AuthTokenSerializer, UserProfileImageSerializer, UsersListSerializer, UserProfileCoverSerializer
 from business.serializers import BusinessSerializer
-from core.models import User
+from core.models import User, TimelineEntry
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from rest_framework import status
 from django.conf import settings
 
-from django.db import DatabaseError
+from django.db import DatabaseError, transaction
 
 from rest_framework.views import APIView
 
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
 import sys
 
-from ip2geotools.databases.noncommercial import DbIpCity
+from core.geoip import get_client_ip, ip_location
+from core.lastseen import last_seen
+from core.authentication import CachedTokenAuthentication, invalidate_users
+from core import tokens
+from core.firebase import verify_id_token
+from core.asyncviews import AsyncAPIView, offload
+from asgiref.sync import sync_to_async
 
 import os
 
-from firebase_admin import auth
 
-from PIL import Image
-from io import BytesIO
+def token_response_data(user, token=None):
+    """Return the login response of a user.
+
+    Signed access and refresh tokens are issued when AUTH_SIGNED_TOKENS is
+    set, otherwise the DRF token (token, or the user's own) is returned.
+    """
+    response_data = {"localId": user.id, "expiresIn": settings.EXPIRATION_TIME}
+    if settings.AUTH_SIGNED_TOKENS:
+        access, refresh = tokens.issue_token_pair(user.id)
+        response_data.update(idToken=access, refreshToken=refresh)
+    else:
+        if token is None:
+            token, _ = Token.objects.get_or_create(user=user)
+        response_data["idToken"] = token.key
+    return response_data
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -55,13 +73,7 @@ class CreateTokenView(ObtainAuthToken):
         )
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
-        token, _ = Token.objects.get_or_create(user=user)
-        response_data = {
-            "idToken": token.key,
-            "localId": user.id,
-            "expiresIn": settings.EXPIRATION_TIME,
-        }
-        return Response(response_data, status=status.HTTP_200_OK)
+        return Response(token_response_data(user), status=status.HTTP_200_OK)
 
 
 # class GoogleAuthView(APIView):
@@ -107,91 +119,81 @@ class CreateTokenView(ObtainAuthToken):
 #             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class FirebaseAuthView(APIView):
-    """Log in or register a user using a Firebase token."""
+class FirebaseAuthView(AsyncAPIView):
+    """Log in or register a user using a Firebase token.
 
-    def post(self, request):
+    Verifying the token may fetch Google's certificates, so it is
+    offloaded and the view waits for it without holding a worker.
+    """
+
+    def local_login(self, local_id):
+        # If localId is provided, the user is already logged in before, try to find them and return the token
+        try:
+            user = User.objects.get(id=local_id)
+            token = Token.objects.get(user=user)
+            return Response(token_response_data(user, token), status=status.HTTP_200_OK)
+        except User.DoesNotExist:
+            return Response({"error": "User does not exist"}, status=status.HTTP_404_NOT_FOUND)
+        except Token.DoesNotExist:
+            return Response({"error": "Token does not exist"}, status=status.HTTP_404_NOT_FOUND)
+
+    def firebase_login(self, decoded_token):
+        firebase_uid = decoded_token["uid"]
+        try:
+            user = User.objects.get(firebase_uid=firebase_uid)
+        except User.DoesNotExist:
+            user_email = decoded_token.get("email")
+            name = decoded_token.get("name")
+            # username = decoded_token.get("username", None)
+            # # photoURL = decoded_token.get("photoURL", None)
+            # phone_num = decoded_token.get("phoneNumber", None)
+
+            user = User.objects.create_user(
+                userEmailAddress=user_email, firebase_uid=firebase_uid, userName=name)
+            user.save()
+
+        return Response(token_response_data(user), status=status.HTTP_200_OK)
+
+    async def post(self, request):
         id_token = request.data.get("idToken")
         local_id = request.data.get("localId")
         if local_id:
-            # If localId is provided, the user is already logged in before, try to find them and return the token
-            try:
-                user = User.objects.get(id=local_id)
-                token = Token.objects.get(user=user)
-                response_data = {
-                    "idToken": token.key,
-                    "localId": user.id,
-                    "expiresIn": settings.EXPIRATION_TIME,
-                }
-                return Response(response_data, status=status.HTTP_200_OK)
-            except User.DoesNotExist:
-                return Response({"error": "User does not exist"}, status=status.HTTP_404_NOT_FOUND)
-            except Token.DoesNotExist:
-                return Response({"error": "Token does not exist"}, status=status.HTTP_404_NOT_FOUND)
-        else:
-            # If localId is not provided, verify the id_token with Firebase
-            if not id_token:
-                return Response({"error": "Missing ID token"}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                decoded_token = auth.verify_id_token(id_token)
-                firebase_uid = decoded_token["uid"]
-            except ValueError as exc:
-                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                user = User.objects.get(firebase_uid=firebase_uid)
-            except User.DoesNotExist:
-                user_email = decoded_token.get("email")
-                name = decoded_token.get("name")
-                # username = decoded_token.get("username", None)
-                # # photoURL = decoded_token.get("photoURL", None)
-                # phone_num = decoded_token.get("phoneNumber", None)
-
-                user = User.objects.create_user(
-                    userEmailAddress=user_email, firebase_uid=firebase_uid, userName=name)
-                user.save()
+            return await sync_to_async(self.local_login)(local_id)
 
-            token, _ = Token.objects.get_or_create(user=user)
-            response_data = {
-                "idToken": token.key,
-                "localId": user.id,
-                "expiresIn": settings.EXPIRATION_TIME,
-            }
-            return Response(response_data, status=status.HTTP_200_OK)
+        # If localId is not provided, verify the id_token with Firebase
+        if not id_token:
+            return Response({"error": "Missing ID token"}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            decoded_token = await offload(verify_id_token, id_token)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return await sync_to_async(self.firebase_login)(decoded_token)
 
 
 class ManagerUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        """Retrieve and return the authenticated user"""
-        user = self.request.user
-        request = self.request
-        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get("REMOTE_ADDR")
+        """Retrieve and return the authenticated user.
 
-        try:
-            response = DbIpCity.get(ip, api_key="free")
-            location = {
-                "state": response.region,
-                "country": response.country
-            }
-        except Exception as e:
-            location = "Location unavailable"
+        Read from the stored row, as request.user may be a cached snapshot
+        older than the last write of the user, in this process or another.
+        """
+        request = self.request
+        user = User.objects.get(pk=request.user.pk)
+        ip = get_client_ip(request)
 
+        # Written behind in batches, the response shows the current address
+        last_seen.record(user, ip)
         user.IPv4 = {
             "ipAddress": ip,
-            "location": location
+            "location": ip_location(ip)
         }
-        user.save()
 
         serializer_context = {"request": request, "ip_address": ip}
         serializer = self.serializer_class(user, context=serializer_context)
@@ -202,21 +204,10 @@ class UploadProfileImageView(ManagerUserView):
     """Upload a profile image for the authenticated user"""
     serializer_class = UserProfileImageSerializer
 
-    def compress_image(self, image):
-        image_temporary = Image.open(image)
-        output_io_stream = BytesIO()
-        image_temporary.save(output_io_stream, format='JPEG', quality=60)
-        output_io_stream.seek(0)
-        image = ContentFile(output_io_stream.read(),
-                            f"{image.name.split('.')[0]}.jpeg")
-        return image
-
     def post(self, request, *args, **kwargs):
         user = self.get_object()
-        data = request.data.copy()  # make a copy of the data
-        data['userProfilePictureUrl'] = self.compress_image(
-            request.FILES['userProfilePictureUrl'])  # compress image and assign it back
-        serializer = self.get_serializer(user, data=data)
+        # The original is stored and resized later by process_image_jobs
+        serializer = self.get_serializer(user, data=request.data)
 
         if serializer.is_valid():
             if user.userProfilePictureUrl:
@@ -235,21 +226,10 @@ class UploadCoverPictureView(ManagerUserView):
     """Upload a cover image for the authenticated user"""
     serializer_class = UserProfileCoverSerializer
 
-    def compress_image(self, image):
-        image_temporary = Image.open(image)
-        output_io_stream = BytesIO()
-        image_temporary.save(output_io_stream, format='JPEG', quality=60)
-        output_io_stream.seek(0)
-        image = ContentFile(output_io_stream.read(),
-                            f"{image.name.split('.')[0]}.jpeg")
-        return image
-
     def post(self, request, *args, **kwargs):
         user = self.get_object()
-        data = request.data.copy()  # make a copy of the data
-        data['userCoverPictureUrl'] = self.compress_image(
-            request.FILES['userCoverPictureUrl'])  # compress image and assign it back
-        serializer = self.get_serializer(user, data=data)
+        # The original is stored and resized later by process_image_jobs
+        serializer = self.get_serializer(user, data=request.data)
 
         if serializer.is_valid():
             if user.userCoverPictureUrl:
@@ -268,7 +248,7 @@ class UploadCoverPictureView(ManagerUserView):
 class RetrieveUserView(generics.RetrieveAPIView):
     """Retrieve a user's profile"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -282,7 +262,7 @@ class RetrieveUserView(generics.RetrieveAPIView):
         return user
 
 
-class CustomUserPagination(PageNumberPagination):
+class CustomUserPagination(CursorPaginationMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
@@ -291,7 +271,7 @@ class CustomUserPagination(PageNumberPagination):
 class UserListView(generics.ListAPIView):
     queryset = User.objects.all().order_by("userName")
     serializer_class = UsersListSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ["userName", "userUsername"]
@@ -299,17 +279,55 @@ class UserListView(generics.ListAPIView):
 
 
 class LogoutView(generics.GenericAPIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
         """Remove the authentication token associated with the current user"""
-        request.user.auth_token.delete()
+        if isinstance(request.auth, tokens.SignedToken):
+            tokens.get_revocation_list().revoke_session(request.auth)
+        else:
+            request.user.auth_token.delete()
         return Response({"message": "Successfully logged out"})
 
 
+class RefreshTokenView(APIView):
+    """Exchange a refresh token for a new access and refresh token.
+
+    The presented refresh token is revoked, so each can be used once.
+    """
+
+    def post(self, request):
+        if not settings.AUTH_SIGNED_TOKENS:
+            return Response({"error": "Signed tokens are disabled"}, status=status.HTTP_400_BAD_REQUEST)
+
+        refresh_token = request.data.get("refreshToken")
+        if not refresh_token:
+            return Response({"error": "Missing refresh token"}, status=status.HTTP_400_BAD_REQUEST)
+
+        revocations = tokens.get_revocation_list()
+        token = tokens.verify_token(refresh_token, tokens.REFRESH)
+        if token is None or revocations.is_revoked(token):
+            return Response({"error": "Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        user = User.objects.filter(id=token.user_id, is_active=True).first()
+        if user is None:
+            return Response({"error": "User does not exist"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if not revocations.claim(token):
+            return Response({"error": "Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+        access, refresh = tokens.issue_token_pair(user.id, token.session_id)
+        response_data = {
+            "idToken": access,
+            "refreshToken": refresh,
+            "localId": user.id,
+            "expiresIn": settings.EXPIRATION_TIME,
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
 class FollowUserView(views.APIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, user_id):
@@ -321,17 +339,30 @@ class FollowUserView(views.APIView):
         if request.user == user_to_follow:
             return Response({"error": "User cannot follow themselves"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if user_to_follow in request.user.following.all():
-            request.user.following.remove(user_to_follow)
+        with transaction.atomic():
+            # Concurrent toggles by the user wait here, so each sees the
+            # previous one and the counter moves once per change
+            User.objects.select_for_update().only("pk").get(pk=request.user.pk)
+            following = request.user.following.filter(pk=user_to_follow.pk).exists()
+            if following:
+                request.user.following.remove(user_to_follow)
+            else:
+                request.user.following.add(user_to_follow)
+            User.objects.filter(pk=user_to_follow.pk).update(
+                userFollowers=Coalesce(F("userFollowers"), 0) + (-1 if following else 1))
+        invalidate_users([user_to_follow.pk])
+
+        # The timeline is updated once the follow is visible to fan_out
+        if following:
+            TimelineEntry.objects.remove_author(request.user, user_to_follow)
             return Response({"status": "unfollowed"}, status=status.HTTP_200_OK)
-        else:
-            request.user.following.add(user_to_follow)
-            return Response({"status": "followed"}, status=status.HTTP_200_OK)
+        TimelineEntry.objects.backfill(request.user, user_to_follow)
+        return Response({"status": "followed"}, status=status.HTTP_200_OK)
 
 
 class FollowersListView(generics.ListAPIView):
     serializer_class = UsersListSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -340,12 +371,12 @@ class FollowersListView(generics.ListAPIView):
             user = User.objects.get(id=user_id)
         except User.DoesNotExist:
             raise Http404("User not found")
-        return user.followers.all()
+        return user.followers.order_by("id")
 
 
 class FollowingListView(generics.ListAPIView):
     serializer_class = UsersListSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -354,12 +385,12 @@ class FollowingListView(generics.ListAPIView):
             user = User.objects.get(id=user_id)
         except User.DoesNotExist:
             raise Http404("User not found")
-        return user.following.all()
+        return user.following.order_by("id")
 
 
 class FriendsListView(generics.ListAPIView):
     serializer_class = UsersListSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_calsses = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -0,0 +1,8 @@
+proxy_pass           http://app_server;
+proxy_http_version   1.1;
+proxy_set_header     Upgrade $http_upgrade;
+proxy_set_header     Connection $http_connection;
+proxy_set_header     Host $host;
+proxy_set_header     X-Forwarded-For $proxy_add_x_forwarded_for;
+proxy_set_header     X-Forwarded-Proto $scheme;
+proxy_read_timeout   3600s;
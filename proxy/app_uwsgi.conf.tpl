@@ -0,0 +1,2 @@
+uwsgi_pass           app_server;
+include              /etc/nginx/uwsgi_params;
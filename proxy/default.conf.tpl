@@ -1,3 +1,5 @@
+include /etc/nginx/upstream.conf;
+
 server {
     listen ${LISTEN_PORT};
     server_name api.foodport.com.my;
@@ -20,8 +22,7 @@ server {
     }
 
     location / {
-        uwsgi_pass           ${APP_HOST}:${APP_PORT};
-        include              /etc/nginx/uwsgi_params;
+        include              /etc/nginx/app.conf;
         client_max_body_size 10M;
 
         add_header 'Access-Control-Allow-Methods' 'GET, POST, OPTIONS';
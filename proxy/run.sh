@@ -3,4 +3,25 @@
 set -e
 
 envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+cp /etc/nginx/app_${APP_SERVER}.conf.tpl /etc/nginx/app.conf
+
+# uwsgi forks its workers behind one port, daphne runs ASGI_WORKERS
+# processes on consecutive ports
+workers=1
+if [ "$APP_SERVER" = "asgi" ]; then
+    workers=${ASGI_WORKERS}
+fi
+{
+    echo "upstream app_server {"
+    if [ "$APP_SERVER" = "asgi" ]; then
+        # Sockets stay open, so balance on open connections
+        echo "    least_conn;"
+    fi
+    i=0
+    while [ "$i" -lt "$workers" ]; do
+        echo "    server ${APP_HOST}:$((APP_PORT + i));"
+        i=$((i + 1))
+    done
+    echo "}"
+} > /etc/nginx/upstream.conf
 nginx -g "daemon off;"
\ No newline at end of file
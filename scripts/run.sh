@@ -6,4 +6,25 @@ python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+# APP_SERVER=asgi serves HTTP and WebSockets with daphne, whose async views
+# do not hold a worker while waiting on upstreams; uwsgi is the default.
+# A daphne process runs on one core, so ASGI_WORKERS of them listen on ports
+# 9000 and up, which nginx balances over
+if [ "$APP_SERVER" = "asgi" ]; then
+    pids=""
+    i=0
+    while [ "$i" -lt "${ASGI_WORKERS:-4}" ]; do
+        daphne --bind 0.0.0.0 --port $((9000 + i)) --proxy-headers app.asgi:application &
+        pids="$pids $!"
+        i=$((i + 1))
+    done
+    trap 'kill $pids 2>/dev/null; wait; exit 0' TERM INT
+    # Stop the others once one exits, so the container is restarted
+    while kill -0 $pids 2>/dev/null; do
+        sleep 5
+    done
+    kill $pids 2>/dev/null
+    exit 1
+else
+    uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+fi